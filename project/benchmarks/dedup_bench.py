@@ -0,0 +1,194 @@
+"""
+dedup_bench.py
+What idempotent ingest costs at full rate: the same synthetic 100 Hz IMU stream is written through
+insert_imu_batch with part of it replayed (a batch re-sent after the next one, as a retried flush or
+a spool replayed after a crash does), once per case:
+
+    no_index      unique indexes dropped, window off -- The staged COPY alone, duplicates get stored
+    index         unique indexes (migration 6), window off -- Every replay is caught by ON CONFLICT
+    index_window  unique indexes plus the in-memory frame window (DEDUP_WINDOW) in front
+
+Reports samples/s offered, flush p50 / p99, rows stored against unique samples, where duplicates
+were dropped, and the window's own cost per sample with no database involved.
+Each case gets its own throwaway bench_<pid>_<case> database. Same connection settings as ingest_bench.
+
+Run from the project folder:
+    python -m benchmarks.dedup_bench --rows 200000 --batch 200 --replay 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import asyncpg
+
+from benchmarks.ingest_bench import (
+    RESULTS_DIR, connect_kwargs, create_bench_database, drop_bench_database, make_imu_payloads, percentile,
+    quiet_loggers, rss_mb, time_flushes,
+)
+from db import dedup, packing
+from db.database import DatabaseSingleton
+from fast_server.metrics import ROWS_DROPPED
+from fast_server.parsing import parse_imu_message
+
+CASES = ("no_index", "index", "index_window")
+
+
+# Batches in send order -- After a batch, the one before it is sent again with probability `replay`
+def replay_schedule(rows: list[dict], batch_size: int, replay: float, seed: int = 1) -> list[list[dict]]:
+
+    rng = random.Random(seed)
+    batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+
+    sent = []
+    for i, batch in enumerate(batches):
+        sent.append(batch)
+        if i and rng.random() < replay:
+            sent.append(batches[i - 1])
+
+    return sent
+
+
+def dropped(stream: str) -> dict[str, float]:
+    return {reason: ROWS_DROPPED.labels(stream, reason).value for reason in ("duplicate", "conflict")}
+
+
+async def bench_case(case: str, schedule: list[list[dict]], unique: int, pool_size: int, keep: bool) -> dict:
+
+    name = f"bench_{os.getpid()}_{case}"
+    await create_bench_database(name)
+
+    try:
+        pool = await asyncpg.create_pool(**{**connect_kwargs(), "database": name}, min_size=1, max_size=pool_size)
+        db = DatabaseSingleton(pool, imu_storage="rows")
+
+        if case == "no_index":
+            async with db.acquire() as conn:
+                await conn.execute(f"DROP INDEX IF EXISTS {dedup.unique_index_name('imu_measurement')}")
+
+        if case != "index_window":
+            for window in db.dedup.values():
+                window.size = 0
+
+        await db.create_session(f"dedup-{case}")
+
+        flushes = []
+        time_flushes(db, "insert_imu_batch", flushes)
+        before = dropped("imu")
+
+        started = time.perf_counter()
+        for batch in schedule:
+            await db.insert_imu_batch(batch)
+        seconds = time.perf_counter() - started
+
+        after = dropped("imu")
+
+        async with db.acquire() as conn:
+            stored = await conn.fetchval("SELECT count(*) FROM imu_measurement")
+
+        await pool.close()
+
+    finally:
+        if not keep:
+            await drop_bench_database(name)
+
+    offered = sum(len(b) for b in schedule)
+    p50, p99 = percentile(flushes, 0.50), percentile(flushes, 0.99)
+
+    return {
+        "offered": offered,
+        "seconds": round(seconds, 4),
+        "samples_per_s": round(offered / seconds, 1),
+        "flush_p50_ms": round(p50 * 1000, 3),
+        "flush_p99_ms": round(p99 * 1000, 3),
+        "stored": stored,
+        "duplicates_stored": stored - unique,
+        "dropped_window": int(after["duplicate"] - before["duplicate"]),
+        "dropped_conflict": int(after["conflict"] - before["conflict"]),
+        "rss_mb": round(rss_mb(), 1),
+    }
+
+
+# Filter + commit per sample, no database -- The part of the window that sits on the ingest path
+def bench_window(rows: list[dict], batch_size: int, devices: int) -> dict:
+
+    records = [
+        (r["frame_id"], r["capture_time"], r["recorded_at"], 0.0, i % devices, 1, *([0.0] * len(packing.IMU_CHANNELS)))
+        for i, r in enumerate(rows)
+    ]
+    window = dedup.Deduplicator("bench", "imu_measurement", packing.IMU_COLUMNS)
+
+    started = time.perf_counter()
+    for i in range(0, len(records), batch_size):
+        window.commit(window.filter(records[i:i + batch_size]))
+    seconds = time.perf_counter() - started
+
+    return {
+        "window": window.size,
+        "us_per_sample": round(seconds / len(records) * 1e6, 3),
+        "tracked_frames": sum(len(w.seen) for w in window.windows.values()),
+    }
+
+
+async def run(args) -> dict:
+
+    quiet_loggers()
+    rows = [parse_imu_message(topic, payload) for topic, payload in make_imu_payloads(args.rows, args.devices)]
+    schedule = replay_schedule(rows, args.batch, args.replay)
+
+    cases = {case: await bench_case(case, schedule, len(rows), args.pool_size, args.keep) for case in CASES}
+
+    base = cases["no_index"]["seconds"]
+    overhead = {case: round(cases[case]["seconds"] / base - 1, 3) for case in CASES[1:]}
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "rows": args.rows,
+        "batch": args.batch,
+        "devices": args.devices,
+        "replay": args.replay,
+        "cases": cases,
+        "overhead_vs_no_index": overhead,
+        "window": bench_window(rows, args.batch, args.devices),
+    }
+
+
+def print_table(results: dict) -> None:
+
+    keys = ("samples_per_s", "flush_p50_ms", "flush_p99_ms", "stored", "duplicates_stored", "dropped_window", "dropped_conflict")
+
+    print(f"{'':<20}" + "".join(f"{case:>14}" for case in CASES))
+    for key in keys:
+        print(f"{key:<20}" + "".join(f"{results['cases'][case][key]:>14}" for case in CASES))
+
+    print("\noverhead vs no_index: " + ", ".join(f"{k} {v:+.1%}" for k, v in results["overhead_vs_no_index"].items()))
+    print(f"window alone: {results['window']['us_per_sample']} us/sample")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest deduplication cost benchmark")
+    parser.add_argument("--rows", type=int, default=200000, help="Unique IMU samples per case")
+    parser.add_argument("--batch", type=int, default=int(os.getenv("BATCHES", 200)), help="Samples per insert_imu_batch call")
+    parser.add_argument("--devices", type=int, default=4, help="IMU devices the samples are spread across")
+    parser.add_argument("--replay", type=float, default=0.1, help="Chance a batch is sent a second time")
+    parser.add_argument("--pool-size", type=int, default=4, help="Max connections in the bench pool")
+    parser.add_argument("--keep", action="store_true", help="Keep the bench databases after the run")
+    parser.add_argument("--out", type=Path, default=None, help="Result file (default benchmarks/results/dedup-<time>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_table(results)
+
+    out = args.out or RESULTS_DIR / f"dedup-{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {out}")
+
+
+if __name__ == "__main__":
+    main()
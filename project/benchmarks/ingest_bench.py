@@ -0,0 +1,460 @@
+"""
+ingest_bench.py
+Drives the ingest pipeline in-process against a throwaway local Postgres:
+the IMU / robot parsers, the DatabaseSingleton batch inserts and the queue workers.
+Reports rows/s, p99 flush latency and process memory per case, and writes the
+results as JSON so a run can be compared against a saved baseline.
+
+Needs a Postgres the user can create databases on -- BENCH_DSN, or the DB_* env vars.
+A fresh bench_<pid> database is built by db.migrations and dropped afterwards,
+so the ingest tables of the target server are never touched.
+
+Run from the project folder:
+    python -m benchmarks.ingest_bench --rows 20000 --batch 1000
+    python -m benchmarks.ingest_bench --no-db
+    python -m benchmarks.ingest_bench --baseline benchmarks/results/baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import asyncpg
+
+try:
+    import psutil
+except ImportError:  # RSS falls back to the peak reported by getrusage
+    psutil = None
+
+BENCH_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+# Synthetic rows come from the same generators the broker test clients use
+sys.path.insert(0, str(BENCH_DIR.parent / "tests"))
+from data_generators import create_imu_csv, create_robot_data  # noqa: E402
+
+from db import migrations  # noqa: E402
+from db.database import DatabaseSingleton  # noqa: E402
+from fast_server import loggers, metrics  # noqa: E402
+from fast_server.parsing import parse_imu_message  # noqa: E402
+from tcp_server import tcp_server  # noqa: E402
+
+# Fractional change that counts as a regression against the baseline
+DEFAULT_THRESHOLD = 0.20
+
+
+# ---------------------------------------------------------------------------
+# Synthetic payloads
+# ---------------------------------------------------------------------------
+
+def make_imu_payloads(num_rows: int, devices: int) -> list[tuple[str, bytes]]:
+    """
+    (topic, payload) pairs framed like the IMU firmware publishes them:
+    frame counter, capture time, then the generator's time_ms + 12 channels.
+    """
+    rows = create_imu_csv(num_rows)
+    start = time.time()
+    payloads = []
+
+    for i, row in enumerate(rows):
+        frame = i // devices
+        topic = f"imu/bench-imu-{i % devices}"
+        payloads.append((topic, f"{frame},{start + frame * 0.01:.6f},{row}".encode()))
+
+    return payloads
+
+
+def make_robot_lines(num_rows: int) -> list[str]:
+    return create_robot_data(num_rows)
+
+
+# ---------------------------------------------------------------------------
+# Measurement helpers
+# ---------------------------------------------------------------------------
+
+def rss_mb() -> float:
+    """
+    Resident memory of this process -- getrusage only knows the peak.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2**20
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values: list[float], q: float) -> float | None:
+
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def case_result(rows: int, seconds: float, flushes: list[float], rss_before: float) -> dict:
+
+    p50 = percentile(flushes, 0.50)
+    p99 = percentile(flushes, 0.99)
+
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 4),
+        "rows_per_s": round(rows / seconds, 1) if seconds else None,
+        "flushes": len(flushes),
+        "flush_p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+        "flush_p99_ms": round(p99 * 1000, 3) if p99 is not None else None,
+        "rss_mb": round(rss_mb(), 1),
+        "rss_delta_mb": round(rss_mb() - rss_before, 1),
+    }
+
+
+def time_flushes(db: DatabaseSingleton, method: str, samples: list[float]) -> None:
+    """
+    Wraps one of the db insert_*_batch methods so every flush is timed.
+    """
+    inner = getattr(db, method)
+
+    async def timed(batch):
+        started = time.perf_counter()
+        result = await inner(batch)
+        samples.append(time.perf_counter() - started)
+        return result
+
+    setattr(db, method, timed)
+
+
+# ---------------------------------------------------------------------------
+# Throwaway database
+# ---------------------------------------------------------------------------
+
+def connect_kwargs() -> dict:
+    """
+    BENCH_DSN wins, otherwise the same DB_* variables the servers use (maintenance db "postgres").
+    """
+    dsn = os.getenv("BENCH_DSN")
+    if dsn:
+        return {"dsn": dsn}
+
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "database": "postgres",
+    }
+
+
+async def create_bench_database(name: str) -> None:
+
+    conn = await asyncpg.connect(**connect_kwargs())
+    try:
+        await conn.execute(f'CREATE DATABASE "{name}"')
+    finally:
+        await conn.close()
+
+    conn = await asyncpg.connect(**{**connect_kwargs(), "database": name})
+    try:
+        await migrations.migrate(conn)
+    finally:
+        await conn.close()
+
+
+async def drop_bench_database(name: str) -> None:
+
+    conn = await asyncpg.connect(**connect_kwargs())
+    try:
+        await conn.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+    finally:
+        await conn.close()
+
+
+async def reset_tables(db: DatabaseSingleton) -> None:
+
+    async with db.acquire() as conn:
+        await conn.execute("TRUNCATE imu_measurement, imu_packed, image_detection, robot, rollup_1s, rollup_1m")
+
+
+# ---------------------------------------------------------------------------
+# Cases
+# ---------------------------------------------------------------------------
+
+def bench_parse_imu(payloads: list[tuple[str, bytes]]) -> dict:
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+
+    for topic, payload in payloads:
+        parse_imu_message(topic, payload)
+
+    return case_result(len(payloads), time.perf_counter() - started, [], rss_before)
+
+
+def bench_parse_robot(lines: list[str]) -> dict:
+
+    rss_before = rss_mb()
+    now = time.time()
+    started = time.perf_counter()
+
+    for line in lines:
+        tcp_server.parse_robot_message(line, now)
+
+    return case_result(len(lines), time.perf_counter() - started, [], rss_before)
+
+
+async def bench_insert_imu(db: DatabaseSingleton, payloads: list[tuple[str, bytes]], batch_size: int) -> dict:
+    """
+    insert_imu_batch called back to back, no queue in between.
+    """
+    await reset_tables(db)
+    rows = [parse_imu_message(topic, payload) for topic, payload in payloads]
+
+    flushes = []
+    time_flushes(db, "insert_imu_batch", flushes)
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+
+    for i in range(0, len(rows), batch_size):
+        await db.insert_imu_batch(rows[i:i + batch_size])
+
+    elapsed = time.perf_counter() - started
+    del db.insert_imu_batch
+
+    return case_result(len(rows), elapsed, flushes, rss_before)
+
+
+async def bench_insert_robot(db: DatabaseSingleton, lines: list[str], batch_size: int) -> dict:
+    """
+    insert_robot_batch called back to back, no queue in between.
+    """
+    await reset_tables(db)
+    now = db.get_time()
+    rows = [tcp_server.parse_robot_message(line, now) for line in lines]
+
+    flushes = []
+    time_flushes(db, "insert_robot_batch", flushes)
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+
+    for i in range(0, len(rows), batch_size):
+        await db.insert_robot_batch(rows[i:i + batch_size])
+
+    elapsed = time.perf_counter() - started
+    del db.insert_robot_batch
+
+    return case_result(len(rows), elapsed, flushes, rss_before)
+
+
+async def wait_for_rows(stream: str, target: float, timeout: float) -> None:
+
+    counter = metrics.ROWS_INSERTED.labels(stream)
+    deadline = time.monotonic() + timeout
+
+    while counter.value < target:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{stream} worker committed {counter.value:.0f}/{target:.0f} rows")
+        await asyncio.sleep(0.01)
+
+
+async def run_worker(worker, stream: str, target: float, timeout: float, feed) -> float:
+    """
+    Runs a queue worker while `feed` produces rows and returns the wall time until all are committed.
+    """
+    task = asyncio.create_task(worker)
+    started = time.perf_counter()
+
+    try:
+        await feed()
+        await wait_for_rows(stream, target, timeout)
+        return time.perf_counter() - started
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+async def bench_imu_pipeline(db: DatabaseSingleton, payloads: list[tuple[str, bytes]], batch_size: int, timeout: float) -> dict:
+    """
+    MQTT handler -> imu_queue -> imu_worker -> insert_imu_batch, as wired in fast_server.main.
+    """
+    from fast_server import main
+
+    await reset_tables(db)
+    main.app.state.db = db
+
+    flushes = []
+    time_flushes(db, "insert_imu_batch", flushes)
+    target = metrics.ROWS_INSERTED.labels("imu").value + len(payloads)
+
+    async def feed():
+        for topic, payload in payloads:
+            await main.handle_sensors(None, topic, payload, 0, None)
+
+    rss_before = rss_mb()
+    elapsed = await run_worker(main.imu_worker(batch_size=batch_size, flush_interval=0.2), "imu", target, timeout, feed)
+    del db.insert_imu_batch
+
+    return case_result(len(payloads), elapsed, flushes, rss_before)
+
+
+async def bench_robot_pipeline(db: DatabaseSingleton, lines: list[str], batch_size: int, timeout: float) -> dict:
+    """
+    Robot parse -> robot_queue -> robot_worker -> insert_robot_batch, as wired in tcp_server.
+    """
+    await reset_tables(db)
+
+    # The worker fetches the singleton; live forwarding to FastAPI is not part of the benchmark
+    DatabaseSingleton._instance = db
+    tcp_server.LIVE_PROBE_INTERVAL = float("inf")
+    tcp_server.live_state["checked"] = time.monotonic()
+
+    flushes = []
+    time_flushes(db, "insert_robot_batch", flushes)
+    target = metrics.ROWS_INSERTED.labels("robot").value + len(lines)
+
+    async def feed():
+        for line in lines:
+            data = tcp_server.parse_robot_message(line, db.get_time())
+            data["arrived_at"] = time.time()
+            await tcp_server.robot_queue.put(data)
+
+    rss_before = rss_mb()
+    elapsed = await run_worker(tcp_server.robot_worker(batch_size=batch_size, flush_interval=0.2), "robot", target, timeout, feed)
+    del db.insert_robot_batch
+
+    return case_result(len(lines), elapsed, flushes, rss_before)
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def quiet_loggers() -> None:
+    """
+    The workers log every flush -- Keep that off disk (create_loggers writes to /fast_server/logs).
+    """
+    for name in ("cur_camera_logger", "cur_imu_logger", "cur_robot_logger"):
+        logger = logging.getLogger(f"bench.{name}")
+        logger.addHandler(logging.NullHandler())
+        logger.propagate = False
+        setattr(loggers, name, logger)
+
+
+async def run(args) -> dict:
+
+    quiet_loggers()
+
+    imu_payloads = make_imu_payloads(args.rows, args.devices)
+    robot_lines = make_robot_lines(args.rows)
+
+    cases = {
+        "parse_imu": bench_parse_imu(imu_payloads),
+        "parse_robot": bench_parse_robot(robot_lines),
+    }
+
+    if not args.no_db:
+        name = f"bench_{os.getpid()}"
+        await create_bench_database(name)
+
+        try:
+            pool = await asyncpg.create_pool(**{**connect_kwargs(), "database": name}, min_size=1, max_size=args.pool_size)
+            db = DatabaseSingleton(pool)
+            await db.create_session(f"bench-{int(time.time())}")
+
+            cases["insert_imu_batch"] = await bench_insert_imu(db, imu_payloads, args.batch)
+            cases["insert_robot_batch"] = await bench_insert_robot(db, robot_lines, args.batch)
+            cases["imu_pipeline"] = await bench_imu_pipeline(db, imu_payloads, args.batch, args.timeout)
+            cases["robot_pipeline"] = await bench_robot_pipeline(db, robot_lines, args.batch, args.timeout)
+
+            await pool.close()
+        finally:
+            DatabaseSingleton._instance = None
+            if not args.keep:
+                await drop_bench_database(name)
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "rows": args.rows,
+        "batch": args.batch,
+        "devices": args.devices,
+        "cases": cases,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Lists every case that got slower than the baseline by more than `threshold`.
+    """
+    regressions = []
+
+    for case, base in baseline.get("cases", {}).items():
+        cur = results["cases"].get(case)
+        if cur is None:
+            continue
+
+        if base.get("rows_per_s") and cur.get("rows_per_s") is not None:
+            if cur["rows_per_s"] < base["rows_per_s"] * (1 - threshold):
+                regressions.append(f"{case}: {cur['rows_per_s']} rows/s vs baseline {base['rows_per_s']}")
+
+        if base.get("flush_p99_ms") and cur.get("flush_p99_ms") is not None:
+            if cur["flush_p99_ms"] > base["flush_p99_ms"] * (1 + threshold):
+                regressions.append(f"{case}: p99 flush {cur['flush_p99_ms']} ms vs baseline {base['flush_p99_ms']}")
+
+    return regressions
+
+
+def print_table(results: dict) -> None:
+
+    print(f"{'case':<22}{'rows/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'rss MB':>10}")
+    for case, r in results["cases"].items():
+        p50 = "-" if r["flush_p50_ms"] is None else r["flush_p50_ms"]
+        p99 = "-" if r["flush_p99_ms"] is None else r["flush_p99_ms"]
+        print(f"{case:<22}{r['rows_per_s']:>12}{p50:>10}{p99:>10}{r['rss_mb']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process ingest pipeline benchmark")
+    parser.add_argument("--rows", type=int, default=20000, help="Rows per stream")
+    parser.add_argument("--batch", type=int, default=int(os.getenv("BATCHES", 1000)), help="Rows per batch insert")
+    parser.add_argument("--devices", type=int, default=4, help="IMU devices the rows are spread across")
+    parser.add_argument("--pool-size", type=int, default=10, help="Max connections in the bench pool")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for a worker to commit every row")
+    parser.add_argument("--no-db", action="store_true", help="Only run the parser cases")
+    parser.add_argument("--keep", action="store_true", help="Keep the bench database after the run")
+    parser.add_argument("--out", type=Path, default=None, help="Result file (default benchmarks/results/ingest-<time>.json)")
+    parser.add_argument("--baseline", type=Path, default=None, help="Result file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed fractional slowdown")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_table(results)
+
+    out = args.out or RESULTS_DIR / f"ingest-{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {out}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+
+        print(f"\nNo regressions against {args.baseline} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
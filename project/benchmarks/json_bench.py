@@ -0,0 +1,124 @@
+"""
+json_bench.py
+Compares the stdlib JSON path against the orjson / numpy / zstd response layer
+on representative session payloads.
+
+Run from the project folder:
+    python -m benchmarks.json_bench --rows 60000
+"""
+
+import argparse
+import gzip
+import json
+import random
+import time
+
+from fast_server.compression import compress, zstandard
+from fast_server.responses import dumps, records_to_columns
+
+IMU_CHANNELS = [
+    "accel_x", "accel_y", "accel_z",
+    "gyro_x", "gyro_y", "gyro_z",
+    "mag_x", "mag_y", "mag_z",
+    "yaw", "pitch", "roll",
+]
+
+
+def make_imu_rows(num_rows: int, devices: int = 4) -> list[dict]:
+    """
+    Rows shaped like DatabaseSingleton.retrieve_imu output (100 Hz per device).
+    """
+    start = time.time()
+    rows = []
+
+    for i in range(num_rows):
+        row = {
+            "id": i,
+            "frame_id": i // devices,
+            "capture_time": start + (i // devices) * 0.01,
+            "recorded_at": start + (i // devices) * 0.01 + 0.002,
+            "ingested_at": start + (i // devices) * 0.01 + 0.5,
+            "device_id": i % devices + 1,
+            "session_id": 1,
+        }
+        for ch in IMU_CHANNELS:
+            row[ch] = random.uniform(-180, 180)
+        rows.append(row)
+
+    return rows
+
+
+def timed(fn, repeat: int = 5) -> tuple[float, object]:
+    """
+    Returns the best wall time over `repeat` runs and the last result.
+    """
+    best = float("inf")
+    result = None
+
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+
+    return best, result
+
+
+def run(num_rows: int) -> list[dict]:
+    rows = make_imu_rows(num_rows)
+    payload = {"data": rows, "success": True}
+    results = []
+
+    def record(name, seconds, size):
+        results.append({"case": name, "ms": round(seconds * 1000, 2), "bytes": size})
+
+    t, body = timed(lambda: json.dumps(payload).encode())
+    record("json.dumps rows", t, len(body))
+
+    t, body = timed(lambda: dumps(payload))
+    record("orjson rows", t, len(body))
+
+    t, columns = timed(lambda: records_to_columns(rows))
+    record("rows -> numpy columns", t, 0)
+
+    col_payload = {"data": columns, "success": True}
+    t, col_body = timed(lambda: dumps(col_payload))
+    record("orjson numpy columns", t, len(col_body))
+
+    t, out = timed(lambda: gzip.compress(body, compresslevel=1))
+    record("gzip-1 rows", t, len(out))
+
+    t, out = timed(lambda: gzip.compress(body, compresslevel=6))
+    record("gzip-6 rows", t, len(out))
+
+    if zstandard is not None:
+        t, out = timed(lambda: compress(body, "zstd"))
+        record("zstd-3 rows", t, len(out))
+
+        t, out = timed(lambda: compress(col_body, "zstd"))
+        record("zstd-3 numpy columns", t, len(out))
+
+    # Websocket status broadcast (small, very frequent)
+    msg = {"type": "normal", "text": "Inserted 1000 IMU rows", "timestamp": "2025-01-01 12:00:00 PM CST"}
+    t, _ = timed(lambda: [json.dumps(msg) for _ in range(10000)])
+    record("json.dumps x10k ws msgs", t, 0)
+
+    t, _ = timed(lambda: [dumps(msg).decode() for _ in range(10000)])
+    record("orjson x10k ws msgs", t, 0)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON / compression response benchmark")
+    parser.add_argument("--rows", type=int, default=60000, help="IMU rows in the session payload")
+    args = parser.parse_args()
+
+    results = run(args.rows)
+
+    print(f"{'case':<28}{'ms':>10}{'bytes':>14}")
+    for r in results:
+        print(f"{r['case']:<28}{r['ms']:>10}{r['bytes']:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,472 @@
+"""
+load_gen.py
+asyncio load generator / soak harness for the running stack.
+Simulates many IMUs and cameras over MQTT and robot controllers over TCP at
+a fixed rate with jitter, then verifies delivery by counting the session's rows
+per device in Postgres. Reports sustained throughput, loss and the memory growth
+of the FastAPI and TCP server processes.
+
+One asyncio task (and one MQTT / TCP connection) per simulated device, so a
+single process can drive hundreds of devices without the per-row sleeps of
+tests/mqtt_tester.py and tests/tcp_test.py.
+
+Run from the project folder, against a local mosquitto / docker compose stack:
+    python -m benchmarks.load_gen --imus 200 --imu-rate 100 --robots 4 --duration 600
+    python -m benchmarks.load_gen --imus 50 --cameras 20 --duration 14400 \\
+        --watch fastapi=uvicorn --watch tcp=tcp_server.py
+
+Delivery is checked with the DB_* env vars (or LOAD_DSN) -- The servers insert into
+whatever session is active, so the run starts its own session through FastAPI
+unless --no-start is given.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+import aiohttp
+import asyncpg
+from gmqtt import Client as MQTTClient
+
+try:
+    import psutil
+except ImportError:  # Only needed for --watch
+    psutil = None
+
+BENCH_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+# Channel values come from the same generators the broker test clients use
+sys.path.insert(0, str(BENCH_DIR.parent / "tests"))
+from data_generators import create_camera_csv, create_imu_csv, create_robot_data  # noqa: E402
+
+# Distinct generator rows each device cycles through
+TEMPLATE_ROWS = 500
+
+# Robot rows all land on the TCP server's single "main" device
+ROBOT_DEVICE = "main"
+
+
+# ---------------------------------------------------------------------------
+# Payloads
+# ---------------------------------------------------------------------------
+
+def channel_templates() -> dict[str, list[str]]:
+    """
+    Sensor values only -- Frame counters and timestamps are filled in per message.
+    """
+    imu = [row.split(",", 1)[1] for row in create_imu_csv(TEMPLATE_ROWS)]                # drop time_ms
+    camera = [row.split(",", 3)[3] for row in create_camera_csv(TEMPLATE_ROWS)]          # marker + rvec + tvec
+    robot = [row.split(",", 3)[3] for row in create_robot_data(TEMPLATE_ROWS)]           # joints + pose
+
+    return {"imu": imu, "camera": camera, "robot": robot}
+
+
+# IMU and camera share the same leading fields: frame counter, capture time, recorded_at (ms)
+def mqtt_payload(frame: int, values: str) -> bytes:
+    now = time.time()
+    return f"{frame},{now:.6f},{int(now * 1000)},{values}".encode()
+
+
+def robot_line(frame: int, values: str) -> bytes:
+    now = time.time()
+    return f"{frame},{now:.6f},{now:.6f},{values}\n".encode()
+
+
+# ---------------------------------------------------------------------------
+# Simulated devices
+# ---------------------------------------------------------------------------
+
+@dataclass
+class DeviceStats:
+    stream: str
+    label: str
+    sent: int = 0
+    errors: int = 0
+    late: int = 0          # sends that started behind schedule
+    max_behind: float = 0.0
+
+
+@dataclass
+class RunState:
+    stop: asyncio.Event = field(default_factory=asyncio.Event)
+    devices: list[DeviceStats] = field(default_factory=list)
+
+
+async def paced(rate: float, jitter: float, stats: DeviceStats, stop: asyncio.Event, send) -> None:
+    """
+    Calls `send(frame)` at `rate` Hz, each period scaled by (1 +- jitter).
+    Falls behind instead of bursting when the loop or the broker cannot keep up.
+    """
+    period = 1.0 / rate
+    next_at = time.monotonic() + random.uniform(0, period)  # spread device phases
+
+    frame = 0
+    while not stop.is_set():
+
+        delay = next_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            stats.late += 1
+            stats.max_behind = max(stats.max_behind, -delay)
+
+        try:
+            await send(frame)
+            stats.sent += 1
+        except Exception:
+            stats.errors += 1
+
+        frame += 1
+        next_at += period * (1 + random.uniform(-jitter, jitter))
+
+
+async def mqtt_device(stream: str, label: str, args, templates: list[str], state: RunState) -> None:
+
+    stats = DeviceStats(stream, label)
+    state.devices.append(stats)
+
+    client = MQTTClient(f"load-{label}-{os.getpid()}")
+    await client.connect(args.mqtt_host, args.mqtt_port)
+
+    topic = f"{stream}/{label}"
+    rate = args.imu_rate if stream == "imu" else args.camera_rate
+
+    async def send(frame):
+        client.publish(topic, mqtt_payload(frame, templates[frame % len(templates)]), qos=args.qos)
+
+    try:
+        await paced(rate, args.jitter, stats, state.stop, send)
+    finally:
+        await client.disconnect()
+
+
+async def robot_device(label: str, args, templates: list[str], state: RunState) -> None:
+
+    stats = DeviceStats("robot", label)
+    state.devices.append(stats)
+
+    reader, writer = await asyncio.open_connection(args.tcp_host, args.tcp_port)
+
+    async def send(frame):
+        writer.write(robot_line(frame, templates[frame % len(templates)]))
+        await writer.drain()
+
+    try:
+        await paced(args.robot_rate, args.jitter, stats, state.stop, send)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+# ---------------------------------------------------------------------------
+# Server side: session, delivered rows, process memory
+# ---------------------------------------------------------------------------
+
+def db_kwargs() -> dict:
+
+    dsn = os.getenv("LOAD_DSN")
+    if dsn:
+        return {"dsn": dsn}
+
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "database": os.getenv("DB_NAME"),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+    }
+
+
+async def fastapi_get(args, path: str) -> dict:
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{args.fastapi_url}{path}") as resp:
+            return await resp.json()
+
+
+async def delivered_rows(conn: asyncpg.Connection, session_label: str) -> dict[tuple[str, str], int]:
+    """
+    (stream, device label) -> rows stored for the session.
+    """
+    counts = {}
+
+    for stream, table in (("imu", "imu_measurement"), ("camera", "image_detection"), ("robot", "robot")):
+        rows = await conn.fetch(f"""
+            SELECT d.label, count(*) AS n
+            FROM {table} AS t
+            JOIN session AS s ON t.session_id = s.id
+            JOIN device AS d ON t.device_id = d.id
+            WHERE s.label = $1
+            GROUP BY d.label
+        """, session_label)
+
+        for r in rows:
+            counts[(stream, r["label"])] = r["n"]
+
+    return counts
+
+
+async def wait_for_drain(conn, session_label: str, timeout: float, settle: float = 5.0) -> dict:
+    """
+    Polls the counts until they stop changing for `settle` seconds (queues flushed) or `timeout` passes.
+    """
+    deadline = time.monotonic() + timeout
+    last = await delivered_rows(conn, session_label)
+    stable_since = time.monotonic()
+
+    while time.monotonic() < deadline:
+        await asyncio.sleep(1.0)
+        counts = await delivered_rows(conn, session_label)
+
+        if counts != last:
+            last, stable_since = counts, time.monotonic()
+        elif time.monotonic() - stable_since >= settle:
+            break
+
+    return last
+
+
+def find_process(spec: str):
+    """
+    `spec` is a pid or a substring of the command line (e.g. 'uvicorn', 'tcp_server.py').
+    """
+    if spec.isdigit():
+        return psutil.Process(int(spec))
+
+    for proc in psutil.process_iter(["pid", "cmdline"]):
+        cmdline = " ".join(proc.info["cmdline"] or [])
+        if spec in cmdline and proc.pid != os.getpid():
+            return proc
+
+    raise SystemExit(f"No process matches --watch {spec!r}")
+
+
+class MemoryWatch:
+    """
+    Samples RSS of the watched server processes -- Growth over a soak is the leak signal.
+    """
+
+    def __init__(self, specs: list[str]):
+
+        if specs and psutil is None:
+            raise SystemExit("--watch needs psutil (pip install psutil)")
+
+        self.procs = {}
+        for spec in specs:
+            name, _, target = spec.partition("=")
+            self.procs[name] = find_process(target or name)
+
+        self.samples = {name: [] for name in self.procs}
+
+    def sample(self, elapsed: float) -> None:
+
+        for name, proc in self.procs.items():
+            try:
+                self.samples[name].append((elapsed, proc.memory_info().rss / 2**20))
+            except psutil.Error:
+                pass
+
+    def summary(self) -> dict:
+
+        out = {}
+        for name, points in self.samples.items():
+            if not points:
+                continue
+
+            (t0, first), (t1, last) = points[0], points[-1]
+            hours = (t1 - t0) / 3600
+
+            out[name] = {
+                "pid": self.procs[name].pid,
+                "rss_start_mb": round(first, 1),
+                "rss_end_mb": round(last, 1),
+                "rss_max_mb": round(max(mb for _, mb in points), 1),
+                "growth_mb": round(last - first, 1),
+                "growth_mb_per_hour": round((last - first) / hours, 2) if hours > 0 else None,
+            }
+
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def totals(devices: list[DeviceStats]) -> dict[str, int]:
+
+    out = {}
+    for d in devices:
+        out[d.stream] = out.get(d.stream, 0) + d.sent
+
+    return out
+
+
+async def report_progress(state: RunState, memory: MemoryWatch, started: float, interval: float) -> None:
+
+    last = totals(state.devices)
+    last_at = time.monotonic()
+
+    while not state.stop.is_set():
+        await asyncio.sleep(interval)
+
+        now = time.monotonic()
+        current = totals(state.devices)
+        memory.sample(now - started)
+
+        rates = "  ".join(
+            f"{stream} {(n - last.get(stream, 0)) / (now - last_at):,.0f}/s"
+            for stream, n in sorted(current.items())
+        )
+        late = sum(d.late for d in state.devices)
+        rss = "  ".join(f"{name} {pts[-1][1]:.0f}MB" for name, pts in memory.samples.items() if pts)
+
+        print(f"[{now - started:8.0f}s] {rates}  late={late}  {rss}", flush=True)
+        last, last_at = current, now
+
+
+async def run(args) -> dict:
+
+    templates = channel_templates()
+    memory = MemoryWatch(args.watch)
+    state = RunState()
+
+    if not args.no_start:
+        resp = await fastapi_get(args, f"/session/start/{args.session}")
+        if not resp.get("success"):
+            raise SystemExit(f"Could not start session {args.session!r}: {resp.get('error')}")
+
+    tasks = []
+    tasks += [mqtt_device("imu", f"{args.prefix}-imu-{i}", args, templates["imu"], state) for i in range(args.imus)]
+    tasks += [mqtt_device("camera", f"{args.prefix}-cam-{i}", args, templates["camera"], state) for i in range(args.cameras)]
+    tasks += [robot_device(f"{args.prefix}-robot-{i}", args, templates["robot"], state) for i in range(args.robots)]
+
+    started = time.monotonic()
+    memory.sample(0.0)
+
+    devices = [asyncio.create_task(t) for t in tasks]
+    progress = asyncio.create_task(report_progress(state, memory, started, args.report_interval))
+
+    # Devices run until the duration is up or one of them fails to connect
+    await asyncio.wait(devices, timeout=args.duration, return_when=asyncio.FIRST_EXCEPTION)
+    state.stop.set()
+    sending_seconds = time.monotonic() - started
+
+    results = await asyncio.gather(*devices, return_exceptions=True)
+    progress.cancel()
+    failures = [repr(r) for r in results if isinstance(r, Exception)]
+
+    conn = await asyncpg.connect(**db_kwargs())
+    try:
+        delivered = await wait_for_drain(conn, args.session, args.drain_timeout)
+    finally:
+        await conn.close()
+
+    memory.sample(time.monotonic() - started)
+
+    if args.stop:
+        await fastapi_get(args, "/session/stop")
+
+    return summarize(args, state, delivered, sending_seconds, memory, failures)
+
+
+def summarize(args, state: RunState, delivered: dict, seconds: float, memory: MemoryWatch, failures: list[str]) -> dict:
+
+    streams = {}
+    per_device = []
+
+    for d in state.devices:
+        # Robot rows cannot be told apart per controller on the server side
+        got = None if d.stream == "robot" else delivered.get((d.stream, d.label), 0)
+        per_device.append({"stream": d.stream, "label": d.label, "sent": d.sent, "delivered": got,
+                           "errors": d.errors, "late": d.late, "max_behind_s": round(d.max_behind, 3)})
+
+        s = streams.setdefault(d.stream, {"devices": 0, "sent": 0, "delivered": 0})
+        s["devices"] += 1
+        s["sent"] += d.sent
+
+    for (stream, label), n in delivered.items():
+        if stream in streams and (stream != "robot" or label == ROBOT_DEVICE):
+            streams[stream]["delivered"] += n
+
+    for s in streams.values():
+        s["lost"] = s["sent"] - s["delivered"]
+        s["loss_pct"] = round(100 * s["lost"] / s["sent"], 4) if s["sent"] else 0.0
+        s["sent_per_s"] = round(s["sent"] / seconds, 1)
+        s["delivered_per_s"] = round(s["delivered"] / seconds, 1)
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "session": args.session,
+        "duration_s": round(seconds, 1),
+        "config": {
+            "imus": args.imus, "imu_rate": args.imu_rate,
+            "cameras": args.cameras, "camera_rate": args.camera_rate,
+            "robots": args.robots, "robot_rate": args.robot_rate,
+            "jitter": args.jitter, "qos": args.qos,
+        },
+        "streams": streams,
+        "processes": memory.summary(),
+        "device_failures": failures,
+        "devices": per_device,
+    }
+
+
+def print_summary(results: dict) -> None:
+
+    print(f"\n{'stream':<8}{'devices':>9}{'sent':>12}{'delivered':>12}{'loss %':>9}{'rows/s':>11}")
+    for stream, s in results["streams"].items():
+        print(f"{stream:<8}{s['devices']:>9}{s['sent']:>12}{s['delivered']:>12}{s['loss_pct']:>9}{s['delivered_per_s']:>11}")
+
+    for name, p in results["processes"].items():
+        print(f"{name}: rss {p['rss_start_mb']} -> {p['rss_end_mb']} MB (max {p['rss_max_mb']}, {p['growth_mb_per_hour']} MB/h)")
+
+    if results["device_failures"]:
+        print(f"\n{len(results['device_failures'])} devices failed: {results['device_failures'][0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MQTT / TCP ingest load generator and soak harness")
+    parser.add_argument("--imus", type=int, default=10)
+    parser.add_argument("--imu-rate", type=float, default=100.0, help="Messages/s per IMU")
+    parser.add_argument("--cameras", type=int, default=0)
+    parser.add_argument("--camera-rate", type=float, default=30.0, help="Messages/s per camera")
+    parser.add_argument("--robots", type=int, default=1)
+    parser.add_argument("--robot-rate", type=float, default=125.0, help="Lines/s per robot controller")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Fractional jitter on every send period")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to send for (hours for a soak)")
+    parser.add_argument("--qos", type=int, default=0, choices=(0, 1, 2))
+    parser.add_argument("--mqtt-host", default=os.getenv("MQTT_HOST", "localhost"))
+    parser.add_argument("--mqtt-port", type=int, default=int(os.getenv("MQTT_PORT", 1883)))
+    parser.add_argument("--tcp-host", default=os.getenv("ROBOT_TCP_HOST", "localhost"))
+    parser.add_argument("--tcp-port", type=int, default=int(os.getenv("ROBOT_TCP_PORT", 5001)))
+    parser.add_argument("--fastapi-url", default=f"http://localhost:{os.getenv('FASTAPI_PORT', 8000)}")
+    parser.add_argument("--session", default=f"load-{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    parser.add_argument("--prefix", default="load", help="Device label prefix")
+    parser.add_argument("--no-start", action="store_true", help="Use the session that is already active")
+    parser.add_argument("--stop", action="store_true", help="Stop the session (and run its backup) at the end")
+    parser.add_argument("--watch", action="append", default=[], metavar="NAME=PID|CMDLINE",
+                        help="Server process to sample RSS for, e.g. fastapi=uvicorn")
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    parser.add_argument("--drain-timeout", type=float, default=120.0, help="Seconds to wait for queued rows to land")
+    parser.add_argument("--out", type=Path, default=None, help="Result file (default benchmarks/results/load-<time>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_summary(results)
+
+    out = args.out or RESULTS_DIR / f"load-{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {out}")
+
+
+if __name__ == "__main__":
+    main()
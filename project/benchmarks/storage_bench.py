@@ -0,0 +1,158 @@
+"""
+storage_bench.py
+Compares the IMU storage layouts (IMU_STORAGE=rows vs packed) on the same synthetic 100 Hz samples:
+insert rate, WAL written, on-disk size (heap + TOAST + indexes), and the cost of reading the
+session back through retrieve_imu and the CSV export.
+
+Each layout gets its own throwaway bench_<pid>_<mode> database (built by db.migrations), so
+sizes and WAL are not mixed. Same connection settings as ingest_bench -- BENCH_DSN or DB_*.
+
+Run from the project folder:
+    python -m benchmarks.storage_bench --rows 200000 --batch 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import asyncpg
+
+from benchmarks.ingest_bench import (
+    RESULTS_DIR, connect_kwargs, create_bench_database, drop_bench_database, make_imu_payloads, quiet_loggers, rss_mb,
+)
+from db import packing
+from db.database import DatabaseSingleton
+from fast_server.parsing import parse_imu_message
+
+MODES = ("rows", "packed")
+
+# What one sample costs before Postgres touches it -- 18 eight-byte columns
+RAW_SAMPLE_BYTES = len(packing.IMU_COLUMNS) * 8
+
+
+async def relation_bytes(conn, table: str) -> int:
+    return await conn.fetchval("SELECT coalesce(pg_total_relation_size(to_regclass($1)), 0)", table)
+
+
+async def bench_mode(mode: str, rows: list[dict], batch_size: int, pool_size: int, keep: bool) -> dict:
+
+    name = f"bench_{os.getpid()}_{mode}"
+    await create_bench_database(name)
+
+    try:
+        pool = await asyncpg.create_pool(**{**connect_kwargs(), "database": name}, min_size=1, max_size=pool_size)
+        db = DatabaseSingleton(pool, imu_storage=mode)
+
+        label = f"storage-{mode}"
+        await db.create_session(label)
+
+        async with db.acquire() as conn:
+            wal_start = await conn.fetchval("SELECT pg_current_wal_lsn()")
+
+        started = time.perf_counter()
+        for i in range(0, len(rows), batch_size):
+            await db.insert_imu_batch(rows[i:i + batch_size])
+        insert_s = time.perf_counter() - started
+
+        async with db.acquire() as conn:
+            wal_bytes = await conn.fetchval("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), $1)", wal_start)
+
+            table_bytes = await relation_bytes(conn, "imu_measurement") + await relation_bytes(conn, "imu_packed")
+            stored_rows = await conn.fetchval("SELECT (SELECT count(*) FROM imu_measurement) + (SELECT count(*) FROM imu_packed)")
+
+        started = time.perf_counter()
+        retrieved = await db.retrieve_imu(label)
+        retrieve_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        csv_bytes = 0
+        async for chunk in db.export_csv("imu", label):
+            csv_bytes += len(chunk)
+        export_s = time.perf_counter() - started
+
+        await pool.close()
+
+    finally:
+        if not keep:
+            await drop_bench_database(name)
+
+    samples = len(rows)
+    return {
+        "samples": samples,
+        "stored_rows": stored_rows,
+        "samples_per_row": round(samples / stored_rows, 1) if stored_rows else None,
+        "insert_s": round(insert_s, 4),
+        "samples_per_s": round(samples / insert_s, 1),
+        "wal_bytes": int(wal_bytes),
+        "wal_per_sample": round(wal_bytes / samples, 1),
+        "write_amplification": round(wal_bytes / (samples * RAW_SAMPLE_BYTES), 2),
+        "table_bytes": table_bytes,
+        "bytes_per_sample": round(table_bytes / samples, 1),
+        "retrieved": len(retrieved),
+        "retrieve_s": round(retrieve_s, 4),
+        "export_s": round(export_s, 4),
+        "export_bytes": csv_bytes,
+        "rss_mb": round(rss_mb(), 1),
+    }
+
+
+async def run(args) -> dict:
+
+    quiet_loggers()
+    rows = [parse_imu_message(topic, payload) for topic, payload in make_imu_payloads(args.rows, args.devices)]
+
+    modes = {mode: await bench_mode(mode, rows, args.batch, args.pool_size, args.keep) for mode in MODES}
+
+    rows_mode, packed = modes["rows"], modes["packed"]
+    ratios = {
+        key: round(packed[key] / rows_mode[key], 3) if rows_mode[key] else None
+        for key in ("insert_s", "wal_bytes", "table_bytes", "retrieve_s", "export_s")
+    }
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "rows": args.rows,
+        "batch": args.batch,
+        "devices": args.devices,
+        "chunk_seconds": packing.IMU_CHUNK_SECONDS,
+        "modes": modes,
+        "packed_vs_rows": ratios,
+    }
+
+
+def print_table(results: dict) -> None:
+
+    keys = ("samples_per_row", "samples_per_s", "wal_per_sample", "write_amplification", "bytes_per_sample", "retrieve_s", "export_s")
+
+    print(f"{'':<22}" + "".join(f"{mode:>14}" for mode in MODES))
+    for key in keys:
+        print(f"{key:<22}" + "".join(f"{results['modes'][mode][key]:>14}" for mode in MODES))
+
+    print("\npacked / rows: " + ", ".join(f"{k} {v}" for k, v in results["packed_vs_rows"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IMU row vs packed storage benchmark")
+    parser.add_argument("--rows", type=int, default=200000, help="IMU samples written per layout")
+    parser.add_argument("--batch", type=int, default=int(os.getenv("BATCHES", 200)), help="Samples per insert_imu_batch call")
+    parser.add_argument("--devices", type=int, default=4, help="IMU devices the samples are spread across")
+    parser.add_argument("--pool-size", type=int, default=4, help="Max connections in the bench pool")
+    parser.add_argument("--keep", action="store_true", help="Keep the bench databases after the run")
+    parser.add_argument("--out", type=Path, default=None, help="Result file (default benchmarks/results/storage-<time>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_table(results)
+
+    out = args.out or RESULTS_DIR / f"storage-{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import asyncio, hashlib, json, os, shutil, time, zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from db import backups, partitions
+from db.backups import BackupFailed
+
+# Bumped when the layout below changes -- restore refuses archives it does not know
+ARCHIVE_FORMAT = 1
+
+# Every table holding per-session rows, in restore order -- Rollups are copied rather than rebuilt so the archive is self-contained
+ARCHIVE_TABLES = ("imu_measurement", "image_detection", "robot", "imu_packed", "rollup_1s", "rollup_1m", "ingest_gap")
+
+# Serial ids are not archived -- The live database hands out new ones on restore
+SKIPPED_COLUMNS = ("id",)
+
+# Bytes per file read / zlib chunk
+CHUNK_BYTES = 1 << 20
+
+COMPRESS_LEVEL = int(os.getenv("ARCHIVE_COMPRESS_LEVEL", 6))
+
+MANIFEST = "manifest.json"
+
+TABLE_COLUMNS = """
+    SELECT column_name
+    FROM information_schema.columns
+    WHERE table_schema = current_schema() AND table_name = $1
+    ORDER BY ordinal_position
+"""
+
+SESSION_ROW = "SELECT id, label, started_at, ended_at FROM session WHERE label = $1"
+
+SESSION_DEVICES = """
+    SELECT d.id, d.label, d.category, d.ip_address, d.registered_at
+    FROM device AS d
+    JOIN session_device AS sd ON sd.device_id = d.id
+    WHERE sd.session_id = $1
+    ORDER BY d.id
+"""
+
+# Looks the label up and returns its id either way -- The no-op update makes RETURNING fire on conflict too
+UPSERT_DEVICE = """
+    INSERT INTO device (label, category, ip_address, registered_at)
+    VALUES ($1, $2, $3, $4)
+    ON CONFLICT (label) DO UPDATE SET label = EXCLUDED.label
+    RETURNING id
+"""
+
+
+# A session archive is a directory -- manifest.json plus one gzip'd CSV COPY stream per table
+def archive_path(now: float, label: str) -> Path:
+    ts = datetime.fromtimestamp(now, tz=timezone.utc).strftime("%Y%m%d_%H%M%S_UTC")
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)
+    return backups.BACKUP_DIR / f"session_{safe}_{ts}.archive"
+
+
+def is_archive(path: Path) -> bool:
+    return (path / MANIFEST).is_file()
+
+
+async def table_columns(conn, table: str) -> list[str]:
+    return [r["column_name"] for r in await conn.fetch(TABLE_COLUMNS, table)]
+
+
+def _row_count(status: str) -> int:
+
+    # COPY reports "COPY <n>"
+    return int(status.split()[-1]) if status else 0
+
+
+# Compresses a COPY stream into one file while hashing what lands on disk -- Writes go through a thread, the mount is NFS
+class _GzipWriter:
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.zip = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+        self.sha256 = hashlib.sha256()
+        self.raw_bytes = 0
+        self.bytes = 0
+
+    async def _write(self, data: bytes) -> None:
+
+        if data:
+            self.sha256.update(data)
+            self.bytes += len(data)
+            await asyncio.to_thread(self.file.write, data)
+
+    async def __call__(self, chunk: bytes) -> None:
+        self.raw_bytes += len(chunk)
+        await self._write(self.zip.compress(chunk))
+
+    async def close(self) -> None:
+        await self._write(self.zip.flush())
+        await asyncio.to_thread(self.file.close)
+
+
+async def _gunzip(path: Path):
+
+    unzip = zlib.decompressobj(31)
+    with open(path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, CHUNK_BYTES):
+            if data := unzip.decompress(chunk):
+                yield data
+
+    if tail := unzip.flush():
+        yield tail
+
+
+def _sha256(path: Path) -> str:
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_BYTES):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+def read_manifest(path: Path) -> dict:
+
+    try:
+        manifest = json.loads((path / MANIFEST).read_text())
+    except (OSError, ValueError) as e:
+        raise BackupFailed(f"Unreadable session archive {path.name}: {e}")
+
+    if manifest.get("format") != ARCHIVE_FORMAT:
+        raise BackupFailed(f"Unsupported session archive format: {manifest.get('format')}", manifest)
+
+    return manifest
+
+
+# Streams one session's rows out of every table with COPY -- One REPEATABLE READ snapshot, so the tables agree with each other
+async def export_session(conn, label: str, out: Path | None = None, progress=None) -> dict:
+
+    started = time.time()
+
+    async with conn.transaction(isolation="repeatable_read", readonly=True):
+
+        session = await conn.fetchrow(SESSION_ROW, label)
+        if session is None:
+            raise BackupFailed(f"Unknown session: {label}")
+
+        out = out or archive_path(started, label)
+        await asyncio.to_thread(out.mkdir, parents=True, exist_ok=False)
+
+        manifest = {
+            "format": ARCHIVE_FORMAT,
+            "created_at": started,
+            "database": os.environ.get("PGDATABASE"),
+            "schema_version": await conn.fetchval("SELECT max(version) FROM schema_migrations"),
+            "session": dict(session),
+            "devices": [dict(r) for r in await conn.fetch(SESSION_DEVICES, session["id"])],
+            "tables": {},
+        }
+
+        try:
+            for i, table in enumerate(ARCHIVE_TABLES):
+
+                columns = [c for c in await table_columns(conn, table) if c not in SKIPPED_COLUMNS]
+                if not columns:
+                    continue  # Older schema without this table
+
+                # Partitioned tables get the partition key predicate so only the session's partition is scanned
+                if table in partitions.PARTITIONED_TABLES:
+                    where, args = partitions.session_predicate("t", session)
+                else:
+                    where, args = "t.session_id = $1", [session["id"]]
+
+                select = f"SELECT {', '.join(f't.{c}' for c in columns)} FROM {table} AS t WHERE {where}"
+
+                writer = _GzipWriter(out / f"{table}.csv.gz")
+                try:
+                    status = await conn.copy_from_query(select, *args, output=writer, format="csv")
+                finally:
+                    await writer.close()
+
+                manifest["tables"][table] = {
+                    "file": writer.path.name,
+                    "columns": columns,
+                    "rows": _row_count(status),
+                    "raw_bytes": writer.raw_bytes,
+                    "bytes": writer.bytes,
+                    "sha256": writer.sha256.hexdigest(),
+                }
+
+                if progress is not None:
+                    done = i + 1
+                    await progress({
+                        "percent": round(100.0 * done / len(ARCHIVE_TABLES), 1),
+                        "tables_done": done,
+                        "tables": len(ARCHIVE_TABLES),
+                        "table": table,
+                    })
+
+        except BaseException:
+            await asyncio.to_thread(shutil.rmtree, out, True)
+            raise
+
+    manifest["duration_s"] = round(time.time() - started, 3)
+    manifest["rows"] = sum(t["rows"] for t in manifest["tables"].values())
+    manifest["bytes"] = sum(t["bytes"] for t in manifest["tables"].values())
+
+    # Written last -- A directory without a manifest is an unfinished export
+    await asyncio.to_thread((out / MANIFEST).write_text, json.dumps(manifest, indent=2, default=str))
+
+    return {**manifest, "path": str(out)}
+
+
+# Compares every table file against its manifest checksum -- Returns the files that do not match
+async def verify_archive(path: Path, manifest: dict | None = None) -> list[str]:
+
+    manifest = manifest or read_manifest(path)
+    bad = []
+
+    for entry in manifest["tables"].values():
+        file = path / entry["file"]
+        if not file.is_file() or await asyncio.to_thread(_sha256, file) != entry["sha256"]:
+            bad.append(entry["file"])
+
+    return bad
+
+
+# Appends an archived session to the live database -- The session gets a new id, devices are matched by label
+# All in one transaction, so a failed restore leaves nothing behind; `label` renames it when the original is taken
+async def restore_session(conn, path: Path, label: str | None = None) -> dict:
+
+    manifest = read_manifest(path)
+
+    bad = await verify_archive(path, manifest)
+    if bad:
+        raise BackupFailed(f"Session archive {path.name} failed verification: {', '.join(bad)}", bad)
+
+    session = manifest["session"]
+    label = label or session["label"]
+
+    async with conn.transaction():
+
+        if await conn.fetchval("SELECT id FROM session WHERE label = $1", label) is not None:
+            raise BackupFailed(f"Session label [{label}] already exists. Restore it under another label.", label)
+
+        session_id = await conn.fetchval(
+            "INSERT INTO session (label, started_at, ended_at) VALUES ($1, $2, $3) RETURNING id",
+            label, session["started_at"], session["ended_at"]
+        )
+        await partitions.session_created(conn, session_id)
+
+        # Archived device id -> live device id
+        old_ids, new_ids = [], []
+        for d in manifest["devices"]:
+            new_id = await conn.fetchval(UPSERT_DEVICE, d["label"], d["category"], d["ip_address"], d["registered_at"])
+            await conn.execute("INSERT INTO session_device (device_id, session_id) VALUES ($1, $2)", new_id, session_id)
+            old_ids.append(d["id"])
+            new_ids.append(new_id)
+
+        rows = {}
+        for table in ARCHIVE_TABLES:
+
+            entry = manifest["tables"].get(table)
+            if entry is None:
+                continue
+
+            live = await table_columns(conn, table)
+            missing = [c for c in entry["columns"] if c not in live]
+            if missing:
+                raise BackupFailed(f"{table} has no column(s) {', '.join(missing)} -- Migrate the database first", missing)
+
+            # COPY into a scratch copy of the table, then rewrite the ids on the way into the real one
+            stage = f"restore_{table}"
+            # Only the archived columns -- LIKE would carry over NOT NULL on the id the archive leaves out
+            await conn.execute(f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {', '.join(entry['columns'])} FROM {table} WITH NO DATA")
+            await conn.copy_to_table(stage, source=_gunzip(path / entry["file"]), columns=entry["columns"], format="csv")
+
+            remapped = {
+                "session_id": "$1::integer",
+                "device_id": "m.new_id",
+            }
+            select = ", ".join(remapped.get(c, f"s.{c}") for c in entry["columns"])
+
+            status = await conn.execute(f"""
+                INSERT INTO {table} ({", ".join(entry["columns"])})
+                SELECT {select}
+                FROM {stage} AS s
+                LEFT JOIN unnest($2::integer[], $3::integer[]) AS m(old_id, new_id) ON m.old_id = s.device_id
+            """, session_id, old_ids, new_ids)
+
+            rows[table] = _row_count(status)
+            if rows[table] != entry["rows"]:
+                raise BackupFailed(f"{table}: restored {rows[table]} rows, archive has {entry['rows']}", rows)
+
+    return {"session_id": session_id, "label": label, "rows": rows}
@@ -0,0 +1,186 @@
+import asyncio, os, re, shutil
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable
+
+# Mounted in docker -- Must match compose
+BACKUP_DIR = Path(os.getenv("BACKUP_DIR", "/db_backups"))
+
+# pg_dump -j workers -- Each one holds its own connection for the whole dump
+BACKUP_JOBS = int(os.getenv("BACKUP_JOBS", 4))
+
+# directory (pg_dump -F d, one copy per backup) or chunked (db.chunkstore, deduplicated across backups)
+BACKUP_FORMAT = os.getenv("BACKUP_FORMAT", "directory").lower()
+
+# Progress is published at most this often (percent of table bytes)
+PROGRESS_STEP = 5.0
+
+# Tables pg_dump writes data for, with their on-disk size -- Weights the progress so one huge table is not 1/N
+TABLE_SIZES = """
+    SELECT c.relname AS name, pg_total_relation_size(c.oid) AS bytes
+    FROM pg_class AS c
+    JOIN pg_namespace AS n ON n.oid = c.relnamespace
+    WHERE c.relkind = 'r'
+    AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+    AND n.nspname NOT LIKE 'pg_toast%'
+"""
+
+# -v lines that mean a table's data is done -- Parallel workers report "finished item", a serial dump "dumping contents",
+# pg_restore "processing data" as it starts each table
+_FINISHED = (
+    re.compile(r"finished item \d+ TABLE DATA (?:\S+ )?(\S+)$"),
+    re.compile(r'dumping contents of table "(?:[^"]+\.)?([^"]+)"'),
+    re.compile(r'processing data for table "(?:[^"]+\.)?([^"]+)"'),
+)
+
+
+class BackupFailed(Exception):
+
+    def __init__(self, message, data=None):
+        super().__init__(message)
+        self.data = data
+        self.message = message
+
+
+def backup_path(now: float, database: str) -> Path:
+    ts = datetime.fromtimestamp(now, tz=timezone.utc).strftime("%Y%m%d_%H%M%S_UTC")
+    return BACKUP_DIR / f"{database}_{ts}.dir"
+
+
+async def table_sizes(conn) -> dict[str, int]:
+    return {r["name"]: r["bytes"] for r in await conn.fetch(TABLE_SIZES)}
+
+
+# Turns pg_dump / pg_restore -v output into a percentage of table bytes done
+class DumpProgress:
+
+    def __init__(self, sizes: dict[str, int]):
+        self.sizes = sizes
+        self.total = sum(sizes.values())
+        self.done: set[str] = set()
+        self.bytes_done = 0
+        self.reported = -PROGRESS_STEP
+
+    def feed(self, line: str) -> bool:
+
+        for pattern in _FINISHED:
+            m = pattern.search(line)
+            if m and m.group(1) not in self.done:
+                self.done.add(m.group(1))
+                self.bytes_done += self.sizes.get(m.group(1), 0)
+                return True
+
+        return False
+
+    @property
+    def percent(self) -> float:
+
+        if self.total:
+            return round(min(100.0 * self.bytes_done / self.total, 100.0), 1)
+
+        return round(100.0 * len(self.done) / len(self.sizes), 1) if self.sizes else 0.0
+
+    # True once per PROGRESS_STEP -- Keeps the misc websocket from getting one message per table
+    def due(self) -> bool:
+
+        if self.percent - self.reported >= PROGRESS_STEP:
+            self.reported = self.percent
+            return True
+
+        return False
+
+    def snapshot(self) -> dict:
+
+        return {
+            "percent": self.percent,
+            "tables_done": len(self.done),
+            "tables": len(self.sizes),
+            "bytes_done": self.bytes_done,
+            "bytes": self.total,
+        }
+
+
+# Runs pg_dump / pg_restore as an asyncio subprocess -- The event loop keeps serving ingest while it runs
+# `cleanup` is removed if the tool fails or the job is cancelled
+async def _run(cmd: list[str], password: str, sizes: dict[str, int], progress, cleanup: Path | None = None) -> None:
+
+    env = {**os.environ, "PGPASSWORD": password}
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, env=env, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+
+    tracker = DumpProgress(sizes)
+    tail = deque(maxlen=20)
+
+    try:
+        async for raw in proc.stderr:
+            line = raw.decode(errors="replace").rstrip()
+            tail.append(line)
+
+            if tracker.feed(line) and progress is not None and tracker.due():
+                await progress(tracker.snapshot())
+
+        code = await proc.wait()
+
+    # Job cancelled or the server shutting down -- Do not leave pg_dump workers behind
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        if cleanup is not None:
+            shutil.rmtree(cleanup, ignore_errors=True)
+        raise
+
+    if code != 0:
+        if cleanup is not None:
+            shutil.rmtree(cleanup, ignore_errors=True)
+        errors = [line for line in tail if "error" in line.lower()] or list(tail)[-1:]
+        raise BackupFailed(f"{cmd[0]} exited with {code}: {' | '.join(errors)}", list(tail))
+
+    if progress is not None and tracker.reported < 100.0:
+        tracker.bytes_done, tracker.done = tracker.total, set(sizes)
+        await progress(tracker.snapshot())
+
+
+# Parallel directory-format dump of the live database
+# `compress` is pg_dump's -Z -- db.chunkstore dumps uncompressed so unchanged table data stays byte-identical
+async def pg_dump(out: Path, sizes: dict[str, int], progress: Callable[[dict], Awaitable] | None = None,
+                  jobs: int = BACKUP_JOBS, compress: int | None = None) -> Path:
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+
+    cmd = [
+        "pg_dump",
+        "-h", os.environ.get("PGHOST", "database"),
+        "-p", os.environ.get("PGPORT", "5432"),
+        "-U", os.environ["PGUSER"],
+        "-d", os.environ["PGDATABASE"],
+        "-F", "d",
+        "-j", str(jobs),
+        *(["-Z", str(compress)] if compress is not None else []),
+        "-v",
+        "-f", str(out),
+    ]
+
+    await _run(cmd, os.environ["PGPASSWORD"], sizes, progress, cleanup=out)
+    return out
+
+
+# Loads a backup into `database` -- Directory-format backups restore with BACKUP_JOBS workers, .dump files serially
+async def pg_restore(path: Path, database: str, host: str, port: str, user: str, password: str,
+                     sizes: dict[str, int] | None = None, progress: Callable[[dict], Awaitable] | None = None,
+                     jobs: int = BACKUP_JOBS) -> None:
+
+    cmd = [
+        "pg_restore",
+        "-h", host,
+        "-p", str(port),
+        "-U", user,
+        "-d", database,
+        *(["-j", str(jobs)] if path.is_dir() else []),
+        "-v",
+        str(path),
+    ]
+
+    await _run(cmd, password, sizes or {}, progress)
@@ -0,0 +1,206 @@
+import asyncio, hashlib, json, os, time
+from pathlib import Path
+from db import archives, backups, chunkstore
+from fast_server import loggers
+
+# Index of everything in BACKUP_DIR -- Lives next to the backups so it moves with the NAS share
+CATALOG_NAME = "catalog.json"
+
+# Backups are re-hashed in the background once this old -- 0 turns verification off
+BACKUP_VERIFY_INTERVAL = float(os.getenv("BACKUP_VERIFY_INTERVAL", 86400))
+
+# How often the verifier wakes up to look for stale entries
+BACKUP_VERIFY_POLL = float(os.getenv("BACKUP_VERIFY_POLL", 600))
+
+CHUNK_BYTES = 1 << 20
+
+
+# directory (pg_dump -F d), custom (the older -F c .dump files), session (db.archives) or chunked (db.chunkstore)
+# None for anything else
+def backup_format(path: Path) -> str | None:
+
+    if archives.is_archive(path):
+        return "session"
+    if chunkstore.is_manifest(path):
+        return "chunked"
+    if (path / "toc.dat").is_file():
+        return "directory"
+    if path.is_file() and path.suffix == ".dump":
+        return "custom"
+
+    return None
+
+
+def _sha256(path: Path) -> str:
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_BYTES):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+# Per-file digests plus one digest over them -- A directory backup is checked file by file, a .dump as a single file
+def fingerprint(path: Path) -> dict:
+
+    files = [path] if path.is_file() else sorted(p for p in path.rglob("*") if p.is_file())
+    digests = {str(p.relative_to(path)) if p != path else p.name: _sha256(p) for p in files}
+
+    total = hashlib.sha256()
+    for name, digest in digests.items():
+        total.update(f"{name} {digest}\n".encode())
+
+    return {
+        "bytes": sum(p.stat().st_size for p in files),
+        "sha256": total.hexdigest(),
+        "files": digests,
+    }
+
+
+class BackupCatalog:
+
+    def __init__(self, folder: Path = backups.BACKUP_DIR):
+        self.folder = folder
+        self.path = folder / CATALOG_NAME
+        self.entries: dict[str, dict] | None = None
+        self._lock = asyncio.Lock()
+
+    async def load(self) -> dict[str, dict]:
+
+        if self.entries is None:
+            try:
+                data = json.loads(await asyncio.to_thread(self.path.read_text))
+                self.entries = {e["name"]: e for e in data.get("backups", [])}
+            except FileNotFoundError:
+                self.entries = {}
+            except (OSError, ValueError) as e:
+                loggers.log_system_logger(f"Backup catalog unreadable, rebuilding: {e}", True)
+                self.entries = {}
+
+        return self.entries
+
+    # Written to a temp file and renamed -- A reader never sees half a catalog
+    async def _save(self) -> None:
+
+        data = json.dumps({"updated_at": time.time(), "backups": list(self.entries.values())}, indent=2, default=str)
+        tmp = self.path.with_suffix(".tmp")
+
+        def write():
+            tmp.write_text(data)
+            os.replace(tmp, self.path)
+
+        await asyncio.to_thread(write)
+
+    # Newest first -- Straight from memory, no directory listing
+    async def listing(self) -> list[dict]:
+
+        entries = await self.load()
+        return sorted(entries.values(), key=lambda e: e.get("created_at") or 0, reverse=True)
+
+    # Adds a finished backup -- Hashing happens here, once, instead of on every listing
+    async def record(self, path: Path, sessions: list[str] | None = None, duration_s: float | None = None,
+                     created_at: float | None = None) -> dict:
+
+        path = Path(path)
+        info = await asyncio.to_thread(fingerprint, path)
+
+        entry = {
+            "name": path.name,
+            "format": backup_format(path),
+            "created_at": created_at or time.time(),
+            "duration_s": round(duration_s, 3) if duration_s is not None else None,
+            "sessions": sessions,
+            **info,
+            "status": "ok",
+            "verified_at": time.time(),
+            "problems": [],
+        }
+
+        async with self._lock:
+            await self.load()
+            self.entries[entry["name"]] = entry
+            await self._save()
+
+        return entry
+
+    # Re-hashes one backup against its recorded digests
+    async def verify(self, name: str) -> dict:
+
+        entry = (await self.load())[name]
+        path = self.folder / name
+
+        if not path.exists():
+            status, problems = "missing", [name]
+        else:
+            info = await asyncio.to_thread(fingerprint, path)
+            problems = sorted(
+                f for f in set(entry["files"]) | set(info["files"])
+                if entry["files"].get(f) != info["files"].get(f)
+            )
+
+            # A chunked backup's manifest is only an index -- The chunks it points at are checked too
+            if entry.get("format") == "chunked":
+                problems += await asyncio.to_thread(chunkstore.verify_manifest, path)
+
+            status = "corrupt" if problems else "ok"
+
+        async with self._lock:
+            entry.update(status=status, problems=problems, verified_at=time.time())
+            await self._save()
+
+        if status != "ok":
+            loggers.log_system_logger(f"Backup {name} failed verification ({status}): {', '.join(problems[:10])}", True)
+
+        return entry
+
+    # Catalogs backups it has never seen (made before the catalog existed, or copied onto the share by hand)
+    async def reconcile(self) -> list[str]:
+
+        await self.load()
+
+        found = await asyncio.to_thread(
+            lambda: sorted(p for p in self.folder.iterdir() if p.name not in self.entries and backup_format(p))
+            if self.folder.is_dir() else []
+        )
+
+        for path in found:
+            sessions = None
+            if backup_format(path) == "session":
+                sessions = [archives.read_manifest(path)["session"]["label"]]
+
+            await self.record(path, sessions=sessions, created_at=path.stat().st_mtime)
+
+        return [p.name for p in found]
+
+    # Entries whose last check is older than BACKUP_VERIFY_INTERVAL, oldest first
+    def stale(self, now: float | None = None) -> list[str]:
+
+        now = now or time.time()
+        due = [e for e in self.entries.values() if now - (e.get("verified_at") or 0) >= BACKUP_VERIFY_INTERVAL]
+        return [e["name"] for e in sorted(due, key=lambda e: e.get("verified_at") or 0)]
+
+    # Background task -- Catalogs unknown backups once, then keeps re-verifying stale ones, one at a time
+    async def run(self, poll: float = BACKUP_VERIFY_POLL) -> None:
+
+        try:
+            added = await self.reconcile()
+            if added:
+                loggers.log_system_logger(f"Backup catalog added {len(added)} existing backups")
+        except Exception as e:
+            loggers.log_system_logger(f"Backup catalog reconcile failed: {e}", True)
+
+        if BACKUP_VERIFY_INTERVAL <= 0:
+            return
+
+        while True:
+            for name in self.stale():
+                try:
+                    await self.verify(name)
+                except Exception as e:
+                    loggers.log_system_logger(f"Backup {name} verification failed: {e}", True)
+
+            await asyncio.sleep(poll)
+
+
+catalog = BackupCatalog()
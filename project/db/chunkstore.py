@@ -0,0 +1,369 @@
+"""
+Content-defined, deduplicating backup store.
+
+A chunked backup is an uncompressed directory-format pg_dump (-F d -Z 0) cut into content-defined chunks.
+Each chunk is stored once under BACKUP_DIR/chunks by its sha256, zstd-compressed, and the backup itself is
+only a manifest listing every dump file's chunks. Old sessions never change, so their table data cuts into
+the same chunks every night -- A new backup writes only the chunks the store has not seen.
+
+Cut points come from a gear hash over the last CHUNK_AVG_BITS bytes, so an insert early in a file shifts
+the bytes after it without moving the later boundaries. Restore reassembles the dump files in parallel into
+a scratch directory and hands that to pg_restore.
+
+    python -m db.chunkstore stats | verify <manifest> | gc
+"""
+
+import asyncio, hashlib, json, os, shutil, sys, tempfile, threading, time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import numpy as np
+import zstandard
+
+from db import backups
+from db.backups import BackupFailed
+
+# Chunk objects -- chunks/<first two hex>/<sha256>.zst
+CHUNK_DIR = backups.BACKUP_DIR / "chunks"
+
+# Manifests sit next to the other backups -- The suffix is how the catalog tells them apart
+MANIFEST_SUFFIX = ".chunked.json"
+MANIFEST_FORMAT = 1
+
+# Average chunk is 2**CHUNK_AVG_BITS bytes -- Min / max keep tiny and runaway chunks out
+CHUNK_AVG_BITS = int(os.getenv("CHUNK_AVG_BITS", 20))
+CHUNK_MIN_BYTES = int(os.getenv("CHUNK_MIN_BYTES", 1 << 18))
+CHUNK_MAX_BYTES = int(os.getenv("CHUNK_MAX_BYTES", 1 << 22))
+
+# Bytes hashed per numpy pass -- Small enough that the hash passes stay in cache
+READ_BLOCK = 1 << 16
+
+CHUNK_ZSTD_LEVEL = int(os.getenv("CHUNK_ZSTD_LEVEL", 3))
+
+# The uncompressed dump is written and reassembled here -- Local disk, only new chunks cross to the NAS
+SCRATCH_DIR = Path(os.getenv("BACKUP_SCRATCH_DIR", tempfile.gettempdir()))
+
+# One random 32-bit value per byte value -- Fixed seed, boundaries must be the same on every run
+GEAR = np.random.default_rng(0x6D616E75).integers(0, 2 ** 32, 256, dtype=np.uint64).astype(np.uint32)
+
+
+def manifest_path(now: float, database: str) -> Path:
+    return backups.backup_path(now, database).with_suffix(MANIFEST_SUFFIX)
+
+
+def is_manifest(path: Path) -> bool:
+    return path.is_file() and path.name.endswith(MANIFEST_SUFFIX)
+
+
+def chunk_path(digest: str, store: Path | None = None) -> Path:
+    return (store or CHUNK_DIR) / digest[:2] / f"{digest}.zst"
+
+
+# ---------------------------------------------------------------------------
+# Chunking
+# ---------------------------------------------------------------------------
+
+# Gear hash at every byte of `data` -- The low `bits` bits only depend on the last `bits` bytes, so the hash
+# is a sum of shifted copies of the gear values. Windows of 1, 2, 4, ... bytes are built by doubling and then
+# combined, log2(bits) numpy passes instead of a byte-at-a-time loop
+def gear_hash(data: np.ndarray, bits: int = CHUNK_AVG_BITS) -> np.ndarray:
+
+    windows = {1: GEAR[data]}
+    width = 1
+    while width * 2 <= bits:
+        h = windows[width].copy()
+        h[width:] += windows[width][:-width] << np.uint32(width)
+        width *= 2
+        windows[width] = h
+
+    h, covered = None, 0
+    for width in sorted(windows, reverse=True):
+        if covered + width > bits:
+            continue
+        if h is None:
+            h = windows[width].copy()
+        else:
+            h[covered:] += windows[width][:-covered] << np.uint32(covered)
+        covered += width
+
+    return h
+
+
+# Cuts a byte stream into content-defined chunks -- Yields bytes, the concatenation is the stream
+def split(stream, bits: int = CHUNK_AVG_BITS, min_size: int = CHUNK_MIN_BYTES, max_size: int = CHUNK_MAX_BYTES,
+          block: int = READ_BLOCK):
+
+    mask = np.uint32((1 << bits) - 1)
+    history = np.zeros(0, dtype=np.uint8)  # The previous block's last bytes -- The hash window spans blocks
+    buf = bytearray()  # Bytes since the last cut
+
+    while data := stream.read(block):
+
+        window = np.concatenate([history, np.frombuffer(data, dtype=np.uint8)])
+        h = gear_hash(window, bits)[len(history):]
+        history = window[-(bits - 1):] if bits > 1 else history
+
+        offset = len(buf)
+        buf += data
+        start = 0
+
+        # A candidate cuts after its byte -- Skipped if too close to the last cut, forced cuts past max_size
+        for cut in (np.flatnonzero((h & mask) == 0) + 1 + offset).tolist():
+            while cut - start > max_size:
+                yield bytes(buf[start:start + max_size])
+                start += max_size
+
+            if cut - start >= min_size:
+                yield bytes(buf[start:cut])
+                start = cut
+
+        while len(buf) - start > max_size:
+            yield bytes(buf[start:start + max_size])
+            start += max_size
+
+        del buf[:start]
+
+    if buf:
+        yield bytes(buf)
+
+
+# ---------------------------------------------------------------------------
+# Store
+# ---------------------------------------------------------------------------
+
+# Writes a chunk unless the store has it -- Temp file + rename, a crash never leaves half a chunk under its hash
+def put_chunk(data: bytes, store: Path | None = None) -> tuple[str, int]:
+
+    digest = hashlib.sha256(data).hexdigest()
+    path = chunk_path(digest, store)
+
+    if path.exists():
+        return digest, 0
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    packed = zstandard.ZstdCompressor(level=CHUNK_ZSTD_LEVEL).compress(data)
+
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(packed)
+    os.replace(tmp, path)
+
+    return digest, len(packed)
+
+
+def get_chunk(digest: str, store: Path | None = None) -> bytes:
+
+    try:
+        data = zstandard.ZstdDecompressor().decompress(chunk_path(digest, store).read_bytes())
+    except zstandard.ZstdError as e:
+        raise BackupFailed(f"Chunk {digest} is corrupt: {e}", digest)
+
+    if hashlib.sha256(data).hexdigest() != digest:
+        raise BackupFailed(f"Chunk {digest} is corrupt", digest)
+
+    return data
+
+
+# Chunks one dump file into the store -- Returns its manifest entry and the bytes newly written
+def store_file(path: Path, store: Path | None = None) -> tuple[dict, int, int]:
+
+    chunks, new_bytes, new_chunks = [], 0, 0
+    whole = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        for data in split(f):
+            whole.update(data)
+            digest, written = put_chunk(data, store)
+            chunks.append([digest, len(data)])
+            new_bytes += written
+            new_chunks += written > 0
+
+    entry = {"size": sum(size for _, size in chunks), "sha256": whole.hexdigest(), "chunks": chunks}
+    return entry, new_bytes, new_chunks
+
+
+# Rebuilds one dump file from its chunks
+def restore_file(entry: dict, out: Path, store: Path | None = None) -> None:
+
+    whole = hashlib.sha256()
+
+    with open(out, "wb") as f:
+        for digest, _ in entry["chunks"]:
+            data = get_chunk(digest, store)
+            whole.update(data)
+            f.write(data)
+
+    if whole.hexdigest() != entry["sha256"]:
+        raise BackupFailed(f"{out.name} reassembled with the wrong checksum", out.name)
+
+
+def read_manifest(path: Path) -> dict:
+
+    try:
+        manifest = json.loads(path.read_text())
+    except (OSError, ValueError) as e:
+        raise BackupFailed(f"Unreadable chunk manifest {path.name}: {e}")
+
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise BackupFailed(f"Unsupported chunk manifest format: {manifest.get('format')}", manifest)
+
+    return manifest
+
+
+# Runs `fn` over every file with at most `jobs` threads at once
+async def _parallel(fn, items, jobs: int):
+
+    slots = asyncio.Semaphore(jobs)
+
+    async def one(item):
+        async with slots:
+            return await asyncio.to_thread(fn, item)
+
+    return await asyncio.gather(*(one(item) for item in items))
+
+
+# Chunks a finished dump directory into the store and writes its manifest
+async def store_dump(dump: Path, out: Path, store: Path | None = None, jobs: int = backups.BACKUP_JOBS,
+                     extra: dict | None = None) -> dict:
+
+    started = time.perf_counter()
+    files = sorted(p.name for p in dump.iterdir() if p.is_file())
+
+    results = await _parallel(lambda name: store_file(dump / name, store), files, jobs)
+
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "created_at": time.time(),
+        **(extra or {}),
+        "files": {name: entry for name, (entry, _, _) in zip(files, results)},
+        "bytes": sum(entry["size"] for entry, _, _ in results),
+        "chunks": sum(len(entry["chunks"]) for entry, _, _ in results),
+        "new_bytes": sum(new for _, new, _ in results),
+        "new_chunks": sum(new for _, _, new in results),
+        "store_s": round(time.perf_counter() - started, 3),
+    }
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, out)
+
+    return manifest
+
+
+# pg_dump -F d -Z 0 into scratch, chunk it into the store, drop the scratch copy -- Returns the manifest path
+async def backup(sizes: dict[str, int], progress=None, jobs: int = backups.BACKUP_JOBS) -> Path:
+
+    out = manifest_path(time.time(), os.environ["PGDATABASE"])
+    SCRATCH_DIR.mkdir(parents=True, exist_ok=True)
+    dump = Path(tempfile.mkdtemp(prefix="chunked_", dir=SCRATCH_DIR)) / "dump"
+
+    try:
+        started = time.perf_counter()
+        await backups.pg_dump(dump, sizes, progress, jobs=jobs, compress=0)
+        dump_s = time.perf_counter() - started
+
+        await store_dump(dump, out, jobs=jobs, extra={"database": os.environ["PGDATABASE"], "dump_s": round(dump_s, 3)})
+
+    finally:
+        await asyncio.to_thread(shutil.rmtree, dump.parent, True)
+
+    return out
+
+
+# Reassembles a chunked backup into a scratch directory pg_restore can read -- Removed on exit
+@asynccontextmanager
+async def materialized(path: Path, store: Path | None = None, jobs: int = backups.BACKUP_JOBS):
+
+    if not is_manifest(path):
+        yield path
+        return
+
+    manifest = await asyncio.to_thread(read_manifest, path)
+
+    SCRATCH_DIR.mkdir(parents=True, exist_ok=True)
+    scratch = Path(tempfile.mkdtemp(prefix="restore_", dir=SCRATCH_DIR))
+
+    try:
+        files = manifest["files"]
+        await _parallel(lambda name: restore_file(files[name], scratch / name, store), list(files), jobs)
+        yield scratch
+
+    finally:
+        await asyncio.to_thread(shutil.rmtree, scratch, True)
+
+
+# Chunks a manifest references that are missing or do not hash back to their name
+def verify_manifest(path: Path, store: Path | None = None) -> list[str]:
+
+    bad = []
+    for digest in sorted({d for entry in read_manifest(path)["files"].values() for d, _ in entry["chunks"]}):
+        try:
+            get_chunk(digest, store)
+        except (OSError, BackupFailed):
+            bad.append(digest)
+
+    return bad
+
+
+# Deletes chunks no manifest references -- Only run while no chunked backup is being written
+def gc(folder: Path | None = None, store: Path | None = None) -> dict:
+
+    folder = folder or backups.BACKUP_DIR
+    store = store or CHUNK_DIR
+
+    live = set()
+    for manifest in folder.glob(f"*{MANIFEST_SUFFIX}"):
+        live.update(d for entry in read_manifest(manifest)["files"].values() for d, _ in entry["chunks"])
+
+    removed, freed = 0, 0
+    for path in store.glob("*/*.zst"):
+        if path.name[:-len(".zst")] not in live:
+            freed += path.stat().st_size
+            path.unlink()
+            removed += 1
+
+    return {"live": len(live), "removed": removed, "freed_bytes": freed}
+
+
+def stats(folder: Path | None = None, store: Path | None = None) -> dict:
+
+    folder = folder or backups.BACKUP_DIR
+    store = store or CHUNK_DIR
+
+    manifests = [read_manifest(p) for p in folder.glob(f"*{MANIFEST_SUFFIX}")]
+    stored = [p.stat().st_size for p in store.glob("*/*.zst")]
+    logical = sum(m["bytes"] for m in manifests)
+
+    return {
+        "backups": len(manifests),
+        "logical_bytes": logical,
+        "chunks": len(stored),
+        "stored_bytes": sum(stored),
+        "dedup_ratio": round(logical / sum(stored), 2) if stored else None,
+    }
+
+
+def _main(argv: list[str]) -> int:
+
+    try:
+        if argv[:1] == ["gc"]:
+            print(json.dumps(gc(), indent=2))
+        elif argv[:1] == ["verify"] and len(argv) == 2:
+            bad = verify_manifest(Path(argv[1]))
+            print(json.dumps({"bad_chunks": bad}, indent=2))
+            return 1 if bad else 0
+        elif argv[:1] in (["stats"], []):
+            print(json.dumps(stats(), indent=2))
+        else:
+            print(__doc__, file=sys.stderr)
+            return 2
+
+        return 0
+
+    except BackupFailed as e:
+        print(e.message, file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -1,8 +1,12 @@
-import asyncio, asyncpg, os, subprocess
+import asyncio, asyncpg, contextvars, functools, os, time
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from pathlib import Path
+from db import archives, backups, chunkstore, dedup, migrations, packing, partitions, rollups, sequence
+from db.catalog import catalog
 from fast_server import loggers
 from fast_server.connection_manager import misc_manager, broadcast_message
+from fast_server.metrics import POOL_ACQUIRE_SECONDS, POOL_CHECKOUT_SECONDS, POOL_CONNECTIONS, READ_ADMISSION_SECONDS, READ_QUERIES
 
 
 # Custom Errors
@@ -27,48 +31,353 @@ class MissingDatabaseDetails(Exception):
         self.data = data
         self.message = message
 
+class UnknownStream(Exception):
+
+    def __init__(self, message, data=None):
+        super().__init__(message)
+        self.data = data
+        self.message = message
+
+class DatabaseSwapped(Exception):
+
+    def __init__(self, message, data=None):
+        super().__init__(message)
+        self.data = data
+        self.message = message
+
+# Stream name -> measurement table (used by exports)
+STREAM_TABLES = {
+    "imu": "imu_measurement",
+    "camera": "image_detection",
+    "robot": "robot",
+}
+
+# Stream name -> column holding the device capture timestamp
+STREAM_CAPTURE_COLUMNS = {
+    "imu": "capture_time",
+    "camera": "capture_time",
+    "robot": "ts_epoch",
+}
+
+# Kicks every other session off the given databases -- Renames and drops need them empty
+TERMINATE_BACKENDS = """
+    SELECT pg_terminate_backend(pid)
+    FROM pg_stat_activity
+    WHERE datname = ANY($1::text[])
+    AND pid <> pg_backend_pid()
+"""
+
+# Identity of the database a connection landed on -- A restore swaps in a different database under the same name
+DATABASE_OID = "SELECT oid FROM pg_database WHERE datname = current_database()"
+
+# Label -> session scope, run before every per-session read
+SESSION_LOOKUP = "SELECT id, started_at, ended_at FROM session WHERE label = $1"
+
+# Per-session reads -- (alias, stream, query); {source} is the stream's relation, {where} comes from partitions.session_predicate
+# db.migrations EXPLAINs these same strings at startup to prove each one can use an index
+SESSION_QUERIES = {
+    "retrieve_imu": ("imu", "imu", """
+        SELECT imu.*
+        FROM {source} AS imu
+        WHERE {where}
+    """),
+    "retrieve_camera": ("img", "camera", """
+        SELECT img.*
+        FROM {source} AS img
+        WHERE {where}
+    """),
+    "retrieve_robot": ("robt", "robot", """
+        SELECT robt.*
+        FROM {source} AS robt
+        WHERE {where}
+        ORDER BY robt.ts_epoch
+    """),
+}
+
+
+# Stream -> relation reads come from -- Packed IMU storage reads through the unpacking view
+def stream_sources(imu_storage=packing.IMU_STORAGE):
+    return {**STREAM_TABLES, "imu": packing.IMU_SOURCES[imu_storage]}
+
+
+# SESSION_QUERIES with {source} resolved -- name -> (alias, query with {where} left open)
+def session_queries(imu_storage=packing.IMU_STORAGE):
+
+    sources = stream_sources(imu_storage)
+    return {
+        name: (alias, query.format(source=sources[stream], where="{where}"))
+        for name, (alias, stream, query) in SESSION_QUERIES.items()
+    }
+
+# Pool roles -- Ingest writers never wait behind analytics reads or admin work
+POOL_NAMES = ("ingest", "read", "admin")
+
+# (min, max) connections per pool, sized independently from .env
+POOL_SIZES = {
+    "ingest": (int(os.getenv("DB_INGEST_POOL_MIN", 2)), int(os.getenv("DB_INGEST_POOL_MAX", 20))),
+    "read": (int(os.getenv("DB_READ_POOL_MIN", 1)), int(os.getenv("DB_READ_POOL_MAX", 10))),
+    "admin": (int(os.getenv("DB_ADMIN_POOL_MIN", 1)), int(os.getenv("DB_ADMIN_POOL_MAX", 4))),
+}
+
+# Read queries allowed to run at once -- The rest queue for admission instead of holding connections
+READ_CONCURRENCY = int(os.getenv("DB_READ_CONCURRENCY", 4))
+
+# Restores load into a staging database, then swap it in by rename -- Ingest pauses only for the swap
+# The database it replaces is kept under RESTORE_RETIRED_SUFFIX until the next restore
+RESTORE_STAGING_SUFFIX = os.getenv("RESTORE_STAGING_SUFFIX", "_restore")
+RESTORE_RETIRED_SUFFIX = os.getenv("RESTORE_RETIRED_SUFFIX", "_pre_restore")
+
+# How long the swap waits for in-flight batches / queries before giving up (the staging database is kept)
+RESTORE_DRAIN_SECONDS = float(os.getenv("RESTORE_DRAIN_SECONDS", 30))
+
+# Database the swap connects to -- Postgres will not rename the database a session is connected to
+MAINTENANCE_DB = os.getenv("DB_MAINTENANCE_NAME", "postgres")
+
+# Cache generation a task entered the ingest gate with -- Nested acquires in the same task do not wait on it again
+_gated = contextvars.ContextVar("db_gated", default=None)
+
+
+# Batch writers resolve device / session ids before they acquire -- Gating the whole call keeps ids from a
+# swapped-out database from being written into the new one
+def gated(method):
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        async with self.gate():
+            return await method(self, *args, **kwargs)
+
+    return wrapper
+
 # Singleton of Database (only 1 per container)
 class DatabaseSingleton:
     _instance = None
     _lock = asyncio.Lock()
 
-    def __init__(self, pool: asyncpg.Pool):
-        self.pool = pool
+    # read / admin fall back to the ingest pool when not given (benchmarks, tests)
+    def __init__(self, ingest: asyncpg.Pool, read: asyncpg.Pool | None = None, admin: asyncpg.Pool | None = None,
+                 read_concurrency: int = READ_CONCURRENCY, imu_storage: str = packing.IMU_STORAGE):
+
+        if imu_storage not in packing.IMU_STORAGE_MODES:
+            raise ValueError(f"IMU_STORAGE must be one of {', '.join(packing.IMU_STORAGE_MODES)}, not {imu_storage!r}")
+
+        self.pools = {"ingest": ingest, "read": read or ingest, "admin": admin or ingest}
+        self.imu_storage = imu_storage
+        self.sources = stream_sources(imu_storage)
+        self.queries = session_queries(imu_storage)
         self.devices = {}
+
+        # Recent frame ids per stream and device -- Retried and replayed batches are filtered before the database
+        self.dedup = {stream: dedup.Deduplicator(stream, table, rollups.RECORD_COLUMNS[stream]) for stream, table in STREAM_TABLES.items()}
+
+        # Last frame per device -- Gaps, late samples and counter resets are found as batches are written
+        self.sequences = {
+            stream: sequence.SequenceTracker(stream, rollups.RECORD_COLUMNS[stream], self.device_label)
+            for stream in sequence.SEQUENCE_STREAMS if stream in STREAM_TABLES
+        }
         self.current_session_id = None
         self.history = set()
         self._last_check = 0
 
+        # Database the cached ids belong to -- Bumps `generation` when a restore (in any process) swaps it out
+        self.database_oid = None
+        self.generation = 0
+
         self.host = os.getenv("DB_HOST")
         self.port = os.getenv("DB_PORT")
         self.name = os.getenv("DB_NAME")
         self.user = os.getenv("DB_USER")
         self.password = os.getenv("DB_PASSWORD")
 
+        # Ingest gate -- Closed only while a restored database is swapped in
+        self._open = asyncio.Event()
+        self._open.set()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._in_flight = 0
+
+        # Admission control for read queries
+        self._read_slots = asyncio.Semaphore(read_concurrency)
+        self._read_admission = READ_ADMISSION_SECONDS.labels()
+        self._reads_running = READ_QUERIES.labels("running")
+        self._reads_waiting = READ_QUERIES.labels("waiting")
+
+        # Pool gauges are read at scrape time (self.pools is swapped on restore)
+        self._acquire_wait = {name: POOL_ACQUIRE_SECONDS.labels(name) for name in POOL_NAMES}
+        self._checkout = {name: POOL_CHECKOUT_SECONDS.labels(name) for name in POOL_NAMES}
+
+        for name in POOL_NAMES:
+            POOL_CONNECTIONS.labels(name, "in_use").set_function(lambda n=name: self.pools[n].get_size() - self.pools[n].get_idle_size())
+            POOL_CONNECTIONS.labels(name, "idle").set_function(lambda n=name: self.pools[n].get_idle_size())
+            POOL_CONNECTIONS.labels(name, "max").set_function(lambda n=name: self.pools[n].get_max_size())
+
+    # Holds the caller while a swap is in progress and counts it as in flight until it leaves
+    @asynccontextmanager
+    async def gate(self):
+
+        if _gated.get() is not None:
+            yield
+            return
+
+        # Re-checked after waking -- The gate may have closed again before this task ran
+        while not self._open.is_set():
+            await self._open.wait()
+
+        self._in_flight += 1
+        self._drained.clear()
+        token = _gated.set(self.generation)
+
+        try:
+            yield
+        finally:
+            _gated.reset(token)
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._drained.set()
+
+    # Closes the gate and waits for everything in flight to finish -- MQTT / TCP keep buffering into the queues meanwhile
+    @asynccontextmanager
+    async def paused(self, timeout: float = RESTORE_DRAIN_SECONDS):
+
+        self._open.clear()
+
+        try:
+            try:
+                await asyncio.wait_for(self._drained.wait(), timeout)
+            except asyncio.TimeoutError:
+                raise backups.BackupFailed(f"{self._in_flight} database calls still running after {timeout:.0f}s")
+
+            yield
+
+        finally:
+            self._open.set()
+
+    # Checks out a connection from a named pool and records the wait and how long it was held
+    @asynccontextmanager
+    async def acquire(self, pool: str = "ingest"):
+
+        outer = _gated.get()
+
+        async with self.gate():
+
+            started = time.perf_counter()
+
+            async with self.pools[pool].acquire() as conn:
+                checked_out = time.perf_counter()
+                self._acquire_wait[pool].observe(checked_out - started)
+
+                # The database was swapped since the gated call resolved its ids -- Failed before it writes them
+                if outer is not None and outer != self.generation:
+                    raise DatabaseSwapped("Database was replaced by a restore during this call. Retry it.", {"generation": self.generation})
+
+                try:
+                    yield conn
+                finally:
+                    self._checkout[pool].observe(time.perf_counter() - checked_out)
+
+    # Read-pool connection behind admission control -- Heavy retrievals / exports queue here
+    @asynccontextmanager
+    async def read(self):
+
+        started = time.perf_counter()
+        self._reads_waiting.inc()
+
+        try:
+            await self._read_slots.acquire()
+        finally:
+            self._reads_waiting.dec()
+
+        self._read_admission.observe(time.perf_counter() - started)
+        self._reads_running.inc()
+
+        try:
+            async with self.acquire("read") as conn:
+                yield conn
+        finally:
+            self._reads_running.dec()
+            self._read_slots.release()
+
+    # Creates one pool per role with its .env sizing
     @classmethod
-    async def get_instance(cls, min_size: int = 1, max_size: int = 50):
+    async def create_pools(cls, **connect) -> dict[str, asyncpg.Pool]:
+
+        pools = {}
+
+        try:
+            for name in POOL_NAMES:
+                min_size, max_size = POOL_SIZES[name]
+                pools[name] = await asyncpg.create_pool(**connect, min_size=min_size, max_size=max_size, init=cls._connected)
+        except Exception:
+            for pool in pools.values():
+                await pool.close()
+            raise
+
+        return pools
+
+    # Runs on every new pool connection -- Connections are only made again after a restore terminated them (or the
+    # network dropped), so this is where a process that did not run the restore notices the swap
+    @classmethod
+    async def _connected(cls, conn):
+
+        if cls._instance is not None:
+            await cls._instance.check_database(conn)
+
+    # Clears everything cached from the database when a different one answers -- Returns whether it did
+    async def check_database(self, conn) -> bool:
+
+        oid = await conn.fetchval(DATABASE_OID)
+        swapped = self.database_oid is not None and oid != self.database_oid
+        self.database_oid = oid
+
+        if swapped:
+            self.forget()
+            loggers.log_system_logger(f"Database {self.name} was replaced by a restore -- Cached ids cleared")
+
+        return swapped
+
+    # Ids and windows cached from the current database -- Gated calls still holding them fail with DatabaseSwapped
+    def forget(self):
+
+        self.devices.clear()
+        for window in self.dedup.values():
+            window.clear()
+        for tracker in self.sequences.values():
+            tracker.clear()
+        self.history.clear()
+        self.current_session_id = None
+        self._last_check = 0
+        self.generation += 1
+
+    async def close_pools(self):
+
+        for pool in set(self.pools.values()):
+            await pool.close()
+
+    @classmethod
+    async def get_instance(cls):
 
         # If there is not a current DB object, create one
         if cls._instance is None:
 
             async with cls._lock:
 
-                # Only let one coroutine create a pool
+                # Only let one coroutine create the pools
                 if cls._instance is None:
 
-                    # Uses pools to only have a set number of connections that are available... Can be increase to allow more devices if needed
-                    pool = await asyncpg.create_pool(
+                    # Uses pools to only have a set number of connections that are available... Sized per role in .env
+                    pools = await cls.create_pools(
                         host=os.getenv("DB_HOST"),
                         port=int(os.getenv("DB_PORT")),
                         database=os.getenv("DB_NAME"),
                         user=os.getenv("DB_USER"),
                         password=os.getenv("DB_PASSWORD"),
-                        min_size=min_size,
-                        max_size=max_size,
                     )
 
-                    cls._instance = cls(pool)
-                    loggers.log_system_logger("Database pool initialized.")
+                    cls._instance = cls(**pools)
+
+                    async with pools["admin"].acquire() as conn:
+                        await cls._instance.check_database(conn)
+
+                    loggers.log_system_logger("Database pools initialized.")
 
         return cls._instance
 
@@ -79,9 +388,9 @@ class DatabaseSingleton:
         # Only close if there is an active object
         if cls._instance:
 
-            await cls._instance.pool.close()
+            await cls._instance.close_pools()
             cls._instance = None
-            loggers.log_system_logger("Database pool closed.")
+            loggers.log_system_logger("Database pools closed.")
 
     def get_time(self):
         try:
@@ -98,7 +407,7 @@ class DatabaseSingleton:
             return self.current_session_id
 
         # If not, queries to see if the last created session is still active
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             row = await conn.fetchrow("""
                 SELECT id, ended_at
                 FROM session
@@ -116,113 +425,192 @@ class DatabaseSingleton:
         self.current_session_id = None
         return None
 
-    # Restores a backup
-    async def restore_backup(self, file_path: str):
+    # Connection to the maintenance database -- For CREATE / DROP / ALTER DATABASE on the live one
+    async def maintenance_connect(self):
+
+        return await asyncpg.connect(
+            host=self.host, port=int(self.port), user=self.user, password=self.password, database=MAINTENANCE_DB,
+        )
+
+    async def connect_pools(self):
+
+        pools = await self.create_pools(
+            host=self.host,
+            port=int(self.port),
+            database=self.name,
+            user=self.user,
+            password=self.password,
+        )
+        self.pools.update(pools)
+
+    # Restores a backup without taking ingest down -- pg_restore loads a staging database while the live one keeps
+    # taking writes, then the staging database is renamed into place and the pools reconnect
+    # Rows ingested while pg_restore runs stay in the retired database (RESTORE_RETIRED_SUFFIX)
+    async def restore_backup(self, file_path: str, progress=None):
+
+        path = Path(file_path)
+        staging = f"{self.name}{RESTORE_STAGING_SUFFIX}"
+        retired = f"{self.name}{RESTORE_RETIRED_SUFFIX}"
+
+        if archives.is_archive(path):
+            raise backups.BackupFailed(f"{path.name} is a session archive -- Use /backup/session/restore to append it")
 
         await broadcast_message(misc_manager, "Recovery Started")
 
-        try: 
+        async def broadcast_progress(snapshot: dict) -> None:
+            await broadcast_message(misc_manager, f"Recovery {snapshot['percent']:.0f}% ({snapshot['tables_done']}/{snapshot['tables']} tables)")
 
-            # Kill all connections
-            async with self.pool.acquire() as conn:
+        # Live table sizes weight the progress -- Close enough for a backup of the same database
+        async with self.acquire("admin") as conn:
+            sizes = await backups.table_sizes(conn)
 
-                await conn.execute("""
-                    SELECT pg_terminate_backend(pid)
-                    FROM pg_stat_activity
-                    WHERE datname = $1
-                    AND pid <> pg_backend_pid();
-                """, self.name)
+        maintenance = await self.maintenance_connect()
 
+        try:
+            # Leftovers from a failed restore and the previous retired database
+            for name in (staging, retired):
+                await maintenance.execute(TERMINATE_BACKENDS, [name])
+                await maintenance.execute(f'DROP DATABASE IF EXISTS "{name}"')
 
-            # Close current DB connections
-            await self.pool.close()
+            await maintenance.execute(f'CREATE DATABASE "{staging}"')
 
-            env = {**os.environ, "PGPASSWORD": self.password}
+            # Chunked backups are reassembled into a scratch directory first (in parallel, see db.chunkstore)
+            async with chunkstore.materialized(path) as source:
+                await backups.pg_restore(source, staging, self.host, self.port, self.user, self.password, sizes, progress or broadcast_progress)
 
-            # Drop + recreate the database
-            subprocess.run(
-                ["dropdb", "-h", self.host, "-p", self.port, "-U", self.user, self.name],
-                env=env, check=True
+            # Older backups restore with an older schema -- Brought up to date before the swap, not after
+            conn = await asyncpg.connect(
+                host=self.host, port=int(self.port), user=self.user, password=self.password, database=staging,
             )
+            try:
+                await self.prepare_schema(conn)
+            finally:
+                await conn.close()
 
-            subprocess.run(
-                ["createdb", "-h", self.host, "-p", self.port, "-U", self.user, self.name],
-                env=env, check=True
-            )
+            await broadcast_message(misc_manager, "Recovery loaded -- Swapping databases")
+            paused = time.perf_counter()
 
-            # Restore
-            subprocess.run(
-                ["pg_restore", "-h", self.host, "-p", self.port, "-U", self.user, "-d", self.name, file_path],
-                env=env, check=True
-            )
+            async with self.paused():
 
-            await broadcast_message(misc_manager, "Recovery Successful")
-        
-        except Exception as e:
-            await broadcast_message(misc_manager, f"Recovery failed: {e}", "error")
+                await self.close_pools()
+
+                try:
+                    await maintenance.execute(TERMINATE_BACKENDS, [self.name, staging])
+
+                    # Both renames commit together or not at all
+                    async with maintenance.transaction():
+                        await maintenance.execute(f'ALTER DATABASE "{self.name}" RENAME TO "{retired}"')
+                        await maintenance.execute(f'ALTER DATABASE "{staging}" RENAME TO "{self.name}"')
+
+                finally:
+                    await self.connect_pools()
+
+                    # Ids cached from the old database -- Kept if the renames rolled back and the old one is still live
+                    async with self.pools["admin"].acquire() as conn:
+                        await self.check_database(conn)
+
+            paused = time.perf_counter() - paused
 
         finally:
+            await maintenance.close()
 
-            await broadcast_message(misc_manager, "DB Pool Connecting...")
+        loggers.log_system_logger(f"Restored {path.name}, ingest paused {paused:.2f}s. Previous database kept as {retired}")
+        await broadcast_message(misc_manager, f"Recovery Successful (ingest paused {paused:.1f}s)")
 
-            # Attempts to recreate connection pools
-            try:
-                self.pool = await asyncpg.create_pool(
-                    host=self.host,
-                    port=int(self.port),
-                    database=self.name,
-                    user=self.user,
-                    password=self.password,
-                    min_size=1,
-                    max_size=100,
-                )
+        return {"paused_s": round(paused, 3), "retired": retired}
 
-                await broadcast_message(misc_manager, "DB Pool Connected")
+    # Applies pending migrations, partitions the measurement tables, verifies the required indexes
+    # and checks that every per-session read can use one -- Plan problems are logged, not fatal
+    async def prepare_schema(self, conn=None):
 
-                # Empty caches
-                self.devices.clear()
-                self.history.clear()
-                self.current_session_id = None
+        # A restore prepares its staging database before it is swapped in
+        if conn is None:
+            async with self.acquire("admin") as conn:
+                return await self.prepare_schema(conn)
 
-            except Exception as e:
-                await broadcast_message(misc_manager, f"DB Pool connection failed: {e}", "error")
-
-    # Creates a backup
-    def create_backup(self):
-
-        # Ensure folder is mounted to docker
-        backup_dir = Path("/db_backups")
-        backup_dir.mkdir(parents=True, exist_ok=True)
-
-        ts = datetime.fromtimestamp(self.get_time(), tz=timezone.utc).strftime("%Y%m%d_%H%M%S_UTC")
-        db = os.environ["PGDATABASE"]
-        out = backup_dir / f"{db}_{ts}.dump"
-
-        # Batch command to create a backup
-        cmd = [
-            "pg_dump",
-            "-h", os.environ.get("PGHOST", "database"),
-            "-p", os.environ.get("PGPORT", "5432"),
-            "-U", os.environ["PGUSER"],
-            "-d", db,
-            "-F", "c",
-            "-f", str(out),
-        ]
+        result = await migrations.prepare(conn, self.queries, SESSION_LOOKUP)
+
+        loggers.log_system_logger(
+            f"Schema ready. Migrations applied: {result['applied']}, "
+            f"partitions: {result['partitions']}, indexes built: {result['indexes']}"
+        )
+
+        try:
+            migrations.assert_plans(result["plans"])
+        except migrations.MigrationError as e:
+            loggers.log_system_logger(e.message, True)
+
+        return result
+
+    # Creates a backup -- Parallel directory-format pg_dump, run without blocking the event loop
+    # `progress` gets backups.DumpProgress snapshots as table data is written
+    async def create_backup(self, progress=None):
+
+        async with self.acquire("admin") as conn:
+            sizes = await backups.table_sizes(conn)
+            sessions = [r["label"] for r in await conn.fetch("SELECT label FROM session ORDER BY id")]
 
-        env = {**os.environ, "PGPASSWORD": os.environ["PGPASSWORD"]}
-        subprocess.run(cmd, check=True, env=env)
+        started = time.perf_counter()
+        # BACKUP_FORMAT=chunked stores only chunks the store has not seen, plus a manifest
+        if backups.BACKUP_FORMAT == "chunked":
+            out = await chunkstore.backup(sizes, progress)
+        else:
+            out = backups.backup_path(self.get_time(), os.environ["PGDATABASE"])
+            await backups.pg_dump(out, sizes, progress)
+
+        await self.catalog_backup(out, sessions, time.perf_counter() - started)
         return str(out)
 
+    # Session-scoped backup -- Only that session's rows, streamed out with COPY (see db.archives)
+    async def export_session(self, label, progress=None):
+
+        async with self.acquire("admin") as conn:
+            archive = await archives.export_session(conn, label, progress=progress)
+
+        await self.catalog_backup(Path(archive["path"]), [label], archive["duration_s"])
+        return archive
+
+    # Adds a finished backup to the catalog -- A failure here leaves the backup usable, the next startup catalogs it
+    async def catalog_backup(self, path: Path, sessions, duration_s):
+
+        try:
+            await catalog.record(path, sessions=sessions, duration_s=duration_s)
+        except Exception as e:
+            loggers.log_system_logger(f"Backup {path.name} not added to the catalog: {e}", True)
+
+    # Appends a session archive to the live database -- Nothing is dropped, ingest keeps running
+    async def restore_session(self, file_path: str, label=None):
+
+        async with self.acquire("admin") as conn:
+            return await archives.restore_session(conn, Path(file_path), label)
+
+    # Resolves a session label to a WHERE fragment on the measurement table's partition key
+    # Filtering on the label through a join hides the key from the planner -- A constant lets it prune partitions
+    async def session_filter(self, conn, session_label, alias):
+
+        scope = await conn.fetchrow(SESSION_LOOKUP, session_label)
+
+        if scope is None:
+            return None, []
+
+        return partitions.session_predicate(alias, scope)
+
+    # Runs one of SESSION_QUERIES for a session label -- Unknown labels return no rows
+    async def fetch_session_rows(self, query_name, session_label):
+
+        alias, query = self.queries[query_name]
+
+        async with self.read() as conn:
+            where, args = await self.session_filter(conn, session_label, alias)
+            if where is None:
+                return []
+
+            return await conn.fetch(query.format(where=where), *args)
+
     # Returns all IMU data from session label
     async def retrieve_imu(self, session_label):
 
-        async with self.pool.acquire() as conn:
-            rows = await conn.fetch("""
-                SELECT imu.*
-                FROM imu_measurement AS imu
-                JOIN session AS s ON imu.session_id = s.id
-                WHERE s.label = $1
-            """, session_label)
+        rows = await self.fetch_session_rows("retrieve_imu", session_label)
         
         # Convert to json
         data = [dict(r) for r in rows]
@@ -232,13 +620,7 @@ class DatabaseSingleton:
     # Returns all CAMERA data from session label
     async def retrieve_camera(self, session_label):
         
-        async with self.pool.acquire() as conn:
-            rows = await conn.fetch("""
-                SELECT img.*
-                FROM image_detection AS img
-                JOIN session AS s ON img.session_id = s.id
-                WHERE s.label = $1
-            """, session_label)
+        rows = await self.fetch_session_rows("retrieve_camera", session_label)
         
         # Convert to json
         data = [dict(r) for r in rows]
@@ -248,14 +630,7 @@ class DatabaseSingleton:
     # Returns all ROBOT data from session label
     async def retrieve_robot(self, session_label): 
         
-        async with self.pool.acquire() as conn:
-            rows = await conn.fetch("""
-                SELECT robt.*
-                FROM robot AS robt
-                JOIN session AS s ON robt.session_id = s.id
-                WHERE s.label = $1
-                ORDER BY robt.ts_epoch
-            """, session_label)
+        rows = await self.fetch_session_rows("retrieve_robot", session_label)
         
         # Convert to json
         data = [dict(r) for r in rows]
@@ -292,10 +667,168 @@ class DatabaseSingleton:
 
         return twins
 
+    # Streams a session's rows as raw CSV chunks straight from Postgres COPY -- rows never become Python objects
+    async def export_csv(self, stream, session_label, max_pending_chunks=16):
+
+        table = self.sources.get(stream)
+        if table is None:
+            raise UnknownStream(f"Unknown stream [{stream}]. Expected one of: {', '.join(STREAM_TABLES)}.")
+
+        # Bounded so a slow HTTP client applies backpressure to COPY instead of buffering the table in memory
+        chunks = asyncio.Queue(maxsize=max_pending_chunks)
+        end = object()
+
+        async def copy_out():
+            try:
+                async with self.read() as conn:
+                    where, args = await self.session_filter(conn, session_label, "t")
+
+                    # Unknown session -- Header only, like an empty session
+                    if where is None:
+                        where, args = "false", []
+
+                    await conn.copy_from_query(f"""
+                        SELECT t.*
+                        FROM {table} AS t
+                        WHERE {where}
+                    """, *args, output=chunks.put, format="csv", header=True)
+
+                await chunks.put(end)
+
+            # Hand COPY errors to the consumer so they surface in the response stream
+            except Exception as e:
+                await chunks.put(e)
+
+        task = asyncio.create_task(copy_out())
+
+        try:
+            while True:
+                chunk = await chunks.get()
+
+                if chunk is end:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+
+                yield chunk
+
+        finally:
+            # Client went away mid-stream -- stop COPY and release the connection
+            if not task.done():
+                task.cancel()
+
+    # Returns per-device latency percentiles (seconds) for a session -- capture->commit and recorded->commit
+    async def retrieve_latency_report(self, session_label):
+
+        report = {}
+
+        async with self.read() as conn:
+            where, args = await self.session_filter(conn, session_label, "t")
+            if where is None:
+                return {stream: {} for stream in STREAM_TABLES}
+
+            for stream, table in self.sources.items():
+
+                # Device clocks report either epoch seconds or epoch milliseconds
+                col = f"t.{STREAM_CAPTURE_COLUMNS[stream]}"
+                captured = f"(CASE WHEN {col} > 1e11 THEN {col} / 1000.0 ELSE {col} END)"
+                recorded = "(CASE WHEN t.recorded_at > 1e11 THEN t.recorded_at / 1000.0 ELSE t.recorded_at END)"
+
+                rows = await conn.fetch(f"""
+                    SELECT
+                        d.label AS device,
+                        count(*) AS rows,
+                        percentile_cont(ARRAY[0.5, 0.9, 0.99]) WITHIN GROUP (ORDER BY t.ingested_at - {captured}) AS capture_to_commit,
+                        percentile_cont(ARRAY[0.5, 0.9, 0.99]) WITHIN GROUP (ORDER BY t.ingested_at - {recorded}) AS recorded_to_commit,
+                        max(t.ingested_at - {captured}) AS capture_to_commit_max
+                    FROM {table} AS t
+                    JOIN device AS d ON t.device_id = d.id
+                    WHERE {where}
+                    GROUP BY d.label
+                    ORDER BY d.label
+                """, *args)
+
+                report[stream] = {
+                    r["device"]: {
+                        "rows": r["rows"],
+                        "capture_to_commit": dict(zip(("p50", "p90", "p99"), r["capture_to_commit"] or [])),
+                        "recorded_to_commit": dict(zip(("p50", "p90", "p99"), r["recorded_to_commit"] or [])),
+                        "capture_to_commit_max": r["capture_to_commit_max"],
+                    }
+                    for r in rows
+                }
+
+        return report
+
+    # Frame gaps and counter resets of a session, with per-device totals -- lost is missing minus late arrivals
+    async def retrieve_gaps(self, session_label):
+
+        async with self.read() as conn:
+            rows = await conn.fetch("""
+                SELECT
+                    g.stream, d.label AS device, g.kind, g.from_frame, g.to_frame, g.missing, g.recovered,
+                    g.from_capture, g.to_capture, g.detected_at
+                FROM ingest_gap AS g
+                JOIN session AS s ON g.session_id = s.id
+                JOIN device AS d ON g.device_id = d.id
+                WHERE s.label = $1
+                ORDER BY g.detected_at, g.id
+            """, session_label)
+
+        devices = {}
+        for r in rows:
+            totals = devices.setdefault(r["stream"], {}).setdefault(r["device"], {"gaps": 0, "missing": 0, "lost": 0, "resets": 0})
+
+            if r["kind"] == "reset":
+                totals["resets"] += 1
+            else:
+                totals["gaps"] += 1
+                totals["missing"] += r["missing"]
+                totals["lost"] += r["missing"] - r["recovered"]
+
+        return {"devices": devices, "gaps": [dict(r) for r in rows]}
+
+    # Returns stored per-second / per-minute aggregates -- One session, or every session when the label is None
+    async def retrieve_rollup(self, session_label=None, resolution="1s", stream=None, device=None, channel=None,
+                              start=None, end=None):
+
+        if resolution not in rollups.RESOLUTIONS:
+            raise ValueError(f"Unknown resolution [{resolution}]. Expected one of: {', '.join(rollups.RESOLUTIONS)}.")
+
+        table, _ = rollups.RESOLUTIONS[resolution]
+        conds, args = [], []
+
+        def where(sql, value):
+            args.append(value)
+            conds.append(sql.format(f"${len(args)}"))
+
+        async with self.read() as conn:
+
+            if session_label is not None:
+                scope = await conn.fetchrow(SESSION_LOOKUP, session_label)
+                if scope is None:
+                    return []
+                where("r.session_id = {}", scope["id"])
+
+            for sql, value in (("r.stream = {}", stream), ("d.label = {}", device), ("r.channel = {}", channel),
+                               ("r.bucket >= {}", start), ("r.bucket < {}", end)):
+                if value is not None:
+                    where(sql, value)
+
+            rows = await conn.fetch(f"""
+                SELECT d.label AS device, r.stream, r.channel, r.bucket, r.count, r.min, r.max, r.mean, r.m2
+                FROM {table} AS r
+                JOIN device AS d ON d.id = r.device_id
+                WHERE {" AND ".join(conds) or "true"}
+                ORDER BY d.label, r.channel, r.bucket
+            """, *args)
+
+        return [rollups.describe(dict(r)) for r in rows]
+
     # Returns all the sessions stored in DB
     async def retrieve_sessions(self): 
         
-        async with self.pool.acquire() as conn:
+        async with self.read() as conn:
             rows = await conn.fetch("""
                 SELECT label
                 FROM session
@@ -306,6 +839,15 @@ class DatabaseSingleton:
 
         return data
 
+    # Label of a cached device id -- Falls back to the id for devices this process has not resolved
+    def device_label(self, device_id: int) -> str:
+
+        for label, cached in self.devices.items():
+            if cached == device_id:
+                return label
+
+        return str(device_id)
+
     # Creates or Retrieves from cache a device id
     async def get_or_create_device_id(self, device_label, category, ip="0.0.0.0") -> int:
         
@@ -329,7 +871,45 @@ class DatabaseSingleton:
 
         return device_id
 
+    # Writes one batch of insert_*_batch records -- Returns how many rows were new
+    # Duplicates are dropped twice over: the in-memory window skips recent frame ids, and the staged
+    # COPY merges with ON CONFLICT DO NOTHING against the unique index (migration 6) for everything older
+    async def _merge(self, stream: str, records: list[tuple]) -> int:
+
+        window = self.dedup[stream]
+        records = window.filter(records)
+        if not records:
+            return 0
+
+        tracker = self.sequences.get(stream)
+        scan = None
+
+        async with self.acquire() as conn:
+            async with conn.transaction():
+
+                # Packed imu keeps samples in arrays, out of reach of the unique index -- Only the window guards it
+                if stream != "imu" or self.imu_storage != "packed":
+                    records = await window.insert(conn, records)
+
+                # Rollups, packed rows and the frame sequence only see samples that were actually stored
+                await rollups.apply(conn, stream, records)
+
+                if stream == "imu" and self.imu_storage != "rows" and records:
+                    await conn.executemany(packing.IMU_PACKED_INSERT, packing.pack_imu(records))
+
+                # Gap rows commit with the samples that revealed them
+                if tracker is not None and records:
+                    scan = tracker.scan(records, self.get_time())
+                    await tracker.write(conn, scan)
+
+        window.commit(records)
+        if scan is not None:
+            tracker.commit(scan)
+
+        return len(records)
+
     # Insert ROBOT in batches to DB
+    @gated
     async def insert_robot_batch(self, batch):
 
         session_id = await self.get_latest_session()
@@ -341,7 +921,23 @@ class DatabaseSingleton:
         # Use one ingested_at timestamp per batch flush (optional but nice)
         ingested_at = self.get_time()
 
+        records = [
+            (
+                d["frame_id"],
+                d["ts_epoch"],
+
+                d["joint1"], d["joint2"], d["joint3"], d["joint4"], d["joint5"], d["joint6"],
+                d["x"], d["y"], d["z"], d["w"], d["p"], d["r"],
+
+                d["recorded_at"],
+                ingested_at,
+                device_id,
+                session_id
+            )
+            for d in batch
+        ]
 
+        return await self._merge("robot", records)
 
     # Insertion for single item in DB
     async def insert_robot_data(self, frame_id, ts_int, j1, j2, j3, j4, j5, j6, x, y, z, w, p, r, recorded_at):
@@ -352,7 +948,7 @@ class DatabaseSingleton:
 
         device_id = await self.get_or_create_device_id("main", "robot")
 
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             async with conn.transaction():
                 await conn.execute("""
                     INSERT INTO robot (
@@ -366,6 +962,7 @@ class DatabaseSingleton:
                         session_id
                     )
                     VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12,$13,$14,$15,$16,$17,$18)
+                    ON CONFLICT DO NOTHING
                 """,
                 frame_id,
                 ts_int,
@@ -378,52 +975,33 @@ class DatabaseSingleton:
                 )
 
     # Batched insertion for IMU
+    @gated
     async def insert_imu_batch(self, batch):
         session_id = await self.get_latest_session()
 
         if not session_id:
             raise SessionNotStarted("No current active session. Run a GET to start a new session.")
 
-        async with self.pool.acquire() as conn:
-            async with conn.transaction():
-                records = []
-                for d in batch:
-                    device_id = await self.get_or_create_device_id(d["device_label"], "imu")
-
-                    # revised
-                    records.append((
-                        d["frame_id"], 
-                        d["capture_time"],
-                        d["recorded_at"], 
-                        self.get_time(), # <- ingested_at 
-                        device_id, 
-                        session_id,
-                        d["accel_x"], d["accel_y"], d["accel_z"],
-                        d["gyro_x"], d["gyro_y"], d["gyro_z"],
-                        d["mag_x"], d["mag_y"], d["mag_z"],
-                        d["yaw"], d["pitch"], d["roll"],
-                    ))
-                await conn.executemany("""
-                    INSERT INTO imu_measurement (
-                        frame_id,
-                        capture_time,
-                        recorded_at,
-                        ingested_at,
-                        device_id,
-                        session_id,
-                        accel_x, accel_y, accel_z,
-                        gyro_x, gyro_y, gyro_z,
-                        mag_x, mag_y, mag_z,
-                        yaw, pitch, roll
-                    )
-                    VALUES (
-                        $1,$2,$3,$4,$5,$6,
-                        $7,$8,$9,
-                        $10,$11,$12,
-                        $13,$14,$15,
-                        $16,$17,$18
-                    )
-                """, records)
+        # Device ids are resolved before checking out the insert connection -- Lookups use their own
+        records = []
+        for d in batch:
+            device_id = await self.get_or_create_device_id(d["device_label"], "imu")
+
+            # revised
+            records.append((
+                d["frame_id"], 
+                d["capture_time"],
+                d["recorded_at"], 
+                self.get_time(), # <- ingested_at 
+                device_id, 
+                session_id,
+                d["accel_x"], d["accel_y"], d["accel_z"],
+                d["gyro_x"], d["gyro_y"], d["gyro_z"],
+                d["mag_x"], d["mag_y"], d["mag_z"],
+                d["yaw"], d["pitch"], d["roll"],
+            ))
+
+        return await self._merge("imu", records)
 
     # Single Insertion for IMU
     async def insert_imu_data(self, device_label, recorded_at, accel_x, accel_y, accel_z, gryo_x, gryo_y, gryo_z, mag_x, mag_y, mag_z, yaw, pitch, roll):
@@ -438,7 +1016,7 @@ class DatabaseSingleton:
         device_id = await self.get_or_create_device_id(device_label, "imu")
 
         # Insert into imu table
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
 
             async with conn.transaction():
 
@@ -481,6 +1059,7 @@ class DatabaseSingleton:
     #             ])
 
     # Batched insertion for CAMERA
+    @gated
     async def insert_camera_batch(self, batch):
         session_id = await self.get_latest_session()
         if not session_id:
@@ -517,30 +1096,14 @@ class DatabaseSingleton:
                 print(f"[CAMERA DEBUG ERROR] batch_idx={i} error={e} d={d}")
                 raise
 
-        async with self.pool.acquire() as conn:
-            async with conn.transaction():
-                try:
-                    await conn.executemany("""
-                        INSERT INTO image_detection (
-                            frame_idx,
-                            capture_time,
-                            recorded_at,
-                            marker_idx,
-                            rvec_x, rvec_y, rvec_z,
-                            tvec_x, tvec_y, tvec_z,
-                            image_path,
-                            device_id, session_id, ingested_at
-                        )
-                        VALUES (
-                            $1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12,$13,$14
-                        )
-                    """, records)
-                except Exception as e:
-                    # 🔥 DB-level failure — log the *first* record for clarity
-                    print(f"[CAMERA DB ERROR] error={e}")
-                    if records:
-                        print(f"[CAMERA DB ERROR] first_record={records[0]}")
-                    raise
+        try:
+            return await self._merge("camera", records)
+        except Exception as e:
+            # 🔥 DB-level failure — log the *first* record for clarity
+            print(f"[CAMERA DB ERROR] error={e}")
+            if records:
+                print(f"[CAMERA DB ERROR] first_record={records[0]}")
+            raise
 
     # Insert into Camera Table in DB
     async def insert_camera_data(
@@ -560,7 +1123,7 @@ class DatabaseSingleton:
 
         device_id = await self.get_or_create_device_id(device_label, "camera")
 
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             async with conn.transaction():
                 await conn.execute("""
                     INSERT INTO image_detection (
@@ -574,6 +1137,7 @@ class DatabaseSingleton:
                         device_id, session_id, ingested_at
                     )
                     VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12,$13,$14)
+                    ON CONFLICT DO NOTHING
                 """,
                 frame_idx,
                 capture_time,
@@ -594,7 +1158,7 @@ class DatabaseSingleton:
         if (device_id, session_id) in self.history:
             return True
 
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
 
             return await conn.fetchval(
                 "SELECT 1 FROM session_device WHERE device_id=$1 AND session_id=$2",
@@ -611,7 +1175,7 @@ class DatabaseSingleton:
             return
 
         # Insert
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             row = await conn.fetchrow(
                 """
                 INSERT INTO session_device (device_id, session_id)
@@ -630,7 +1194,7 @@ class DatabaseSingleton:
     # Return the device_id if found or None 
     async def check_device(self, device_label) -> int | None:
 
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
 
             device_id = await conn.fetchval(
                 "SELECT id FROM device WHERE label = $1",
@@ -642,7 +1206,7 @@ class DatabaseSingleton:
     # Return True if session label already exists
     async def existing_session(self, label):
 
-        async with self.pool.acquire() as conn:
+        async with self.acquire("admin") as conn:
 
             found = await conn.fetchval(
                 "SELECT label FROM session WHERE label = $1",
@@ -660,7 +1224,7 @@ class DatabaseSingleton:
         if await self.existing_session(label):
             raise ExistingSessionLabel(f"Session label [{label}] already exist. Please select another one.")
 
-        async with self.pool.acquire() as conn:
+        async with self.acquire("admin") as conn, conn.transaction():
 
             session_id = await conn.fetchval(
                 """
@@ -669,9 +1233,12 @@ class DatabaseSingleton:
                 label, self.get_time()
             )
 
+            # The session's partitions exist before any of its rows can arrive
+            await partitions.session_created(conn, session_id)
+
         self.current_session_id = session_id
 
-    # Call to end the current active session
+    # Call to end the current active session -- Returns its label
     async def end_session(self):
 
         session_id = await self.get_latest_session()
@@ -681,24 +1248,26 @@ class DatabaseSingleton:
             raise SessionNotStarted("No active sesssions. You need to start one first.")
         
         # Update record
-        async with self.pool.acquire() as conn:
+        async with self.acquire("admin") as conn:
 
-            await conn.execute(
+            label = await conn.fetchval(
                 """
                 UPDATE "session"
                 SET ended_at = $1
                 WHERE id = $2
+                RETURNING label
                 """,
                 self.get_time(),
                 session_id
             )
         
         self.current_session_id = None
+        return label
 
     # Inserts a new device into the DB & Return the id
     async def insert_device(self, label, category, ip_address) -> int:
 
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
 
             return await conn.fetchval(
                 """
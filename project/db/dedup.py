@@ -0,0 +1,183 @@
+import os
+from collections import deque
+from operator import itemgetter
+from fast_server.metrics import ROWS_DROPPED
+
+# Recent frame ids remembered per device -- Replays inside the window never reach the database, 0 turns it off
+DEDUP_WINDOW = int(os.getenv("DEDUP_WINDOW", 4096))
+
+# Measurement table -> columns a sample is unique on (migration 6) -- Several markers share one camera frame
+# The device timestamp is part of the key: a retry repeats it exactly, a device that rebooted and restarted
+# its counter mid-session does not, so its new samples are never taken for replays
+UNIQUE_KEYS = {
+    "imu_measurement": ("device_id", "session_id", "frame_id", "capture_time"),
+    "image_detection": ("device_id", "session_id", "frame_idx", "marker_idx", "capture_time"),
+    "robot": ("device_id", "session_id", "frame_id", "ts_epoch"),
+}
+
+
+def unique_index_name(table: str) -> str:
+    return f"{table}_dedup_idx"
+
+
+# COPY target for one table -- Per connection, emptied on every commit or rollback
+def stage_sql(table: str, columns) -> str:
+
+    return (
+        f"CREATE TEMP TABLE IF NOT EXISTS stage_{table} ON COMMIT DELETE ROWS "
+        f"AS SELECT {', '.join(columns)} FROM {table} WITH NO DATA"
+    )
+
+
+# Moves the staged rows into the table -- Rows that already exist are skipped, the keys of the rest come back
+def merge_sql(table: str, columns) -> str:
+
+    cols = ", ".join(columns)
+
+    return (
+        f"INSERT INTO {table} ({cols}) SELECT {cols} FROM stage_{table} "
+        f"ON CONFLICT DO NOTHING RETURNING {', '.join(UNIQUE_KEYS[table])}"
+    )
+
+
+def _missing(frame: tuple) -> bool:
+    return None in frame
+
+
+# Last `size` frames of one device -- Set for the lookup, deque for the eviction order
+class FrameWindow:
+    __slots__ = ("size", "seen", "order")
+
+    def __init__(self, size: int = DEDUP_WINDOW):
+        self.size = size
+        self.seen = set()
+        self.order = deque()
+
+    def __contains__(self, frame) -> bool:
+        return frame in self.seen
+
+    def add(self, frame) -> None:
+
+        if frame in self.seen:
+            return
+
+        if len(self.order) >= self.size:
+            self.seen.discard(self.order.popleft())
+
+        self.order.append(frame)
+        self.seen.add(frame)
+
+
+class Deduplicator:
+
+    # `columns` is the insert_*_batch record layout of the stream (rollups.RECORD_COLUMNS)
+    def __init__(self, stream: str, table: str, columns, size: int = DEDUP_WINDOW):
+        self.stream = stream
+        self.table = table
+        self.columns = tuple(columns)
+        self.size = size
+
+        key = [self.columns.index(c) for c in UNIQUE_KEYS[table]]
+        self._device, self._session = key[0], key[1]
+
+        # Frame id plus device timestamp (plus marker for camera) -- Always a tuple, every key has at least two
+        self.frame = itemgetter(*key[2:])
+        self.key = itemgetter(*key)
+
+        self.windows: dict[int, FrameWindow] = {}
+        self.session = None
+        self.merge = merge_sql(table, self.columns)
+        self.stage = stage_sql(table, self.columns)
+        self._window_drops = ROWS_DROPPED.labels(stream, "duplicate")
+        self._db_drops = ROWS_DROPPED.labels(stream, "conflict")
+
+    # Frame ids restart with every session -- Windows of the previous one are dropped
+    def _follow(self, session) -> None:
+
+        if session != self.session:
+            self.windows.clear()
+            self.session = session
+
+    # Records not seen recently, and no repeats inside the batch -- Nothing is remembered until `commit`,
+    # so a batch that fails to insert is not filtered out of its own retry
+    def filter(self, records: list[tuple]) -> list[tuple]:
+
+        if self.size <= 0 or not records:
+            return records
+
+        self._follow(records[0][self._session])
+
+        fresh, batch = [], set()
+        for r in records:
+            frame = self.frame(r)
+
+            # NULLs are never equal in the unique index either
+            if _missing(frame):
+                fresh.append(r)
+                continue
+
+            key = (r[self._device], frame)
+            window = self.windows.get(key[0])
+
+            if key in batch or (window is not None and frame in window):
+                continue
+
+            batch.add(key)
+            fresh.append(r)
+
+        if len(fresh) < len(records):
+            self._window_drops.inc(len(records) - len(fresh))
+
+        return fresh
+
+    # Remembers records that are now in the database
+    def commit(self, records: list[tuple]) -> None:
+
+        if self.size <= 0 or not records:
+            return
+
+        self._follow(records[0][self._session])
+
+        for r in records:
+            frame = self.frame(r)
+            if _missing(frame):
+                continue
+
+            window = self.windows.get(r[self._device])
+            if window is None:
+                window = self.windows[r[self._device]] = FrameWindow(self.size)
+
+            window.add(frame)
+
+    # COPY into the staging table, then merge -- Returns the records that were actually inserted, in order
+    async def insert(self, conn, records: list[tuple]) -> list[tuple]:
+
+        if not records:
+            return records
+
+        await conn.execute(self.stage)
+        await conn.copy_records_to_table(f"stage_{self.table}", records=records, columns=self.columns)
+        rows = await conn.fetch(self.merge)
+
+        if len(rows) == len(records):
+            return records
+
+        # A key comes back once per inserted row -- Repeats in the batch past the first are dropped too
+        inserted = {}
+        for row in rows:
+            key = tuple(row)
+            inserted[key] = inserted.get(key, 0) + 1
+
+        kept = []
+        for r in records:
+            key = self.key(r)
+            if inserted.get(key):
+                inserted[key] -= 1
+                kept.append(r)
+
+        self._db_drops.inc(len(records) - len(kept))
+        return kept
+
+    def clear(self) -> None:
+        self.windows.clear()
+        self.session = None
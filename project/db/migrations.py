@@ -0,0 +1,496 @@
+"""
+migrations.py
+Versioned schema migrations, applied at FastAPI startup before any ingest starts.
+Applied versions are recorded in schema_migrations, and a session advisory lock keeps
+two starting containers from running the same migration twice.
+
+To change the schema, append a Migration to MIGRATIONS -- Never edit one that has shipped.
+
+Run from the project folder (uses the DB_* env vars):
+    python -m db.migrations            # apply pending migrations, verify indexes and query plans
+    python -m db.migrations --status   # list applied versions
+    python -m db.migrations --deduplicate   # delete stored duplicates, then build the unique indexes (db.dedup)
+"""
+
+import asyncio, json, os, sys, time
+from typing import Awaitable, Callable
+from db import dedup, packing, partitions, rollups, sequence
+from fast_server import loggers
+
+# pg_advisory_lock key -- Session level, CREATE INDEX CONCURRENTLY cannot run inside a transaction
+MIGRATION_LOCK_KEY = 560_0411
+
+
+class MigrationError(Exception):
+
+    def __init__(self, message, data=None):
+        super().__init__(message)
+        self.data = data
+        self.message = message
+
+
+class Migration:
+
+    # `apply` is SQL, or a coroutine taking the connection
+    # Non-transactional migrations must be idempotent -- A crash can leave them half applied
+    def __init__(self, version: int, name: str, apply: str | Callable[..., Awaitable], transactional: bool = True):
+        self.version = version
+        self.name = name
+        self.apply = apply
+        self.transactional = transactional
+
+    async def run(self, conn) -> None:
+
+        if isinstance(self.apply, str):
+            await conn.execute(self.apply)
+        else:
+            await self.apply(conn)
+
+
+# ---------------------------------------------------------------------------
+# Indexes the hot queries depend on -- (table, index name, columns)
+# ---------------------------------------------------------------------------
+
+REQUIRED_INDEXES = (
+    ("session", "session_label_idx", ("label",)),
+    ("session_device", "session_device_device_session_idx", ("device_id", "session_id")),
+    ("imu_measurement", "imu_measurement_session_capture_idx", ("session_id", "capture_time")),
+    ("image_detection", "image_detection_session_capture_idx", ("session_id", "capture_time")),
+
+    # Robot rows have no capture_time -- retrieve_robot orders by ts_epoch
+    ("robot", "robot_session_ts_idx", ("session_id", "ts_epoch")),
+    ("imu_packed", "imu_packed_session_chunk_idx", ("session_id", "chunk_start")),
+)
+
+# Ingest retries rely on these to skip rows already stored (db.dedup) -- (table, index name, columns)
+UNIQUE_INDEXES = tuple((table, dedup.unique_index_name(table), columns) for table, columns in dedup.UNIQUE_KEYS.items())
+
+
+# Valid / invalid plain indexes on a table whose leading columns are `columns`
+# A unique index only counts as an exact match -- A longer key does not keep `columns` unique
+async def find_index(conn, table: str, columns, unique: bool = False) -> dict | None:
+
+    rows = await conn.fetch("""
+        SELECT
+            c.relname AS name,
+            i.indisvalid AS valid,
+            i.indisunique AS unique,
+            array(
+                SELECT a.attname::text
+                FROM unnest(i.indkey::int2[]) WITH ORDINALITY AS k(attnum, ord)
+                JOIN pg_attribute AS a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+                ORDER BY k.ord
+            ) AS columns
+        FROM pg_index AS i
+        JOIN pg_class AS c ON c.oid = i.indexrelid
+        WHERE i.indrelid = to_regclass($1)
+        AND i.indpred IS NULL
+        ORDER BY i.indisvalid DESC
+    """, table)
+
+    for r in rows:
+        if unique and (not r.get("unique") or tuple(r["columns"]) != tuple(columns)):
+            continue
+
+        if tuple(r["columns"][:len(columns)]) == tuple(columns):
+            return {"name": r["name"], "valid": r["valid"]}
+
+    return None
+
+
+# Creates the index unless an equivalent one exists -- Returns the created name, None when nothing was needed
+async def ensure_index(conn, table: str, name: str, columns, unique: bool = False) -> str | None:
+
+    # Tables a later migration creates -- prepare() checks again once every migration ran
+    if not await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", table):
+        return None
+
+    found = await find_index(conn, table, columns, unique)
+    if found and found["valid"]:
+        return None
+
+    # An interrupted CONCURRENTLY build leaves an invalid index behind that still slows every write
+    if found:
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {found['name']}")
+
+    cols = ", ".join(columns)
+    create = "CREATE UNIQUE INDEX" if unique else "CREATE INDEX"
+
+    # Partitioned parents cannot build CONCURRENTLY -- Build on each partition first, the parent index then attaches them
+    if await partitions.is_partitioned(conn, table):
+        for part in await partitions.list_partitions(conn, table):
+            await ensure_index(conn, part, f"{part}_{'_'.join(columns)}_idx", columns, unique)
+
+        # A unique parent index must contain the partition key -- Under the day strategy each partition
+        # enforces it alone (partitions.create_partition adds it to new ones), so a replay is only caught within a day
+        if unique and await partitions.partition_column(conn, table) not in columns:
+            return name
+
+        await conn.execute(f"{create} IF NOT EXISTS {name} ON {table} ({cols})")
+
+    # Populated tables keep taking inserts while the index builds
+    elif await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM {table})"):
+        await conn.execute(f"{create} CONCURRENTLY IF NOT EXISTS {name} ON {table} ({cols})")
+
+    else:
+        await conn.execute(f"{create} IF NOT EXISTS {name} ON {table} ({cols})")
+
+    found = await find_index(conn, table, columns, unique)
+    if not found or not found["valid"]:
+        raise MigrationError(f"Index {name} on {table} ({cols}) did not build.")
+
+    return name
+
+
+async def ensure_required_indexes(conn) -> list[str]:
+
+    created = []
+    for table, name, columns in REQUIRED_INDEXES:
+        if await ensure_index(conn, table, name, columns):
+            created.append(name)
+
+    return created
+
+
+# A table still holding duplicates is skipped, not fatal -- Its rows are only rewritten on request (--deduplicate)
+async def ensure_unique_indexes(conn) -> list[str]:
+
+    created = []
+    for table, name, columns in UNIQUE_INDEXES:
+        try:
+            if await ensure_index(conn, table, name, columns, unique=True):
+                created.append(name)
+
+        # unique_violation -- The failed CONCURRENTLY build leaves an invalid index that would still slow every write
+        except Exception as e:
+            if getattr(e, "sqlstate", None) != "23505":
+                raise
+
+            await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            loggers.log_system_logger(
+                f"{table} holds duplicate samples, {name} not built. Run python -m db.migrations --deduplicate", True
+            )
+
+    return created
+
+
+# Rows from before the Feb 23 change were backfilled with frame_id 0 and capture_time 0 (db/migrations.md)
+# Placeholders, not frame ids -- NULL keeps them out of the unique index instead of deleting all but one
+LEGACY_FRAME_IDS = "UPDATE imu_measurement SET frame_id = NULL WHERE session_id = $1 AND frame_id = 0 AND capture_time = 0"
+
+
+# Keeps the first copy of every sample stored more than once (batch retries from before the unique indexes)
+# One session per statement -- session_id is part of every key, and each statement commits on its own
+async def delete_duplicates(conn, table: str, sessions: list[int]) -> int:
+
+    columns = [c for c in dedup.UNIQUE_KEYS[table] if c != "session_id"]
+    match = " AND ".join(f"a.{c} = b.{c}" for c in columns)
+
+    deleted = 0
+    for session in sessions:
+        status = await conn.execute(
+            f"DELETE FROM {table} AS a USING {table} AS b "
+            f"WHERE a.session_id = $1 AND b.session_id = $1 AND {match} AND a.id > b.id",
+            session,
+        )
+        deleted += int(status.split()[-1])
+
+    return deleted
+
+
+# Rewrites stored rows so the unique indexes can build -- Only on request, never at startup
+# A rerun after a crash just finds nothing left to do
+async def deduplicate(conn) -> dict:
+
+    sessions = [r["id"] for r in await conn.fetch("SELECT id FROM session ORDER BY id")]
+    result = {"frame_ids_cleared": 0, "deleted": {}}
+
+    if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", "imu_measurement"):
+        for session in sessions:
+            status = await conn.execute(LEGACY_FRAME_IDS, session)
+            result["frame_ids_cleared"] += int(status.split()[-1])
+
+        loggers.log_system_logger(f"Deduplicate: imu_measurement placeholder frame ids cleared: {result['frame_ids_cleared']}")
+
+    for table in dedup.UNIQUE_KEYS:
+        if not await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", table):
+            continue
+
+        result["deleted"][table] = await delete_duplicates(conn, table, sessions)
+        loggers.log_system_logger(f"Deduplicate: {table} duplicate rows deleted: {result['deleted'][table]}")
+
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_KEY)
+    try:
+        result["indexes"] = await ensure_unique_indexes(conn)
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_KEY)
+
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Migrations -- Append only
+# ---------------------------------------------------------------------------
+
+BASELINE = """
+CREATE TABLE IF NOT EXISTS device (
+    id serial PRIMARY KEY,
+    label text NOT NULL UNIQUE,
+    category text,
+    ip_address text,
+    registered_at double precision
+);
+
+CREATE TABLE IF NOT EXISTS session (
+    id serial PRIMARY KEY,
+    label text NOT NULL UNIQUE,
+    started_at double precision,
+    ended_at double precision
+);
+
+CREATE TABLE IF NOT EXISTS session_device (
+    device_id integer NOT NULL REFERENCES device (id),
+    session_id integer NOT NULL REFERENCES session (id),
+    PRIMARY KEY (device_id, session_id)
+);
+
+CREATE TABLE IF NOT EXISTS imu_measurement (
+    id bigserial PRIMARY KEY,
+    frame_id bigint,
+    capture_time double precision,
+    recorded_at double precision,
+    ingested_at double precision,
+    device_id integer REFERENCES device (id),
+    session_id integer REFERENCES session (id),
+    accel_x double precision, accel_y double precision, accel_z double precision,
+    gyro_x double precision, gyro_y double precision, gyro_z double precision,
+    mag_x double precision, mag_y double precision, mag_z double precision,
+    yaw double precision, pitch double precision, roll double precision
+);
+
+CREATE TABLE IF NOT EXISTS image_detection (
+    id bigserial PRIMARY KEY,
+    frame_idx bigint,
+    capture_time double precision,
+    recorded_at double precision,
+    marker_idx integer,
+    rvec_x double precision, rvec_y double precision, rvec_z double precision,
+    tvec_x double precision, tvec_y double precision, tvec_z double precision,
+    image_path text,
+    device_id integer REFERENCES device (id),
+    session_id integer REFERENCES session (id),
+    ingested_at double precision
+);
+
+CREATE TABLE IF NOT EXISTS robot (
+    id bigserial PRIMARY KEY,
+    frame_id bigint,
+    ts_epoch double precision,
+    joint_1 double precision, joint_2 double precision, joint_3 double precision,
+    joint_4 double precision, joint_5 double precision, joint_6 double precision,
+    x double precision, y double precision, z double precision,
+    w double precision, p double precision, r double precision,
+    recorded_at double precision,
+    ingested_at double precision,
+    device_id integer REFERENCES device (id),
+    session_id integer REFERENCES session (id)
+);
+"""
+
+# The Feb 23 change from db/migrations.md -- Databases built before it are missing the columns
+IMU_FRAME_COLUMNS = """
+ALTER TABLE imu_measurement ADD COLUMN IF NOT EXISTS frame_id bigint;
+ALTER TABLE imu_measurement ADD COLUMN IF NOT EXISTS capture_time double precision;
+"""
+
+MIGRATIONS = [
+    Migration(1, "baseline tables", BASELINE),
+    Migration(2, "imu frame_id / capture_time", IMU_FRAME_COLUMNS),
+    Migration(3, "required indexes", ensure_required_indexes, transactional=False),
+    Migration(4, "imu packed storage", packing.IMU_PACKED_DDL),
+    Migration(5, "per-second / per-minute rollups", rollups.ROLLUP_DDL),
+    Migration(6, "unique frame ids per device and session", ensure_unique_indexes, transactional=False),
+    Migration(7, "ingest gap intervals", sequence.GAP_DDL),
+]
+
+
+async def applied_versions(conn) -> dict[int, dict]:
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version integer PRIMARY KEY,
+            name text NOT NULL,
+            applied_at double precision NOT NULL
+        )
+    """)
+
+    rows = await conn.fetch("SELECT version, name, applied_at FROM schema_migrations ORDER BY version")
+    return {r["version"]: dict(r) for r in rows}
+
+
+# Applies every pending migration in version order -- Returns the versions applied
+async def migrate(conn, migrations=MIGRATIONS) -> list[int]:
+
+    versions = [m.version for m in migrations]
+    if versions != sorted(set(versions)):
+        raise MigrationError(f"Migration versions must be unique and ascending: {versions}")
+
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_KEY)
+
+    try:
+        applied = await applied_versions(conn)
+        done = []
+
+        for m in migrations:
+            if m.version in applied:
+                continue
+
+            try:
+                if m.transactional:
+                    async with conn.transaction():
+                        await m.run(conn)
+                        await _record(conn, m)
+                else:
+                    await m.run(conn)
+                    await _record(conn, m)
+
+            except Exception as e:
+                raise MigrationError(f"Migration {m.version} ({m.name}) failed: {e}") from e
+
+            done.append(m.version)
+
+        return done
+
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_KEY)
+
+
+async def _record(conn, m: Migration) -> None:
+
+    await conn.execute(
+        "INSERT INTO schema_migrations (version, name, applied_at) VALUES ($1, $2, $3)",
+        m.version, m.name, time.time()
+    )
+
+
+# ---------------------------------------------------------------------------
+# Plan check -- Every per-session read must be able to use an index
+# ---------------------------------------------------------------------------
+
+def _scans(plan: dict):
+
+    if "Relation Name" in plan:
+        yield plan["Node Type"], plan["Relation Name"]
+
+    for child in plan.get("Plans", []):
+        yield from _scans(child)
+
+
+# Sequential scans that are a problem -- A partition holding exactly one session is read whole anyway
+def bad_scans(plan: dict) -> list[str]:
+
+    bad = []
+    for node, relation in _scans(plan):
+        if node != "Seq Scan":
+            continue
+
+        single_session = any(
+            partitions.partition_key(table, "session", relation) is not None
+            for table in partitions.PARTITIONED_TABLES
+        )
+
+        if not single_session:
+            bad.append(relation)
+
+    return bad
+
+
+async def explain(conn, query: str, *args) -> dict:
+
+    # With seq scans priced out the planner shows an index whenever one is usable, even on a near-empty table
+    async with conn.transaction():
+        await conn.execute("SET LOCAL enable_seqscan = off")
+        raw = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}", *args)
+
+    return (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+
+
+# `session_queries` maps name -> (alias, query with a {where} slot), `lookup` is the label -> session query
+async def check_plans(conn, session_queries: dict, lookup: str) -> dict:
+
+    scope = await conn.fetchrow("SELECT id, started_at, ended_at FROM session ORDER BY id DESC LIMIT 1")
+    scope = scope or {"id": 0, "started_at": 0.0, "ended_at": None}
+
+    report = {"session_lookup": bad_scans(await explain(conn, lookup, "label"))}
+
+    for name, (alias, query) in session_queries.items():
+        where, args = partitions.session_predicate(alias, scope)
+        report[name] = bad_scans(await explain(conn, query.format(where=where), *args))
+
+    return report
+
+
+def assert_plans(report: dict) -> None:
+
+    failing = {name: scans for name, scans in report.items() if scans}
+    if failing:
+        raise MigrationError(f"Queries fall back to sequential scans: {failing}", failing)
+
+
+# Everything startup needs before ingest -- Migrations, partitions, index verification, plan check
+async def prepare(conn, session_queries: dict, lookup: str) -> dict:
+
+    applied = await migrate(conn)
+    parts = await partitions.setup(conn)
+
+    # Re-checked every start -- Indexes dropped by hand or partition conversion are rebuilt here
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_KEY)
+    try:
+        indexes = await ensure_required_indexes(conn) + await ensure_unique_indexes(conn)
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_KEY)
+
+    plans = await check_plans(conn, session_queries, lookup)
+
+    return {"applied": applied, "partitions": parts, "indexes": indexes, "plans": plans}
+
+
+async def _main(argv: list[str]) -> int:
+
+    import asyncpg
+    from db.database import SESSION_LOOKUP, session_queries
+
+    conn = await asyncpg.connect(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT", 5432)),
+        database=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+    )
+
+    try:
+        if "--status" in argv:
+            for v in (await applied_versions(conn)).values():
+                print(f"{v['version']:>4}  {v['name']}")
+            return 0
+
+        if "--deduplicate" in argv:
+            print(json.dumps(await deduplicate(conn), indent=2))
+            return 0
+
+        result = await prepare(conn, session_queries(), SESSION_LOOKUP)
+        print(json.dumps(result, indent=2, default=str))
+
+        assert_plans(result["plans"])
+        return 0
+
+    except MigrationError as e:
+        print(e.message, file=sys.stderr)
+        return 1
+
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,91 @@
+import math, os
+from fast_server.latency import to_seconds
+
+# rows (one row per sample) | packed (one row per device per chunk) | both (write both, read rows)
+IMU_STORAGE = os.getenv("IMU_STORAGE", "rows").lower()
+IMU_STORAGE_MODES = ("rows", "packed", "both")
+
+# Capture-time span of one packed row -- A flush that straddles a boundary writes one row per side
+IMU_CHUNK_SECONDS = float(os.getenv("IMU_CHUNK_SECONDS", 1.0))
+
+# imu_measurement columns in insert_imu_batch record order
+IMU_COLUMNS = (
+    "frame_id", "capture_time", "recorded_at", "ingested_at", "device_id", "session_id",
+    "accel_x", "accel_y", "accel_z",
+    "gyro_x", "gyro_y", "gyro_z",
+    "mag_x", "mag_y", "mag_z",
+    "yaw", "pitch", "roll",
+)
+IMU_CHANNELS = IMU_COLUMNS[6:]
+
+# Per-sample arrays -- Timestamps stay float8 (epoch ms does not fit a float4), channels are float4
+PACKED_ARRAYS = ("frame_id", "capture_time", "recorded_at") + IMU_CHANNELS
+
+IMU_PACKED_INSERT = f"""
+    INSERT INTO imu_packed (
+        device_id, session_id, chunk_start, samples, ingested_at,
+        {", ".join(PACKED_ARRAYS)}
+    )
+    VALUES ({", ".join(f"${i}" for i in range(1, 6 + len(PACKED_ARRAYS)))})
+"""
+
+# Where imu reads come from -- Packed mode still reads rows written before the switch
+_COLS = ", ".join(IMU_COLUMNS)
+IMU_SOURCES = {
+    "rows": "imu_measurement",
+    "both": "imu_measurement",
+    "packed": f"(SELECT id, {_COLS} FROM imu_measurement UNION ALL SELECT id, {_COLS} FROM imu_packed_samples)",
+}
+
+# Created by migration 4 -- The view unpacks in SQL so retrieval, CSV export and the latency report stay unchanged
+IMU_PACKED_DDL = f"""
+CREATE TABLE IF NOT EXISTS imu_packed (
+    id bigserial PRIMARY KEY,
+    device_id integer REFERENCES device (id),
+    session_id integer REFERENCES session (id),
+    chunk_start double precision NOT NULL,
+    samples integer NOT NULL,
+    ingested_at double precision,
+    frame_id bigint[],
+    capture_time double precision[],
+    recorded_at double precision[],
+    {", ".join(f"{c} real[]" for c in IMU_CHANNELS)}
+);
+
+CREATE OR REPLACE VIEW imu_packed_samples AS
+SELECT
+    NULL::bigint AS id,
+    u.frame_id, u.capture_time, u.recorded_at,
+    p.ingested_at, p.device_id, p.session_id,
+    {", ".join(f"u.{c}::double precision AS {c}" for c in IMU_CHANNELS)}
+FROM imu_packed AS p
+CROSS JOIN LATERAL unnest({", ".join(f"p.{c}" for c in PACKED_ARRAYS)})
+    AS u({", ".join(PACKED_ARRAYS)});
+"""
+
+
+# Groups insert_imu_batch records into imu_packed rows -- One per (device, session, chunk), samples kept in arrival order
+def pack_imu(records: list[tuple], chunk_seconds: float = IMU_CHUNK_SECONDS) -> list[tuple]:
+
+    chunks = {}
+
+    for r in records:
+        capture = r[1] if r[1] is not None else r[3]
+        start = math.floor(to_seconds(capture) / chunk_seconds) * chunk_seconds
+        key = (r[4], r[5], start)
+
+        chunk = chunks.get(key)
+        if chunk is None:
+            chunk = chunks[key] = {"ingested_at": r[3], "arrays": [[] for _ in PACKED_ARRAYS]}
+
+        arrays = chunk["arrays"]
+        arrays[0].append(r[0])
+        arrays[1].append(r[1])
+        arrays[2].append(r[2])
+        for i, value in enumerate(r[6:], start=3):
+            arrays[i].append(value)
+
+    return [
+        (device_id, session_id, start, len(chunk["arrays"][0]), chunk["ingested_at"], *chunk["arrays"])
+        for (device_id, session_id, start), chunk in chunks.items()
+    ]
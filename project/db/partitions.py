@@ -0,0 +1,354 @@
+import asyncio, os, re, time
+from datetime import datetime, timezone
+from db import dedup
+from fast_server import loggers
+
+# Measurement tables that are range partitioned
+PARTITIONED_TABLES = ("imu_measurement", "image_detection", "robot")
+
+# off | session (one partition per session id) | day (one partition per UTC day of ingested_at)
+PARTITION_STRATEGY = os.getenv("PARTITION_STRATEGY", "off").lower()
+
+# Partition key column per strategy
+STRATEGY_KEYS = {
+    "session": "session_id",
+    "day": "ingested_at",
+}
+
+# Partitions created ahead of need -- Next session ids, or the coming days
+PARTITIONS_AHEAD = int(os.getenv("PARTITIONS_AHEAD", 3))
+
+# Finished sessions / days older than this are detached into the archive schema (0 keeps everything attached)
+PARTITION_RETENTION_DAYS = float(os.getenv("PARTITION_RETENTION_DAYS", 0))
+PARTITION_ARCHIVE_SCHEMA = os.getenv("PARTITION_ARCHIVE_SCHEMA", "archive")
+
+# How often the maintenance task runs
+PARTITION_MAINTENANCE_INTERVAL = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", 3600))
+
+# Rows are stamped at flush time -- A session's rows can land slightly after ended_at
+SESSION_SLACK_SECONDS = 120.0
+
+# pg_advisory_xact_lock key so two starting containers never convert the same table
+PARTITION_LOCK_KEY = 560_0401
+
+DAY = 86400
+
+
+class PartitioningError(Exception):
+
+    def __init__(self, message, data=None):
+        super().__init__(message)
+        self.data = data
+        self.message = message
+
+
+# ---------------------------------------------------------------------------
+# Names and bounds -- Partition names encode their range so maintenance can work from names alone
+# ---------------------------------------------------------------------------
+
+def day_start(ts: float) -> int:
+    return int(ts // DAY * DAY)
+
+
+def partition_name(table: str, strategy: str, key) -> str:
+
+    if strategy == "session":
+        return f"{table}_s{int(key)}"
+
+    return f"{table}_d{datetime.fromtimestamp(day_start(key), tz=timezone.utc):%Y%m%d}"
+
+
+def partition_bounds(strategy: str, key) -> tuple:
+
+    if strategy == "session":
+        return int(key), int(key) + 1
+
+    start = day_start(key)
+    return start, start + DAY
+
+
+# Parses a partition name back to its key -- None for the legacy / default partitions
+def partition_key(table: str, strategy: str, name: str):
+
+    if strategy == "session":
+        m = re.fullmatch(rf"{re.escape(table)}_s(\d+)", name)
+        return int(m.group(1)) if m else None
+
+    m = re.fullmatch(rf"{re.escape(table)}_d(\d{{8}})", name)
+    if not m:
+        return None
+
+    return datetime.strptime(m.group(1), "%Y%m%d").replace(tzinfo=timezone.utc).timestamp()
+
+
+# Day partitions whose whole range is older than the cutoff
+def expired_days(table: str, names: list[str], cutoff: float) -> list[str]:
+
+    expired = []
+    for name in names:
+        key = partition_key(table, "day", name)
+        if key is not None and key + DAY <= cutoff:
+            expired.append(name)
+
+    return expired
+
+
+# WHERE fragment for one session's rows -- A constant key on the partition column lets the planner prune
+def session_predicate(alias: str, scope, first_param: int = 1, strategy: str | None = None) -> tuple[str, list]:
+
+    strategy = strategy or PARTITION_STRATEGY
+    sql = f"{alias}.session_id = ${first_param}"
+    args = [scope["id"]]
+
+    if strategy == "day":
+        upper = scope["ended_at"] + SESSION_SLACK_SECONDS if scope["ended_at"] else float("inf")
+        sql += f" AND {alias}.ingested_at >= ${first_param + 1} AND {alias}.ingested_at < ${first_param + 2}"
+        args += [scope["started_at"] - SESSION_SLACK_SECONDS, upper]
+
+    return sql, args
+
+
+# ---------------------------------------------------------------------------
+# DDL -- Every function takes a connection and is meant to run inside a transaction
+# ---------------------------------------------------------------------------
+
+async def is_partitioned(conn, table: str) -> bool:
+
+    return await conn.fetchval(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass($1))",
+        table,
+    )
+
+
+async def list_partitions(conn, table: str) -> list[str]:
+
+    rows = await conn.fetch("""
+        SELECT c.relname
+        FROM pg_inherits AS i
+        JOIN pg_class AS c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass($1)
+        ORDER BY c.relname
+    """, table)
+
+    return [r["relname"] for r in rows]
+
+
+# Upper bound of the converted legacy partition -- Ranges below it are already covered
+async def legacy_upper(conn, table: str) -> float | None:
+
+    bound = await conn.fetchval(
+        "SELECT pg_get_expr(c.relpartbound, c.oid) FROM pg_class AS c WHERE c.oid = to_regclass($1)",
+        f"{table}_legacy",
+    )
+
+    m = re.search(r"TO \('?([\d.]+)'?\)", bound or "")
+    return float(m.group(1)) if m else None
+
+
+# Column the table is range partitioned on -- None for a plain table
+async def partition_column(conn, table: str) -> str | None:
+
+    definition = await conn.fetchval("SELECT pg_get_partkeydef(to_regclass($1))", table)
+
+    m = re.fullmatch(r"RANGE \((\w+)\)", definition or "")
+    return m.group(1) if m else None
+
+
+async def create_partition(conn, table: str, strategy: str, key) -> str:
+
+    name = partition_name(table, strategy, key)
+    low, high = partition_bounds(strategy, key)
+
+    await conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} FOR VALUES FROM ({low}) TO ({high})"
+    )
+
+    # The parent cannot hold a unique index without the partition key -- Each day gets its own (see migrations.ensure_index)
+    columns = dedup.UNIQUE_KEYS.get(table, ())
+    if columns and STRATEGY_KEYS[strategy] not in columns:
+        await conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {name}_{'_'.join(columns)}_idx ON {name} ({', '.join(columns)})")
+
+    return name
+
+
+# Primary and foreign keys of a table as (name, kind, definition) -- Re-created on the parent by convert_table
+async def _keys(conn, table: str) -> list[tuple]:
+
+    rows = await conn.fetch(
+        "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass($1) AND contype IN ('p', 'f') ORDER BY contype DESC, conname",
+        table,
+    )
+
+    return [tuple(r) for r in rows]
+
+
+# First key value the legacy table does not cover -- New partitions start here
+async def _legacy_cutoff(conn, table: str, strategy: str):
+
+    if strategy == "session":
+        return await conn.fetchval("SELECT coalesce(max(id), 0) + 1 FROM session")
+
+    newest = await conn.fetchval(f"SELECT max(ingested_at) FROM {table}")
+    return day_start(max(newest or 0, time.time())) + DAY
+
+
+# Turns a plain table into a partitioned one without copying rows -- The old heap becomes one partition
+async def convert_table(conn, table: str, strategy: str) -> bool:
+
+    if await is_partitioned(conn, table):
+        return False
+
+    key = STRATEGY_KEYS[strategy]
+    legacy = f"{table}_legacy"
+
+    # Range partitions cannot hold NULL keys outside the default partition
+    nulls = await conn.fetchval(f"SELECT count(*) FROM {table} WHERE {key} IS NULL")
+    if nulls:
+        raise PartitioningError(f"{table} has {nulls} rows with NULL {key}. Fix them before partitioning.")
+
+    cutoff = await _legacy_cutoff(conn, table, strategy)
+    seq = await conn.fetchval("SELECT pg_get_serial_sequence($1, 'id')", table)
+    constraints = await _keys(conn, table)
+
+    await conn.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    await conn.execute(f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE ({key})")
+
+    # LIKE never copies keys -- Without them on the parent, partitions created later have no foreign keys or primary key
+    for name, kind, definition in constraints:
+        if kind == "p":
+            # The name belongs to the legacy index until renamed, and a partitioned primary key must hold the partition key
+            await conn.execute(f"ALTER TABLE {legacy} RENAME CONSTRAINT {name} TO {legacy}_pkey")
+            await conn.execute(f"ALTER TABLE {legacy} ALTER COLUMN {key} SET NOT NULL")
+            columns = [c.strip() for c in re.search(r"\((.*)\)", definition).group(1).split(",")]
+            definition = f"PRIMARY KEY ({', '.join(columns + [key] if key not in columns else columns)})"
+
+        await conn.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+
+    # The id sequence must outlive the legacy partition if it is ever detached
+    if seq:
+        await conn.execute(f"ALTER SEQUENCE {seq} OWNED BY {table}.id")
+
+    await conn.execute(f"ALTER TABLE {table} ATTACH PARTITION {legacy} FOR VALUES FROM (MINVALUE) TO ({cutoff})")
+
+    # Safety net for rows outside every range (e.g. a session created by hand in pgAdmin)
+    await conn.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+
+    return True
+
+
+async def create_ahead(conn, strategy: str, ahead: int = PARTITIONS_AHEAD) -> list[str]:
+
+    if strategy == "session":
+        seq = await conn.fetchval("SELECT pg_get_serial_sequence('session', 'id')")
+        last, called = await conn.fetchrow(f"SELECT last_value, is_called FROM {seq}")
+        first = last + 1 if called else last
+        keys = range(first, first + ahead)
+    else:
+        today = day_start(time.time())
+        keys = [today + i * DAY for i in range(ahead + 1)]
+
+    created = []
+    for table in PARTITIONED_TABLES:
+        existing = set(await list_partitions(conn, table))
+        covered = await legacy_upper(conn, table) or float("-inf")
+
+        for key in keys:
+            if partition_name(table, strategy, key) not in existing and partition_bounds(strategy, key)[0] >= covered:
+                created.append(await create_partition(conn, table, strategy, key))
+
+    return created
+
+
+# Detaches partitions past retention and parks them in the archive schema -- Data is kept, just out of the hot tables
+async def archive_expired(conn, strategy: str, retention_days: float = PARTITION_RETENTION_DAYS,
+                          schema: str = PARTITION_ARCHIVE_SCHEMA) -> list[str]:
+
+    if retention_days <= 0:
+        return []
+
+    cutoff = time.time() - retention_days * DAY
+    archived = []
+
+    if strategy == "session":
+        rows = await conn.fetch(
+            "SELECT id FROM session WHERE ended_at IS NOT NULL AND ended_at < $1", cutoff
+        )
+        expired_ids = {r["id"] for r in rows}
+
+    for table in PARTITIONED_TABLES:
+        names = await list_partitions(conn, table)
+
+        if strategy == "session":
+            expired = [n for n in names if partition_key(table, strategy, n) in expired_ids]
+        else:
+            expired = expired_days(table, names, cutoff)
+
+        for name in expired:
+            await conn.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+            await conn.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            await conn.execute(f"ALTER TABLE {name} SET SCHEMA {schema}")
+            archived.append(f"{schema}.{name}")
+
+    return archived
+
+
+# ---------------------------------------------------------------------------
+# Entry points used by DatabaseSingleton / FastAPI startup
+# ---------------------------------------------------------------------------
+
+async def setup(conn, strategy: str = PARTITION_STRATEGY) -> dict:
+
+    if strategy not in STRATEGY_KEYS:
+        return {"strategy": "off"}
+
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock($1)", PARTITION_LOCK_KEY)
+
+        converted = [t for t in PARTITIONED_TABLES if await convert_table(conn, t, strategy)]
+        created = await create_ahead(conn, strategy)
+
+    return {"strategy": strategy, "converted": converted, "created": created}
+
+
+async def maintain(conn, strategy: str = PARTITION_STRATEGY) -> dict:
+
+    if strategy not in STRATEGY_KEYS:
+        return {"strategy": "off"}
+
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock($1)", PARTITION_LOCK_KEY)
+
+        created = await create_ahead(conn, strategy)
+        archived = await archive_expired(conn, strategy)
+
+    return {"strategy": strategy, "created": created, "archived": archived}
+
+
+# Called right after a session row is inserted, before any of its rows can arrive
+async def session_created(conn, session_id: int, strategy: str = PARTITION_STRATEGY) -> None:
+
+    if strategy != "session":
+        return
+
+    for table in PARTITIONED_TABLES:
+        await create_partition(conn, table, strategy, session_id)
+
+
+# Periodic maintenance -- `acquire` is DatabaseSingleton.acquire bound to the admin pool
+async def run(acquire, interval: float = PARTITION_MAINTENANCE_INTERVAL) -> None:
+
+    if PARTITION_STRATEGY not in STRATEGY_KEYS:
+        return
+
+    while True:
+        await asyncio.sleep(interval)
+
+        try:
+            async with acquire() as conn:
+                result = await maintain(conn)
+
+            if result.get("created") or result.get("archived"):
+                loggers.log_system_logger(f"Partition maintenance: {result}")
+        except Exception as e:
+            loggers.log_system_logger(f"Partition maintenance failed: {e}", True)
@@ -0,0 +1,144 @@
+import math, os
+from db import packing
+from fast_server.latency import to_seconds
+
+# Streams whose batch writers keep rollups up to date -- Empty turns rollups off
+ROLLUP_STREAMS = tuple(s for s in os.getenv("ROLLUP_STREAMS", "imu,camera,robot").replace(" ", "").split(",") if s)
+
+# Resolution -> (table, bucket width in seconds)
+RESOLUTIONS = {
+    "1s": ("rollup_1s", 1),
+    "1m": ("rollup_1m", 60),
+}
+
+# insert_*_batch record tuple layouts -- Rollups read the channels by name out of the same tuples that are inserted
+RECORD_COLUMNS = {
+    "imu": packing.IMU_COLUMNS,
+    "camera": (
+        "frame_idx", "capture_time", "recorded_at", "marker_idx",
+        "rvec_x", "rvec_y", "rvec_z",
+        "tvec_x", "tvec_y", "tvec_z",
+        "image_path", "device_id", "session_id", "ingested_at",
+    ),
+    "robot": (
+        "frame_id", "ts_epoch",
+        "joint_1", "joint_2", "joint_3", "joint_4", "joint_5", "joint_6",
+        "x", "y", "z", "w", "p", "r",
+        "recorded_at", "ingested_at", "device_id", "session_id",
+    ),
+}
+
+# Column the bucket is taken from (device clock), and the numeric channels that get aggregated
+TIME_COLUMNS = {"imu": "capture_time", "camera": "capture_time", "robot": "ts_epoch"}
+CHANNELS = {
+    "imu": packing.IMU_CHANNELS,
+    "camera": ("rvec_x", "rvec_y", "rvec_z", "tvec_x", "tvec_y", "tvec_z"),
+    "robot": RECORD_COLUMNS["robot"][2:14],
+}
+
+
+def _table_ddl(table: str) -> str:
+
+    return f"""
+CREATE TABLE IF NOT EXISTS {table} (
+    session_id integer NOT NULL REFERENCES session (id),
+    device_id integer NOT NULL REFERENCES device (id),
+    stream text NOT NULL,
+    channel text NOT NULL,
+    bucket double precision NOT NULL,
+    count bigint NOT NULL,
+    min double precision,
+    max double precision,
+    mean double precision,
+    m2 double precision,
+    PRIMARY KEY (session_id, device_id, channel, bucket)
+);
+
+CREATE INDEX IF NOT EXISTS {table}_device_bucket_idx ON {table} (device_id, channel, bucket);
+"""
+
+
+# Created by migration 5
+ROLLUP_DDL = "".join(_table_ddl(table) for table, _ in RESOLUTIONS.values())
+
+
+# Merges a batch's partial aggregate into the stored one -- Chan et al. pairwise update, so mean / M2 stay exact
+# Every SET expression sees the old row, so the count / mean used by the later ones are the pre-merge values
+def upsert_sql(table: str) -> str:
+
+    n = "EXCLUDED.count::double precision / (r.count + EXCLUDED.count)"
+
+    return f"""
+        INSERT INTO {table} AS r (session_id, device_id, stream, channel, bucket, count, min, max, mean, m2)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+        ON CONFLICT (session_id, device_id, channel, bucket) DO UPDATE SET
+            count = r.count + EXCLUDED.count,
+            min = least(r.min, EXCLUDED.min),
+            max = greatest(r.max, EXCLUDED.max),
+            mean = r.mean + (EXCLUDED.mean - r.mean) * {n},
+            m2 = r.m2 + EXCLUDED.m2 + (EXCLUDED.mean - r.mean) ^ 2 * r.count * {n}
+    """
+
+
+# Aggregates one flushed batch -- Returns upsert records per rollup table, sorted by key so concurrent flushes lock rows in the same order
+def summarize(stream: str, records: list[tuple]) -> dict[str, list[tuple]]:
+
+    cols = {name: i for i, name in enumerate(RECORD_COLUMNS[stream])}
+    t_col, session_col, device_col, ingested_col = (
+        cols[TIME_COLUMNS[stream]], cols["session_id"], cols["device_id"], cols["ingested_at"],
+    )
+    channels = [(name, cols[name]) for name in CHANNELS[stream]]
+
+    out = {}
+    for table, width in RESOLUTIONS.values():
+
+        # key -> [count, mean, m2, min, max], Welford within the batch
+        acc = {}
+        for r in records:
+            t = r[t_col] if r[t_col] is not None else r[ingested_col]
+            bucket = math.floor(to_seconds(t) / width) * width
+
+            for name, i in channels:
+                x = r[i]
+                if x is None or x != x:  # None / NaN
+                    continue
+
+                key = (r[session_col], r[device_col], name, bucket)
+                a = acc.get(key)
+                if a is None:
+                    acc[key] = [1, x, 0.0, x, x]
+                    continue
+
+                a[0] += 1
+                delta = x - a[1]
+                a[1] += delta / a[0]
+                a[2] += delta * (x - a[1])
+                a[3] = min(a[3], x)
+                a[4] = max(a[4], x)
+
+        out[table] = [
+            (session_id, device_id, stream, channel, bucket, a[0], a[3], a[4], a[1], a[2])
+            for (session_id, device_id, channel, bucket), a in sorted(acc.items())
+        ]
+
+    return out
+
+
+# Runs inside the batch's insert transaction -- Rollups commit or roll back with the raw rows
+async def apply(conn, stream: str, records: list[tuple]) -> None:
+
+    if stream not in ROLLUP_STREAMS or not records:
+        return
+
+    for table, rows in summarize(stream, records).items():
+        if rows:
+            await conn.executemany(upsert_sql(table), rows)
+
+
+# Adds the spread columns the API returns -- Sample variance from M2
+def describe(row: dict) -> dict:
+
+    count = row["count"]
+    variance = row["m2"] / (count - 1) if count > 1 else 0.0
+
+    return {**row, "variance": variance, "stddev": math.sqrt(max(variance, 0.0))}
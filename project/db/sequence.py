@@ -0,0 +1,218 @@
+import os
+from collections import deque
+from typing import Callable
+from fast_server import loggers
+from fast_server.metrics import FRAMES_LATE, FRAMES_MISSING, SEQUENCE_RESETS
+
+# Streams whose frame counters are followed -- Empty turns gap detection off
+SEQUENCE_STREAMS = tuple(s for s in os.getenv("SEQUENCE_STREAMS", "imu,camera").replace(" ", "").split(",") if s)
+
+# insert_*_batch record column holding the device's frame counter, and the device timestamp next to it
+FRAME_COLUMNS = {"imu": "frame_id", "camera": "frame_idx", "robot": "frame_id"}
+CAPTURE_COLUMNS = {"imu": "capture_time", "camera": "capture_time", "robot": "ts_epoch"}
+
+# A frame further than this behind the newest one is a restarted counter, not a late sample
+SEQUENCE_REORDER_WINDOW = int(os.getenv("SEQUENCE_REORDER_WINDOW", 1000))
+
+# Gaps per device a late sample can still be credited to
+RECENT_GAPS = 32
+
+# Created by migration 7 -- One row per gap or counter reset, frames are the ones seen on either side
+GAP_DDL = """
+CREATE TABLE IF NOT EXISTS ingest_gap (
+    id bigserial PRIMARY KEY,
+    session_id integer REFERENCES session (id),
+    device_id integer REFERENCES device (id),
+    stream text NOT NULL,
+    kind text NOT NULL,
+    from_frame bigint NOT NULL,
+    to_frame bigint NOT NULL,
+    missing integer NOT NULL,
+    recovered integer NOT NULL DEFAULT 0,
+    from_capture double precision,
+    to_capture double precision,
+    detected_at double precision NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ingest_gap_session_device_idx ON ingest_gap (session_id, device_id);
+"""
+
+GAP_INSERT = """
+    INSERT INTO ingest_gap (
+        session_id, device_id, stream, kind, from_frame, to_frame, missing, from_capture, to_capture, detected_at
+    )
+    VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9,$10)
+"""
+
+# Absolute value -- A retried batch writes the same number again
+GAP_RECOVERED = """
+    UPDATE ingest_gap SET recovered = $6
+    WHERE session_id = $1 AND device_id = $2 AND stream = $3 AND from_frame = $4 AND to_frame = $5 AND kind = 'gap'
+"""
+
+
+# Where one device's counter stands -- Gaps are [from_frame, to_frame, missing, recovered]
+class DeviceSequence:
+    __slots__ = ("last", "capture", "received", "missing", "recovered", "late", "resets", "gaps")
+
+    def __init__(self):
+        self.last = None
+        self.capture = None
+        self.received = 0
+        self.missing = 0
+        self.recovered = 0
+        self.late = 0
+        self.resets = 0
+        self.gaps = deque(maxlen=RECENT_GAPS)
+
+    def copy(self) -> "DeviceSequence":
+
+        other = DeviceSequence()
+        other.last, other.capture = self.last, self.capture
+        other.received, other.missing, other.recovered = self.received, self.missing, self.recovered
+        other.late, other.resets = self.late, self.resets
+        other.gaps.extend(list(g) for g in self.gaps)
+
+        return other
+
+    def to_dict(self) -> dict:
+        return {
+            "last_frame": self.last,
+            "received": self.received,
+            "missing": self.missing,
+            "lost": self.missing - self.recovered,
+            "late": self.late,
+            "resets": self.resets,
+        }
+
+
+# What one batch did to the counters -- Nothing touches the tracker until `commit`, so a retried batch is not counted twice
+class SequenceScan:
+    __slots__ = ("session", "devices", "events", "recovered", "resets")
+
+    def __init__(self, session):
+        self.session = session
+        self.devices: dict[int, DeviceSequence] = {}
+        self.events: list[tuple] = []
+        self.recovered: dict[tuple, tuple] = {}
+        self.resets: list[tuple] = []
+
+
+class SequenceTracker:
+
+    # `columns` is the insert_*_batch record layout of the stream (rollups.RECORD_COLUMNS)
+    def __init__(self, stream: str, columns, label: Callable[[int], str], reorder_window: int = SEQUENCE_REORDER_WINDOW):
+        self.stream = stream
+        self.label = label
+        self.reorder_window = reorder_window
+
+        self._frame = columns.index(FRAME_COLUMNS[stream])
+        self._capture = columns.index(CAPTURE_COLUMNS[stream])
+        self._device = columns.index("device_id")
+        self._session = columns.index("session_id")
+
+        self.devices: dict[int, DeviceSequence] = {}
+        self.session = None
+
+    # Classifies every sample against the last frame of its device -- O(1) each, gaps are only searched for late samples
+    def scan(self, records: list[tuple], now: float = 0.0) -> SequenceScan:
+
+        session = records[0][self._session] if records else self.session
+        scan = SequenceScan(session)
+
+        # Frame counters start over with every session
+        known = self.devices if session == self.session else {}
+
+        for r in records:
+            frame = r[self._frame]
+            if frame is None:
+                continue
+
+            device = r[self._device]
+            state = scan.devices.get(device)
+            if state is None:
+                base = known.get(device)
+                state = scan.devices[device] = base.copy() if base is not None else DeviceSequence()
+
+            capture = r[self._capture]
+            state.received += 1
+
+            if state.last is None:
+                state.last, state.capture = frame, capture
+                continue
+
+            step = frame - state.last
+
+            # Next frame, or another row of the same frame (several camera markers)
+            if step == 1 or step == 0:
+                state.last, state.capture = frame, capture
+
+            elif step > 1:
+                missing = int(step) - 1
+                state.missing += missing
+                state.gaps.append([state.last, frame, missing, 0])
+                scan.events.append((session, device, self.stream, "gap", state.last, frame, missing, state.capture, capture, now))
+                state.last, state.capture = frame, capture
+
+            # Behind the newest frame -- A device timestamp newer than the last one means the counter restarted
+            elif -step > self.reorder_window or (capture is not None and state.capture is not None and capture > state.capture):
+                state.resets += 1
+                state.gaps.clear()
+                scan.events.append((session, device, self.stream, "reset", state.last, frame, 0, state.capture, capture, now))
+                scan.resets.append((device, state.last, frame))
+                state.last, state.capture = frame, capture
+
+            else:
+                state.late += 1
+
+                # Credited to the gap it fell into -- Capped, camera markers can bring the same frame more than once
+                for gap in state.gaps:
+                    if gap[0] < frame < gap[1] and gap[3] < gap[2]:
+                        gap[3] += 1
+                        state.recovered += 1
+                        scan.recovered[(device, gap[0], gap[1])] = (session, device, self.stream, gap[0], gap[1], gap[3])
+                        break
+
+        return scan
+
+    async def write(self, conn, scan: SequenceScan) -> None:
+
+        if scan.events:
+            await conn.executemany(GAP_INSERT, scan.events)
+        if scan.recovered:
+            await conn.executemany(GAP_RECOVERED, list(scan.recovered.values()))
+
+    # Takes the scanned state once its batch committed
+    def commit(self, scan: SequenceScan) -> None:
+
+        if scan.session != self.session:
+            self.devices.clear()
+            self.session = scan.session
+
+        for device, state in scan.devices.items():
+            before = self.devices.get(device)
+            name = self.label(device)
+
+            missing = state.missing - (before.missing if before else 0)
+            late = state.late - (before.late if before else 0)
+            resets = state.resets - (before.resets if before else 0)
+
+            if missing:
+                FRAMES_MISSING.labels(self.stream, name).inc(missing)
+            if late:
+                FRAMES_LATE.labels(self.stream, name).inc(late)
+            if resets:
+                SEQUENCE_RESETS.labels(self.stream, name).inc(resets)
+
+            self.devices[device] = state
+
+        for device, before, after in scan.resets:
+            loggers.log_system_logger(f"{self.stream} device {self.label(device)} restarted its frame counter ({before} -> {after})")
+
+    # Counters of the current session per device label
+    def summary(self) -> dict[str, dict]:
+        return {self.label(device): state.to_dict() for device, state in self.devices.items()}
+
+    def clear(self) -> None:
+        self.devices.clear()
+        self.session = None
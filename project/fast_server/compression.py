@@ -0,0 +1,140 @@
+import asyncio, gzip, os, zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Default gzip level for streamed exports -- Low levels keep the CPU off the critical path
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 1))
+
+# Responses smaller than this are sent as is -- Compression would cost more than it saves
+MIN_COMPRESS_SIZE = int(os.getenv("MIN_COMPRESS_SIZE", 1024))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", 3))
+
+# Content types worth compressing
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+# Picks the best encoding the client accepts -- zstd beats gzip in both speed and ratio
+def negotiate_encoding(accept_encoding: str) -> str | None:
+
+    accepted = set()
+
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+
+        # Honor explicit refusals such as 'gzip;q=0'
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+
+        accepted.add(token.strip().lower())
+
+    if zstandard is not None and "zstd" in accepted:
+        return "zstd"
+
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+
+    return None
+
+# Compresses a full body with the negotiated encoding
+def compress(body: bytes, encoding: str) -> bytes:
+
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+    raise ValueError(f"Unsupported encoding: {encoding!r}")
+
+
+# ASGI middleware that compresses complete JSON/text responses with the client's preferred encoding
+class CompressionMiddleware:
+
+    def __init__(self, app, minimum_size: int = MIN_COMPRESS_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = negotiate_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+
+            if message["type"] == "http.response.start":
+                start = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            response_headers = dict(start["headers"])
+            content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+
+            # Streaming, already encoded, tiny or binary bodies go out untouched
+            passthrough = (
+                message.get("more_body", False)
+                or b"content-encoding" in response_headers
+                or len(body) < self.minimum_size
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            )
+
+            if passthrough:
+                await send(start)
+                await send(message)
+                return
+
+            # Large bodies are compressed off the event loop
+            if len(body) > 256 * 1024:
+                body = await asyncio.to_thread(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+
+            new_headers = [(k, v) for k, v in start["headers"] if k not in (b"content-length", b"vary")]
+            new_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(body)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+
+            await send({**start, "headers": new_headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+# Wraps an async iterator of byte chunks in a streaming gzip encoder
+async def gzip_stream(chunks, level: int = GZIP_LEVEL):
+
+    # wbits=31 -> gzip header + trailer so the output is a valid .gz file
+    encoder = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    async for chunk in chunks:
+
+        # zlib releases the GIL, so compress off the event loop
+        out = await asyncio.to_thread(encoder.compress, chunk)
+        if out:
+            yield out
+
+    yield encoder.flush()
@@ -1,8 +1,11 @@
+import asyncio, os
+from collections import deque
+from itertools import islice
 from fastapi import WebSocket
 from datetime import datetime, timezone
 from typing import List
 from zoneinfo import ZoneInfo
-import json
+from fast_server.responses import dumps_text
 
 # Global method to get the time -- Uses system or container time -- Returns American timezone time
 def get_time():
@@ -18,36 +21,218 @@ def get_time():
         return None
 
 
+# Per-client outbound settings -- Use .env
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", 256))
+WS_SLOW_DROP_LIMIT = int(os.getenv("WS_SLOW_DROP_LIMIT", 1024))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", 5.0))
+WS_HISTORY_SIZE = int(os.getenv("WS_HISTORY_SIZE", 500))
+
+# Liveness settings -- Clients must answer {"type": "ping"} (with anything) within the idle timeout
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", 15.0))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", 60.0))
+
+
+# One connected client -- Bounded outbound queue drained by its own writer task
+class ClientConnection:
+
+    def __init__(self, ws: WebSocket, max_queue: int = WS_QUEUE_SIZE):
+        self.ws = ws
+        self.queue = deque(maxlen=max_queue)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.writer: asyncio.Task | None = None
+        self.last_seen = asyncio.get_running_loop().time()
+
+    # Queues a message, dropping the oldest when full -- Returns how many were dropped since the client last caught up
+    def push(self, msg: str) -> int:
+
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+
+        self.queue.append(msg)
+        self.ready.set()
+
+        return self.dropped
+
+
 # Connection class for webhooks (device message for web interface)
 class ConnectionManager:
 
     def __init__(self):
-        self.active: List[WebSocket] = []
+        self.clients: dict[WebSocket, ClientConnection] = {}
+        self.slow_disconnects = 0
+        self.idle_disconnects = 0
+
+        # Ring buffer of recent broadcasts as (seq, serialized message) -- Lets late joiners backfill
+        self.history = deque(maxlen=WS_HISTORY_SIZE)
+        self.seq = 0
+
+        # Broadcast outbox -- Callers append, the fan-out task copies into client queues
+        self._outbox = deque(maxlen=WS_QUEUE_SIZE)
+        self._outbox_ready: asyncio.Event | None = None
+        self._fanout: asyncio.Task | None = None
+
+    # Connected websockets
+    @property
+    def active(self) -> List[WebSocket]:
+        return list(self.clients)
+
+    def is_connected(self, ws: WebSocket) -> bool:
+        return ws in self.clients
+
+    # Records inbound traffic from a client (any frame proves it is alive)
+    def touch(self, ws: WebSocket) -> None:
+
+        client = self.clients.get(ws)
+        if client is not None:
+            client.last_seen = asyncio.get_running_loop().time()
+
+    # Seconds since a client was last heard from
+    def idle_for(self, ws: WebSocket) -> float:
+
+        client = self.clients.get(ws)
+        if client is None:
+            return 0.0
+
+        return asyncio.get_running_loop().time() - client.last_seen
+
+    # Gauge of connections -- Zombies have missed at least one heartbeat but have not timed out yet
+    def connection_stats(self) -> dict[str, int]:
+
+        try:
+            now = asyncio.get_running_loop().time()
+        except RuntimeError:
+            now = None
+
+        zombie = 0
+        if now is not None:
+            zombie = sum(1 for c in self.clients.values() if now - c.last_seen > WS_HEARTBEAT_INTERVAL * 1.5)
+
+        return {
+            "active": len(self.clients),
+            "zombie": zombie,
+            "queued": sum(len(c.queue) for c in self.clients.values()),
+            "slow_disconnects": self.slow_disconnects,
+            "idle_disconnects": self.idle_disconnects,
+        }
 
     # Webhook connect
     async def connect(self, ws: WebSocket):
 
         await ws.accept()
-        self.active.append(ws)
+
+        client = ClientConnection(ws)
+        client.writer = asyncio.create_task(self._write_loop(client))
+        self.clients[ws] = client
+
+        self._ensure_fanout()
 
     # Webhook Disconnect
     def disconnect(self, ws: WebSocket):
 
-        if ws in self.active:
-            self.active.remove(ws)
+        client = self.clients.pop(ws, None)
+        if client is None:
+            return
+
+        if client.writer is not None and client.writer is not asyncio.current_task():
+            client.writer.cancel()
 
-    # Send message from source to web interface
+    # Send an already serialized message to a single client -- Never waits on the socket
+    async def send_text(self, ws: WebSocket, msg: str):
+
+        client = self.clients.get(ws)
+        if client is not None:
+            self._push(client, msg)
+
+    # Send message from source to web interface -- O(1) for the caller regardless of client count
     async def broadcast_json(self, payload: dict):
 
         payload = payload.copy()
         payload["timestamp"] = get_time()
 
-        msg = json.dumps(payload)
-        for ws in self.active:
-            try:
-                await ws.send_text(msg)
-            except Exception:
-                self.disconnect(ws)
+        # Serialized once per broadcast, shared by every client and the history
+        msg = dumps_text(payload)
+
+        self.seq += 1
+        self.history.append((self.seq, msg))
+
+        if not self.clients:
+            return
+
+        self._outbox.append(msg)
+        self._ensure_fanout()
+        self._outbox_ready.set()
+
+    # Returns the serialized messages broadcast after sequence number `since`
+    def history_since(self, since: int = 0) -> list[str]:
+
+        if not self.history:
+            return []
+
+        # Sequence numbers are contiguous, so the offset into the ring is direct
+        first_seq = self.history[0][0]
+        start = max(since - first_seq + 1, 0)
+
+        return [msg for _, msg in islice(self.history, start, None)]
+
+    # Queues a message for a client and drops it if it has fallen too far behind
+    def _push(self, client: ClientConnection, msg: str) -> None:
+
+        if client.push(msg) >= WS_SLOW_DROP_LIMIT:
+            self.slow_disconnects += 1
+            self.disconnect(client.ws)
+            asyncio.create_task(self.close_socket(client.ws, 1013, "Client too slow"))
+
+    # Starts the fan-out task for the running loop (recreated if a previous loop went away)
+    def _ensure_fanout(self) -> None:
+
+        if self._fanout is not None and not self._fanout.done() and self._fanout.get_loop() is asyncio.get_running_loop():
+            return
+
+        self._outbox_ready = asyncio.Event()
+        self._fanout = asyncio.create_task(self._fanout_loop())
+
+    # Copies broadcast messages into every client queue
+    async def _fanout_loop(self) -> None:
+
+        while True:
+            await self._outbox_ready.wait()
+            self._outbox_ready.clear()
+
+            while self._outbox:
+                msg = self._outbox.popleft()
+
+                for client in list(self.clients.values()):
+                    self._push(client, msg)
+
+    # Drains one client's queue -- Each client sends concurrently, so one slow browser can't stall the rest
+    async def _write_loop(self, client: ClientConnection) -> None:
+
+        try:
+            while True:
+                await client.ready.wait()
+                client.ready.clear()
+
+                while client.queue:
+                    msg = client.queue.popleft()
+                    await asyncio.wait_for(client.ws.send_text(msg), timeout=WS_SEND_TIMEOUT)
+
+                # Caught up -- Forgive earlier drops
+                client.dropped = 0
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception:
+            self.disconnect(client.ws)
+
+    @staticmethod
+    async def close_socket(ws: WebSocket, code: int = 1000, reason: str = "") -> None:
+
+        try:
+            await ws.close(code=code, reason=reason)
+        except Exception:
+            pass
 
 # Global managers for use in other scripts
 camera_manager = ConnectionManager()
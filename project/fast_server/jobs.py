@@ -0,0 +1,106 @@
+import asyncio, os, time, uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+# Finished jobs kept for /backup/jobs -- Oldest finished ones are dropped first
+JOBS_KEPT = int(os.getenv("JOBS_KEPT", 50))
+
+
+class Job:
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.state = "queued"
+        self.progress: dict[str, Any] = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.task: asyncio.Task | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("succeeded", "failed", "cancelled")
+
+    def to_dict(self) -> dict:
+
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# Long-running admin work (backups, restores) run as tasks on the loop -- Callers get an id back right away
+class JobRegistry:
+
+    def __init__(self, keep: int = JOBS_KEPT):
+        self.keep = keep
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+
+    # `work` gets the job so it can publish progress -- With exclusive, a running job of the same kind is returned instead
+    def start(self, kind: str, work: Callable[[Job], Awaitable[Any]], exclusive: bool = True) -> Job:
+
+        if exclusive:
+            running = self.running(kind)
+            if running is not None:
+                return running
+
+        job = Job(kind)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, work), name=f"{kind}-{job.id}")
+
+        self._trim()
+        return job
+
+    async def _run(self, job: Job, work: Callable[[Job], Awaitable[Any]]) -> None:
+
+        job.state = "running"
+        job.started_at = time.time()
+
+        try:
+            job.result = await work(job)
+            job.state = "succeeded"
+
+        except asyncio.CancelledError:
+            job.state = "cancelled"
+            raise
+
+        # Already reported by the work itself -- Kept on the job for /backup/jobs
+        except Exception as e:
+            job.state = "failed"
+            job.error = str(e)
+
+        finally:
+            job.finished_at = time.time()
+
+    def running(self, kind: str) -> Job | None:
+
+        for job in self.jobs.values():
+            if job.kind == kind and not job.done:
+                return job
+
+        return None
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id)
+
+    def list(self, kind: str | None = None) -> list[dict]:
+        return [j.to_dict() for j in reversed(self.jobs.values()) if kind is None or j.kind == kind]
+
+    def _trim(self) -> None:
+
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(len(self.jobs) - self.keep, 0)]:
+            del self.jobs[job_id]
+
+
+jobs = JobRegistry()
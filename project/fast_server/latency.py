@@ -0,0 +1,79 @@
+import time
+from fast_server.metrics import REGISTRY
+
+# Pipeline stages, in order
+STAGES = ("capture_to_arrival", "arrival_to_enqueue", "enqueue_to_flush", "flush_to_commit")
+
+# Device clocks are NTP-synced, so capture latency is usually milliseconds -- Wide range for backlog spikes
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_LATENCY = REGISTRY.histogram(
+    "ingest_stage_latency_seconds",
+    "Per-row latency of each ingest stage",
+    ["stream", "device", "stage"],
+    STAGE_BUCKETS,
+)
+
+# Quantiles reported by /latency
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+# Device timestamps arrive either as epoch seconds or epoch milliseconds
+def to_seconds(ts: float) -> float:
+    return ts / 1000.0 if ts > 1e11 else ts
+
+
+# Stamps a parsed row as it is handed to the ingest queue -- Handlers set arrived_at before parsing
+def stamp_enqueue(data: dict) -> dict:
+    data["enqueued_at"] = time.time()
+    return data
+
+
+# Records every stage for a committed batch -- Called once per flush, so the per-message path only pays for two stamps
+def record_batch(stream: str, batch: list[dict], flush_started: float, committed: float,
+                 capture_key: str = "capture_time", device_key: str = "device_label") -> None:
+
+    children = {}
+    commit_latency = committed - flush_started
+
+    for d in batch:
+        device = d.get(device_key, "main")
+
+        hist = children.get(device)
+        if hist is None:
+            hist = children[device] = tuple(STAGE_LATENCY.labels(stream, device, stage) for stage in STAGES)
+
+        arrived = d.get("arrived_at")
+        enqueued = d.get("enqueued_at")
+        captured = d.get(capture_key)
+
+        if arrived is not None and captured is not None:
+            hist[0].observe(arrived - to_seconds(captured))
+
+        if arrived is not None and enqueued is not None:
+            hist[1].observe(enqueued - arrived)
+
+        if enqueued is not None:
+            hist[2].observe(flush_started - enqueued)
+
+    # The commit is shared by the whole batch -- One observation per device
+    for hist in children.values():
+        hist[3].observe(commit_latency)
+
+
+# Summarizes the in-memory histograms as {stream: {device: {stage: {...}}}}
+def latency_summary() -> dict:
+
+    summary = {}
+
+    for (stream, device, stage), child in STAGE_LATENCY.children():
+        if not child.count:
+            continue
+
+        stats = {"count": child.count, "mean": child.sum / child.count}
+        for q in QUANTILES:
+            stats[f"p{int(q * 100)}"] = child.quantile(q)
+
+        summary.setdefault(stream, {}).setdefault(device, {})[stage] = stats
+
+    return summary
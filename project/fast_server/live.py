@@ -0,0 +1,136 @@
+import asyncio
+from fastapi import WebSocket
+from fast_server.connection_manager import camera_manager, imu_manager, robot_manager
+from fast_server.responses import dumps_text
+
+# Rates (Hz) that subscriptions are snapped to -- Decimation runs once per tier, never once per client
+RATE_TIERS = (1, 2, 5, 10, 25, 50, 100)
+
+# Snaps a requested rate to the fastest tier that does not exceed it
+def snap_rate(rate: float) -> int:
+
+    tier = RATE_TIERS[0]
+    for t in RATE_TIERS:
+        if t <= rate:
+            tier = t
+
+    return tier
+
+
+# One websocket's live subscription
+class LiveSubscription:
+
+    def __init__(self, ws: WebSocket, tier: int, devices: set[str] | None):
+        self.ws = ws
+        self.tier = tier
+        self.devices = devices
+
+
+# Per-stream broadcast bus for decimated live samples
+class LiveBus:
+
+    def __init__(self, stream: str, manager):
+        self.stream = stream
+        self.manager = manager
+        self.tiers: dict[int, dict[WebSocket, LiveSubscription]] = {}
+        self.by_ws: dict[WebSocket, LiveSubscription] = {}
+        self._next_due: dict[tuple[int, str], float] = {}
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self.by_ws)
+
+    # Registers (or replaces) a websocket's subscription and returns the tier it was snapped to
+    def subscribe(self, ws: WebSocket, rate: float, devices=None) -> int:
+
+        self.unsubscribe(ws)
+
+        tier = snap_rate(rate)
+        sub = LiveSubscription(ws, tier, set(devices) if devices else None)
+
+        self.tiers.setdefault(tier, {})[ws] = sub
+        self.by_ws[ws] = sub
+
+        return tier
+
+    def unsubscribe(self, ws: WebSocket) -> None:
+
+        sub = self.by_ws.pop(ws, None)
+        if sub is None:
+            return
+
+        members = self.tiers.get(sub.tier)
+        if members is not None:
+            members.pop(ws, None)
+
+            # Drop empty tiers so publish stops decimating for them
+            if not members:
+                del self.tiers[sub.tier]
+                self._next_due = {k: v for k, v in self._next_due.items() if k[0] != sub.tier}
+
+    # Publishes one sample -- ts should be in seconds (defaults to the loop clock)
+    async def publish(self, sample: dict, device: str | None = None, ts: float | None = None) -> None:
+
+        # Fast path for the common case of nobody watching
+        if not self.tiers:
+            return
+
+        device = device or sample.get("device_label", "main")
+        now = ts if ts is not None else asyncio.get_running_loop().time()
+
+        targets = []
+
+        for tier, members in self.tiers.items():
+            key = (tier, device)
+
+            if now < self._next_due.get(key, 0.0):
+                continue
+
+            self._next_due[key] = now + 1.0 / tier
+
+            for sub in members.values():
+                if sub.devices is None or device in sub.devices:
+                    targets.append(sub.ws)
+
+        if not targets:
+            return
+
+        # Encoded once per sample, shared by every tier and client that receives it
+        msg = dumps_text({
+            "type": "live",
+            "stream": self.stream,
+            "device": device,
+            "data": sample,
+        })
+
+        for ws in targets:
+            await self.manager.send_text(ws, msg)
+
+            # Manager dropped a dead socket -- stop decimating for it
+            if not self.manager.is_connected(ws):
+                self.unsubscribe(ws)
+
+
+# Global buses for use in other scripts
+imu_bus = LiveBus("imu", imu_manager)
+camera_bus = LiveBus("camera", camera_manager)
+robot_bus = LiveBus("robot", robot_manager)
+
+LIVE_BUSES = {
+    "imu": imu_bus,
+    "camera": camera_bus,
+    "robot": robot_bus,
+}
+
+# Subscribes a websocket from its query string, e.g. /ws/imu?rate=10&devices=imu1,imu2
+def subscribe_from_query(bus: LiveBus, ws: WebSocket) -> None:
+
+    try:
+        rate = float(ws.query_params["rate"])
+    except (KeyError, ValueError):
+        return
+
+    devices = ws.query_params.get("devices")
+    devices = [d.strip() for d in devices.split(",") if d.strip()] if devices else None
+
+    bus.subscribe(ws, rate, devices)
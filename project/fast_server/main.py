@@ -1,15 +1,26 @@
-import asyncio, os
+import asyncio, os, time
 
 from fast_server import loggers
 from fastapi import FastAPI, HTTPException, WebSocket
+from fastapi.responses import Response, StreamingResponse
 from fastapi_mqtt import FastMQTT, MQTTConfig
-from db.database import DatabaseSingleton
-from pathlib import Path
+from db import backups, partitions
+from db.catalog import catalog
+from db.database import DatabaseSingleton, STREAM_TABLES
 from fastapi.middleware.cors import CORSMiddleware
 from fast_server.connection_manager import camera_manager, imu_manager, robot_manager, misc_manager, MANAGERS, broadcast_message
 from typing import Any
 
-from fast_server.parsing import parse_camera_message, parse_imu_message
+from fast_server.live import LIVE_BUSES, camera_bus, imu_bus, robot_bus
+from fast_server.ws_session import serve_websocket
+from fast_server.compression import CompressionMiddleware, gzip_stream
+from fast_server.responses import FastJSONResponse, records_to_columns
+from fast_server.parsing import device_from_topic, parse_camera_message, parse_imu_message
+from fast_server.telemetry import TelemetryAggregator
+from fast_server import latency, metrics
+from fast_server.profiling import ProfilerBusy, FORMATS, SAMPLE_INTERVAL, memory_probe, profiler
+from fast_server.watchdog import watchdog
+from fast_server.jobs import Job, jobs
 
 # MQTT Config Setup
 mqtt_config = MQTTConfig(
@@ -18,8 +29,11 @@ mqtt_config = MQTTConfig(
     keepalive=60,
 )
 
-# FastAPI Client
-app = FastAPI()
+# FastAPI Client -- orjson responses by default
+app = FastAPI(default_response_class=FastJSONResponse)
+
+# Negotiated zstd/gzip compression for large JSON responses
+app.add_middleware(CompressionMiddleware)
 
 # Cores Setup
 app.add_middleware(
@@ -46,20 +60,104 @@ queue_size = int(os.getenv("QUEUE_SIZE", 5000))
 imu_queue = asyncio.Queue(maxsize=queue_size)
 camera_queue = asyncio.Queue(maxsize=queue_size)
 
-# Attempts to create a backup of DB and returns a status code of whether it was successful or not
-async def try_backup() -> dict[str, Any]:
+# Prometheus metrics -- Children are bound once so the hot path is a single increment
+metrics.track_queue("imu", imu_queue)
+metrics.track_queue("camera", camera_queue)
+
+for _name, _mgr in MANAGERS.items():
+    metrics.WS_CLIENTS.labels(_name, "active").set_function(lambda m=_mgr: len(m.clients))
+    metrics.WS_CLIENTS.labels(_name, "zombie").set_function(lambda m=_mgr: m.connection_stats()["zombie"])
+
+IMU_QUEUE_FULL = metrics.QUEUE_FULL.labels("imu")
+CAMERA_QUEUE_FULL = metrics.QUEUE_FULL.labels("camera")
+IMU_PARSE_FAILURES = metrics.PARSE_FAILURES.labels("imu")
+CAMERA_PARSE_FAILURES = metrics.PARSE_FAILURES.labels("camera")
+
+# Sends a telemetry summary frame to the matching websocket channel
+async def emit_telemetry(stream: str, frame: dict) -> None:
+    await MANAGERS[stream].broadcast_json(frame)
+
+# Per-stream ingest counters, emitted once per second instead of per flush / per error
+telemetry = TelemetryAggregator(emit_telemetry)
+telemetry.track_queue("imu", imu_queue)
+telemetry.track_queue("camera", camera_queue)
+
+# Long-lived containers reported with every tracemalloc snapshot (/admin/memory/snapshot)
+memory_probe.track("db.history", lambda: len(app.state.db.history))
+memory_probe.track("db.devices", lambda: len(app.state.db.devices))
+memory_probe.track("db.sequences", lambda: sum(len(t.devices) for t in app.state.db.sequences.values()))
+memory_probe.track("queue.imu", imu_queue.qsize)
+memory_probe.track("queue.camera", camera_queue.qsize)
+
+for _name, _mgr in MANAGERS.items():
+    memory_probe.track(f"ws.{_name}.history", lambda m=_mgr: len(m.history))
+    memory_probe.track(f"ws.{_name}.queued", lambda m=_mgr: m.connection_stats()["queued"])
+
+for _name, _bus in LIVE_BUSES.items():
+    memory_probe.track(f"live.{_name}.subscribers", lambda b=_bus: b.subscriber_count)
+
+# What /session/stop backs up -- session (just the ended session's rows), full (pg_dump of everything) or off
+STOP_BACKUP = os.getenv("STOP_BACKUP", "session").lower()
+
+# Runs one backup job -- Progress and the outcome go to the misc websocket, the path ends up on the job
+# With a label only that session is exported (db.archives), otherwise the whole database is dumped
+async def run_backup(job: Job, label: str | None = None) -> dict[str, Any]:
 
-    await broadcast_message(misc_manager, "DB Backup Started")
+    name = "DB Backup" if label is None else f"Session '{label}' Backup"
+
+    async def progress(snapshot: dict) -> None:
+        job.progress = snapshot
+        await broadcast_message(misc_manager, f"{name} {snapshot['percent']:.0f}% ({snapshot['tables_done']}/{snapshot['tables']} tables)")
 
     try:
         db = app.state.db
-        backup_path = db.create_backup()
 
-        await broadcast_message(misc_manager, "DB Backup Completed")
+        if label is None:
+            result = {"path": await db.create_backup(progress)}
+        else:
+            archive = await db.export_session(label, progress)
+            result = {key: archive[key] for key in ("path", "rows", "bytes", "duration_s")}
+
+    except Exception as e:
+
+        # Messages
+        await broadcast_message(misc_manager, f"Failed to backup DB: {e}", "error")
+        loggers.log_system_logger(f"Failed to backup DB: {e}", True)
+        raise
+
+    await broadcast_message(misc_manager, f"{name} Completed")
+    return result
+
+# Job kind of a backup -- Every session export is its own job, so a full dump or another session never stands in for it
+def backup_kind(label: str | None = None) -> str:
+    return "backup" if label is None else f"session:{label}"
+
+def is_backup(kind: str) -> bool:
+    return kind == "backup" or kind.startswith("session:")
+
+# Full dump or session export still running, if any
+def running_backup() -> Job | None:
+    return next((job for job in jobs.jobs.values() if is_backup(job.kind) and not job.done), None)
+
+# Starts a backup of DB in the background and returns its job id -- The same backup already running is returned instead of a second one
+async def try_backup(label: str | None = None) -> dict[str, Any]:
+
+    try:
+        # A dump would be cut off by the swap
+        if jobs.running("restore") is not None:
+            raise RuntimeError("A restore is running. Back up once it has finished.")
+
+        kind = backup_kind(label)
+
+        job = jobs.running(kind)
+        if job is None:
+            await broadcast_message(misc_manager, "DB Backup Started" if label is None else f"Session '{label}' Backup Started")
+            job = jobs.start(kind, lambda job: run_backup(job, label))
 
         return {
             "success": True,
-            "path": backup_path
+            "job": job.id,
+            "state": job.state,
         }
     except Exception as e:
 
@@ -72,62 +170,30 @@ async def try_backup() -> dict[str, Any]:
             "error": str(e)
         }
 
-# Creates an open websocket for camera messages
+# Creates an open websocket for camera messages -- Also carries live samples when subscribed
 @app.websocket("/ws/camera")
 async def camera_ws(websocket: WebSocket) -> None:
-    await camera_manager.connect(websocket)
+    await serve_websocket(camera_manager, websocket, "Camera", camera_bus)
 
-    # Creates a connection and stays until connection is lost
-    try:
-        while True:
-            await asyncio.sleep(3600)
-    except Exception as e:
-        loggers.log_system_logger(f"Camera WB Error: {e}", True)
-    finally:
-        camera_manager.disconnect(websocket)
-
-# Creates an open websocket for robot messages
+# Creates an open websocket for robot messages -- Also carries live samples when subscribed
 @app.websocket("/ws/robot")
 async def robot_ws(websocket: WebSocket) -> None:
-    await robot_manager.connect(websocket)
-
-    # Creates a connection and stays until connection is lost
-    try:
-        while True:
-            await asyncio.sleep(3600)
-    except Exception as e:
-        loggers.log_system_logger(f"Robot WB Error: {e}", True)
-    
-    finally:
-        robot_manager.disconnect(websocket)
+    await serve_websocket(robot_manager, websocket, "Robot", robot_bus)
 
-# Creates an open websocket for imu messages
+# Creates an open websocket for imu messages -- Also carries live samples when subscribed
 @app.websocket("/ws/imu")
 async def imu_ws(websocket: WebSocket) -> None:
-    await imu_manager.connect(websocket)
-
-    # Creates a connection and stays until connection is lost
-    try:
-        while True:
-            await asyncio.sleep(3600)
-    except Exception as e:
-        loggers.log_system_logger(f"IMU WB Error: {e}", True)
-    finally:
-        imu_manager.disconnect(websocket)
+    await serve_websocket(imu_manager, websocket, "IMU", imu_bus)
 
 # Creates an open websocket for misc messages
 @app.websocket("/ws/misc")
 async def misc_ws(websocket: WebSocket) -> None:
-    await misc_manager.connect(websocket)
+    await serve_websocket(misc_manager, websocket, "Misc")
 
-    # Creates a connection and stays until connection is lost
-    try:
-        while True:
-            await asyncio.sleep(3600)
-    except Exception as e:
-        loggers.log_system_logger(f"Misc WB Error: {e}", True)
-    finally:
-        misc_manager.disconnect(websocket)
+# API that returns connection gauges for every websocket channel
+@app.get("/ws/stats")
+async def websocket_stats() -> dict[str, Any]:
+    return {name: mgr.connection_stats() for name, mgr in MANAGERS.items()}
 
 # API that sends messages to a manager for broadcasting into the web interface
 @app.post("/send/{channel}")
@@ -149,42 +215,251 @@ async def send_channel(channel: str, payload: dict) -> dict[str, bool]:
     await mgr.broadcast_json(payload)
     return {"success": True}
 
-# API that returns a JSON of available backup files
+# API that returns recent messages of a channel so reconnecting dashboards can backfill
+# Under /ws next to the sockets it backfills -- A top-level /{channel} would shadow the /imu, /camera, ... label routes
+@app.get("/ws/{channel}/latest")
+async def latest_messages(channel: str, since: int = 0) -> Response:
+
+    mgr = MANAGERS.get(channel)
+
+    # Unable to find manager
+    if not mgr:
+        raise HTTPException(404, "unknown channel")
+
+    # Messages are stored pre-serialized, so the body is assembled without re-encoding
+    body = f'{{"success":true,"last":{mgr.seq},"data":[{",".join(mgr.history_since(since))}]}}'
+
+    return Response(content=body, media_type="application/json")
+
+# API that feeds live samples from other ingest processes (TCP robot server) into a live bus
+@app.post("/live/{stream}")
+async def publish_live(stream: str, payload: dict) -> dict[str, Any]:
+
+    bus = LIVE_BUSES.get(stream)
+
+    # Unable to find bus
+    if not bus:
+        raise HTTPException(404, "unknown stream")
+
+    # Expected: {"samples": [{...}, ...]} -- recorded_at (seconds) drives decimation when present
+    for sample in payload.get("samples", []):
+        await bus.publish(sample, ts=sample.get("recorded_at"))
+
+    # Lets the sender skip posting while nobody is watching
+    return {"success": True, "subscribers": bus.subscriber_count}
+
+# API that exposes ingest metrics in Prometheus text format
+@app.get("/metrics")
+async def get_metrics() -> Response:
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+# API that returns in-memory per-stage latency percentiles per stream and device (this process only)
+@app.get("/latency")
+async def get_latency() -> dict[str, Any]:
+    return {"data": latency.latency_summary(), "stages": list(latency.STAGES), "success": True}
+
+# API that returns a per-device latency report for a recorded session, computed in SQL
+@app.get("/latency/{label}")
+async def get_session_latency(label: str) -> dict[str, Any]:
+
+  try:
+    db = app.state.db
+    data = await db.retrieve_latency_report(label)
+
+    return {"data": data, "success": True}
+  except Exception as e:
+    loggers.log_system_logger(f"Failed to build latency report for session '{label}': {e}", True)
+    await broadcast_message(misc_manager, f"Failed to build latency report for session {label}: {e}", "error")
+
+    return {"error": str(e), "success": False}
+
+# API that returns the live frame counters of the current session per stream and device (this process only)
+@app.get("/gaps")
+async def get_gaps() -> dict[str, Any]:
+    db = app.state.db
+    return {"data": {stream: tracker.summary() for stream, tracker in db.sequences.items()}, "success": True}
+
+# API that returns the frame gaps and counter resets stored for a session
+@app.get("/gaps/{label}")
+async def get_session_gaps(label: str) -> dict[str, Any]:
+
+  try:
+    db = app.state.db
+    data = await db.retrieve_gaps(label)
+
+    return {"data": data, "success": True}
+  except Exception as e:
+    loggers.log_system_logger(f"Failed to read frame gaps for session '{label}': {e}", True)
+    await broadcast_message(misc_manager, f"Failed to read frame gaps for session {label}: {e}", "error")
+
+    return {"error": str(e), "success": False}
+
+# API that starts a time-boxed profile of the event loop -- mode=cprofile (deterministic) or sample (stack sampling)
+@app.post("/admin/profile/start")
+async def start_profile(mode: str = "cprofile", seconds: float = 30.0, interval: float = SAMPLE_INTERVAL) -> dict[str, Any]:
+
+    try:
+        return {"data": profiler.start(mode, seconds, interval), "success": True}
+    except ProfilerBusy as e:
+        raise HTTPException(409, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+# API that ends the running profile early
+@app.post("/admin/profile/stop")
+async def stop_profile() -> dict[str, Any]:
+    return {"data": profiler.stop(), "success": True}
+
+# API that returns the state of the current / last profile
+@app.get("/admin/profile")
+async def profile_status() -> dict[str, Any]:
+    return {"data": profiler.status(), "success": True}
+
+# API that downloads the last finished profile -- pstats / text for cprofile, collapsed stacks for sample
+@app.get("/admin/profile/download")
+async def download_profile(format: str = "pstats") -> Response:
+
+    if format not in FORMATS:
+        raise HTTPException(400, f"unknown format {format!r}")
+
+    try:
+        body = profiler.export(format)
+    except LookupError as e:
+        raise HTTPException(404, str(e))
+
+    return Response(
+        content=body,
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="fastapi_{profiler.mode}.{format}"'},
+    )
+
+# API that takes a tracemalloc snapshot (diffed against the previous one) and container sizes
+@app.post("/admin/memory/snapshot")
+async def memory_snapshot(limit: int = 25) -> dict[str, Any]:
+    return {"data": memory_probe.snapshot(limit), "success": True}
+
+# API that stops tracemalloc -- Tracing costs memory and CPU on every allocation
+@app.post("/admin/memory/stop")
+async def memory_stop() -> dict[str, Any]:
+    memory_probe.stop()
+    return {"success": True}
+
+# API that returns event loop lag percentiles and the stack of every recent stall
+@app.get("/admin/watchdog")
+async def watchdog_summary(events: int = 20) -> dict[str, Any]:
+    return {"data": watchdog.summary(events), "success": True}
+
+# API that returns the backup catalog -- Answered from the cached index, the NFS share is not listed per request
+# "files" keeps the bare names older clients read, "backups" adds size, checksum, sessions, duration and format
 @app.get("/backup/list")
-def list_backups() -> dict[str, list[str]]:
+async def list_backups() -> dict[str, Any]:
+
+    entries = await catalog.listing()
+
+    return {
+        "files": [e["name"] for e in entries],
+        "backups": [{k: v for k, v in e.items() if k != "files"} for e in entries],
+    }
 
-    # Folder is attached in docker -- Must Match or else pathing errors
-    folder = Path("/db_backups")
-    files = []
+# API that re-hashes one backup against its catalog entry now instead of waiting for the scheduled check
+@app.post("/backup/verify/{filename}")
+async def verify_backup(filename: str) -> dict[str, Any]:
 
-    # List all files
-    for file in folder.iterdir():
-        if file.is_file():
-          files.append(file.name)
+    if filename not in await catalog.load():
+        raise HTTPException(status_code=404, detail=f"Unknown backup: {filename}")
 
-    return {"files": files}
+    entry = await catalog.verify(filename)
+    return {"data": {k: v for k, v in entry.items() if k != "files"}, "success": entry["status"] == "ok"}
 
-# API that starts a backup
+# API that starts a backup -- Returns the job id, poll /backup/jobs/{job_id} or watch the misc websocket
 @app.get("/backup")
 async def backup() -> dict[str, Any]:
   return await try_backup()
 
-# API to attempt to restore a backup
-@app.post("/backup/restore/{filename}")
-async def restore_backup(filename: str) -> dict[str, Any]:
+# API that backs up a single session -- Its rows only, as a compressed COPY archive with a manifest
+@app.get("/backup/session/{label}")
+async def backup_session(label: str) -> dict[str, Any]:
+  return await try_backup(label)
+
+# API that appends a session archive to the live database -- `label` restores it under a new name if the original is taken
+@app.post("/backup/session/restore/{filename}")
+async def restore_session(filename: str, label: str | None = None) -> dict[str, Any]:
 
     try:
         db = app.state.db
 
         # Must Match the mounted folder shown in compose
-        path = f"/db_backups/{filename}"
+        path = backups.BACKUP_DIR / filename
+
+        await broadcast_message(misc_manager, f"Session Restore Started: {filename}")
+        result = await db.restore_session(str(path), label)
+
+        await broadcast_message(misc_manager, f"Session '{result['label']}' Restored ({sum(result['rows'].values())} rows)")
+
+        return {"data": result, "success": True}
+
+    except Exception as e:
+
+        # Messages
+        await broadcast_message(misc_manager, f"Session restore failed: {e}", "error")
+        loggers.log_system_logger(f"Failed to restore session archive: {e}", True)
+
+        return {"success": False, "error": str(e)}
+
+# API that lists recent backup and restore jobs, newest first
+@app.get("/backup/jobs")
+async def backup_jobs() -> dict[str, Any]:
+  return {"data": [job for job in jobs.list() if is_backup(job["kind"]) or job["kind"] == "restore"], "success": True}
+
+# API that returns one backup or restore job's state, progress and result
+@app.get("/backup/jobs/{job_id}")
+async def backup_job(job_id: str) -> dict[str, Any]:
+
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+
+    return {"data": job.to_dict(), "success": True}
+
+# Runs one restore job -- Progress goes to the job and the misc websocket, the swap's pause ends up in the result
+async def run_restore(job: Job, filename: str) -> dict[str, Any]:
+
+    async def progress(snapshot: dict) -> None:
+        job.progress = snapshot
+        await broadcast_message(misc_manager, f"Recovery {snapshot['percent']:.0f}% ({snapshot['tables_done']}/{snapshot['tables']} tables)")
+
+    try:
+        db = app.state.db
+
+        # Must Match the mounted folder shown in compose -- Loads a staging database while ingest continues, then swaps it in
+        result = await db.restore_backup(f"/db_backups/{filename}", progress)
+
+    except Exception as e:
+
+        # Messages
+        await broadcast_message(misc_manager, f"Restore failed: {e}", "error")
+        loggers.log_system_logger(f"Failed to restore backup: {e}", True)
+        raise
+
+    await broadcast_message(misc_manager, "DB Restore Completed")
+    return result
+
+# API to attempt to restore a backup -- Returns the job id, poll /backup/jobs/{job_id} or watch the misc websocket
+@app.post("/backup/restore/{filename}")
+async def restore_backup(filename: str) -> dict[str, Any]:
 
-        # Restore the DB
-        await db.restore_backup(path)
+    try:
+        # The swap terminates every connection to the live database, pg_dump's included
+        if running_backup() is not None:
+            raise RuntimeError("A backup is running. Restore once it has finished.")
 
-        await broadcast_message(misc_manager, "DB Restore Completed")
+        job = jobs.start("restore", lambda job: run_restore(job, filename))
 
-        return {"success": True}
+        return {
+            "success": True,
+            "job": job.id,
+            "state": job.state,
+        }
 
     except Exception as e:
 
@@ -225,14 +500,19 @@ async def get_running_session() -> dict[str, Any]:
         return {"error": str(e), "success": False}
 
 # API to get a JSON of historical IMU data from a session label
+# Pass layout=columns to get one float array per column instead of one object per row
 @app.get("/imu/{label}")
-async def get_imu(label: str) -> dict[str, Any]:
+async def get_imu(label: str, layout: str = "rows") -> FastJSONResponse:
 
   try:
     db = app.state.db
     data = await db.retrieve_imu(label)
 
-    return {"data": data, "success": True}
+    if layout == "columns":
+      data = records_to_columns(data)
+
+    # Returned directly so FastAPI skips its validation/jsonable_encoder pass
+    return FastJSONResponse({"data": data, "success": True})
   except Exception as e:
     loggers.log_system_logger(f"Failed to pull IMU data from session '{label}': {e}", True)
     await broadcast_message(misc_manager, f"Failed to pull IMU data from session {label}: {e}", "error")
@@ -240,14 +520,19 @@ async def get_imu(label: str) -> dict[str, Any]:
     return {"error": str(e), "success": False}
 
 # API to get a JSON of historical CAMERA data from a session label
+# Pass layout=columns to get one float array per column instead of one object per row
 @app.get("/camera/{label}")
-async def get_camera(label: str) -> dict[str, Any]:
+async def get_camera(label: str, layout: str = "rows") -> FastJSONResponse:
 
   try:
     db = app.state.db
     data = await db.retrieve_camera(label)
 
-    return {"data": data, "success": True}
+    if layout == "columns":
+      data = records_to_columns(data)
+
+    # Returned directly so FastAPI skips its validation/jsonable_encoder pass
+    return FastJSONResponse({"data": data, "success": True})
   except Exception as e:
     loggers.log_system_logger(f"Failed to pull CAMERA data from session '{label}': {e}", True)
     await broadcast_message(misc_manager, f"Failed to pull CAMERA data from session {label}: {e}", "error")
@@ -256,19 +541,70 @@ async def get_camera(label: str) -> dict[str, Any]:
 
 # API to get a JSON of historical ROBOT data from a session label
 @app.get("/robot/{label}")
-async def get_robot(label: str) -> dict[str, Any]:
+async def get_robot(label: str) -> FastJSONResponse:
 
   try:
     db = app.state.db
     data = await db.retrieve_robot(label)
 
-    return {"data": data, "success": True}
+    # Returned directly so FastAPI skips its validation/jsonable_encoder pass
+    return FastJSONResponse({"data": data, "success": True})
   except Exception as e:
     loggers.log_system_logger(f"Failed to pull ROBOT data from session '{label}': {e}", True)
     await broadcast_message(misc_manager, f"Failed to pull ROBOT data from session {label}: {e}", "error")
 
     return {"error": str(e), "success": False}
 
+# API to get per-second (resolution=1s) or per-minute (1m) aggregates -- count, min, max, mean, variance per device and channel
+# Served from the rollup tables the batch writers maintain, so long ranges never scan raw rows -- label=all spans every session
+@app.get("/rollup/{label}")
+async def get_rollup(label: str, resolution: str = "1s", stream: str | None = None, device: str | None = None,
+                     channel: str | None = None, start: float | None = None, end: float | None = None,
+                     layout: str = "rows") -> FastJSONResponse:
+
+  try:
+    db = app.state.db
+    data = await db.retrieve_rollup(None if label == "all" else label, resolution, stream, device, channel, start, end)
+
+    if layout == "columns":
+      data = records_to_columns(data)
+
+    return FastJSONResponse({"data": data, "success": True})
+  except Exception as e:
+    loggers.log_system_logger(f"Failed to pull rollups for session '{label}': {e}", True)
+    await broadcast_message(misc_manager, f"Failed to pull rollups for session {label}: {e}", "error")
+
+    return {"error": str(e), "success": False}
+
+# API to stream a session's raw rows as CSV (optionally gzipped) straight from Postgres COPY
+@app.get("/export/{stream}/{label}.csv")
+async def export_csv(stream: str, label: str, gzip: bool = False) -> StreamingResponse:
+
+    db = app.state.db
+
+    if stream not in STREAM_TABLES:
+        raise HTTPException(404, "unknown stream")
+
+    if not await db.existing_session(label):
+        raise HTTPException(404, "unknown session")
+
+    chunks = db.export_csv(stream, label)
+    filename = f"{stream}_{label}.csv"
+    media_type = "text/csv"
+
+    if gzip:
+        chunks = gzip_stream(chunks)
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    loggers.log_system_logger(f"Exporting {stream} CSV for session '{label}'")
+
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 # API to start a session
 @app.get("/session/start/{label}")
 async def start_session(label: str) -> dict[str, Any]:
@@ -307,7 +643,7 @@ async def stop_session() -> dict[str, Any]:
   try:
 
     db = app.state.db
-    await db.end_session()
+    label = await db.end_session()
 
     loggers.log_system_logger("System session stopped successfully")
     loggers.cur_camera_logger.info(f"Camera session ended.")
@@ -316,7 +652,12 @@ async def stop_session() -> dict[str, Any]:
 
     await broadcast_message(misc_manager, "Session ended with logs successfully")
 
-    msg = await try_backup()
+    # Backup runs in the background -- The response carries its job id
+    msg = None
+    if STOP_BACKUP == "session":
+        msg = await try_backup(label)
+    elif STOP_BACKUP == "full":
+        msg = await try_backup()
 
     return {"message": f"Current Session Ended", "backup": msg, "success": True}
   except Exception as e:
@@ -340,6 +681,17 @@ async def startup():
     # Creates the loggers instances to be ready
     loggers.create_loggers()
 
+    # Migrations, partitions and required indexes -- Then keeps future partitions ahead of ingest (PARTITION_STRATEGY in .env)
+    await app.state.db.prepare_schema()
+    asyncio.create_task(partitions.run(lambda: app.state.db.acquire("admin")))
+
+    # Catalogs backups made before the catalog existed, then re-verifies checksums in the background
+    asyncio.create_task(catalog.run())
+
+    # Starts the telemetry ticker and the event loop watchdog (lag percentiles + stall stacks)
+    asyncio.create_task(telemetry.run())
+    watchdog.start()
+
     # Creates workers for IMU and CAMERA
     asyncio.create_task(camera_worker(batch_size=int(os.getenv("BATCHES", 50)), flush_interval=float(os.getenv("B_TIMEOUT"))))
     asyncio.create_task(imu_worker(batch_size=int(os.getenv("BATCHES", 50)), flush_interval=float(os.getenv("B_TIMEOUT"))))
@@ -370,16 +722,23 @@ async def camera_worker(batch_size=50, flush_interval=2.0) -> None:
         if len(batch) >= batch_size or (batch and (now - last_flush) >= flush_interval):
 
             try:
-                await db.insert_camera_batch(batch)
-
+                started = time.perf_counter()
+                flush_started = time.time()
+                inserted = await db.insert_camera_batch(batch)
+                latency.record_batch("camera", batch, flush_started, time.time())
+
+                # Reported in the once-per-second telemetry frame instead of a broadcast per flush
+                elapsed = time.perf_counter() - started
+                telemetry.record_flush("camera", batch, elapsed)
+                metrics.record_flush("camera", len(batch), elapsed, inserted)
                 loggers.cur_camera_logger.info(f"Inserted {len(batch)} CAMERA rows")
-                await broadcast_message(camera_manager, f"Inserted {len(batch)} CAMERA rows")
 
                 batch.clear()
                 last_flush = now
             except Exception as e:
                 loggers.cur_camera_logger.error(f"CAMERA batch insert failed: {e} {batch[0]}")
-                await broadcast_message(camera_manager, f"CAMERA batch insert failed: {e}", "error")
+                telemetry.record_error("camera", "CAMERA batch insert", e)
+                metrics.INSERT_FAILURES.labels("camera").inc()
 
                 await asyncio.sleep(1)
 
@@ -404,16 +763,23 @@ async def imu_worker(batch_size=50, flush_interval=2.0) -> None:
         if len(batch) >= batch_size or (batch and (now - last_flush) >= flush_interval):
 
             try:
-                await db.insert_imu_batch(batch)
-
+                started = time.perf_counter()
+                flush_started = time.time()
+                inserted = await db.insert_imu_batch(batch)
+                latency.record_batch("imu", batch, flush_started, time.time())
+
+                # Reported in the once-per-second telemetry frame instead of a broadcast per flush
+                elapsed = time.perf_counter() - started
+                telemetry.record_flush("imu", batch, elapsed)
+                metrics.record_flush("imu", len(batch), elapsed, inserted)
                 loggers.cur_imu_logger.info(f"Inserted {len(batch)} IMU rows")
-                await broadcast_message(imu_manager, f"Inserted {len(batch)} IMU rows")
 
                 batch.clear()
                 last_flush = now
             except Exception as e:
                 loggers.cur_imu_logger.error(f"IMU batch insert failed: {e}")
-                await broadcast_message(imu_manager, f"IMU batch insert failed: {e}", "error")
+                telemetry.record_error("imu", "IMU batch insert", e)
+                metrics.INSERT_FAILURES.labels("imu").inc()
 
                 await asyncio.sleep(1)
 
@@ -421,21 +787,43 @@ async def imu_worker(batch_size=50, flush_interval=2.0) -> None:
 @mqtt.subscribe("imu/#")
 async def handle_sensors(client, topic, payload, qos, prop) -> None:
 
+    arrived_at = time.time()
+
     try:
         data = parse_imu_message(topic, payload)
+        data["arrived_at"] = arrived_at
+
+        # Producer is about to block -- The queue is saturated
+        if imu_queue.full():
+            IMU_QUEUE_FULL.inc()
+
+        latency.stamp_enqueue(data)
         await imu_queue.put(data)
+        await imu_bus.publish(data)
     except Exception as e:
         loggers.cur_imu_logger.error(f"IMU parse error: {e}")
-        await broadcast_message(imu_manager, f"IMU parse error: {e}", "error")
+        telemetry.record_error("imu", "IMU parse", e, device_from_topic(topic))
+        IMU_PARSE_FAILURES.inc()
 
 # MQTT Subscription for CAMERA device topics
 @mqtt.subscribe("camera/#")
 async def handle_camera(client, topic, payload, qos, prop) -> None:
 
+    arrived_at = time.time()
+
     try:
         data = parse_camera_message(topic, payload)
+        data["arrived_at"] = arrived_at
+
+        # Producer is about to block -- The queue is saturated
+        if camera_queue.full():
+            CAMERA_QUEUE_FULL.inc()
+
+        latency.stamp_enqueue(data)
         await camera_queue.put(data)
+        await camera_bus.publish(data)
 
     except Exception as e:
         loggers.cur_camera_logger.error(f"Camera parse error: {e}")
-        await broadcast_message(camera_manager, f"Camera parse error: {e}", "error")
+        telemetry.record_error("camera", "Camera parse", e, device_from_topic(topic))
+        CAMERA_PARSE_FAILURES.inc()
@@ -0,0 +1,338 @@
+import asyncio, math
+from bisect import bisect_left
+from typing import Awaitable, Callable, Iterable
+from urllib.parse import parse_qs
+from fast_server import loggers
+
+# Default histogram buckets (seconds)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+# Formats a float the way Prometheus expects
+def _fmt(value: float) -> str:
+
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if value != value:
+        return "NaN"
+
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: tuple, values: tuple, extra: str = "") -> str:
+
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+# Base for labelled metrics -- Children are cached per label tuple, so hot paths should keep the child
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+
+        # Unlabelled metrics are their own single child
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+
+            child = self._children[key] = self._new_child()
+
+        return child
+
+    # (label values, child) pairs
+    def children(self):
+        return list(self._children.items())
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+    def _samples(self):
+        for key, child in self._children.items():
+            yield f"{self.name}{_label_str(self.labelnames, key)} {_fmt(child.value)}"
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    # Value is computed at scrape time -- Zero cost on the hot path
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.function = function
+
+    def get(self) -> float:
+
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return math.nan
+
+        return self.value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._children[()].set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._children[()].set_function(function)
+
+    def _samples(self):
+        for key, child in self._children.items():
+            yield f"{self.name}{_label_str(self.labelnames, key)} {_fmt(child.get())}"
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Estimates a quantile by interpolating inside the bucket that holds it
+    def quantile(self, q: float) -> float:
+
+        if self.count == 0:
+            return math.nan
+
+        rank = q * self.count
+        seen = 0
+
+        for i, c in enumerate(self.counts):
+            if seen + c >= rank and c:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * ((rank - seen) / c)
+            seen += c
+
+        return self.bounds[-1]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def _samples(self):
+        for key, child in self._children.items():
+            cumulative = 0
+
+            for bound, c in zip(self.bounds + (math.inf,), child.counts):
+                cumulative += c
+                le = 'le="' + _fmt(bound) + '"'
+                yield f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {cumulative}"
+
+            yield f"{self.name}_sum{_label_str(self.labelnames, key)} {_fmt(child.sum)}"
+            yield f"{self.name}_count{_label_str(self.labelnames, key)} {child.count}"
+
+
+# Holds every metric of a process and renders the Prometheus text format
+class MetricsRegistry:
+
+    def __init__(self):
+        self.metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+
+# Global registry for use in other scripts (one per process)
+REGISTRY = MetricsRegistry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Ingest pipeline
+QUEUE_DEPTH = REGISTRY.gauge("ingest_queue_depth", "Items waiting in the ingest queue", ["stream"])
+QUEUE_CAPACITY = REGISTRY.gauge("ingest_queue_capacity", "Maximum size of the ingest queue", ["stream"])
+QUEUE_FULL = REGISTRY.counter("ingest_queue_full_total", "Times a producer found the ingest queue full", ["stream"])
+BATCH_SIZE = REGISTRY.histogram("ingest_batch_size", "Rows per batch insert", ["stream"], SIZE_BUCKETS)
+FLUSH_SECONDS = REGISTRY.histogram("ingest_flush_seconds", "Batch insert latency", ["stream"])
+ROWS_INSERTED = REGISTRY.counter("ingest_rows_inserted_total", "Rows committed to the database", ["stream"])
+ROWS_DROPPED = REGISTRY.counter("ingest_rows_dropped_total", "Rows discarded before reaching the database", ["stream", "reason"])
+INSERT_FAILURES = REGISTRY.counter("ingest_insert_failures_total", "Failed batch insert attempts", ["stream"])
+PARSE_FAILURES = REGISTRY.counter("ingest_parse_failures_total", "Messages that failed to parse", ["stream"])
+
+# Device frame counters (db.sequence)
+FRAMES_MISSING = REGISTRY.counter("ingest_frames_missing_total", "Frames skipped in a device's counter sequence", ["stream", "device"])
+FRAMES_LATE = REGISTRY.counter("ingest_frames_late_total", "Frames that arrived after a newer frame of the same device", ["stream", "device"])
+SEQUENCE_RESETS = REGISTRY.counter("ingest_sequence_resets_total", "Times a device's frame counter started over", ["stream", "device"])
+
+# Database pool
+POOL_CONNECTIONS = REGISTRY.gauge("db_pool_connections", "Pool connections by state", ["pool", "state"])
+POOL_ACQUIRE_SECONDS = REGISTRY.histogram("db_pool_acquire_wait_seconds", "Time spent waiting for a pool connection", ["pool"])
+POOL_CHECKOUT_SECONDS = REGISTRY.histogram("db_pool_checkout_seconds", "Time a pool connection was held", ["pool"])
+READ_ADMISSION_SECONDS = REGISTRY.histogram("db_read_admission_wait_seconds", "Time read queries waited for an admission slot")
+READ_QUERIES = REGISTRY.gauge("db_read_queries", "Read queries by admission state", ["state"])
+
+# Websockets
+WS_CLIENTS = REGISTRY.gauge("websocket_clients", "Connected websocket clients", ["channel", "state"])
+
+# Event loop
+LOOP_LAG = REGISTRY.gauge("event_loop_lag_seconds", "Most recent event loop scheduling lag (fed by watchdog.LoopWatchdog)")
+LOOP_LAG_HIST = REGISTRY.histogram("event_loop_lag_distribution_seconds", "Event loop scheduling lag")
+
+
+# Exposes an asyncio queue's depth and capacity
+def track_queue(stream: str, queue: asyncio.Queue) -> None:
+    QUEUE_DEPTH.labels(stream).set_function(queue.qsize)
+    QUEUE_CAPACITY.labels(stream).set(queue.maxsize)
+
+
+# Records one successful batch insert -- `inserted` excludes duplicates the batch writer skipped
+def record_flush(stream: str, rows: int, seconds: float, inserted: int | None = None) -> None:
+    BATCH_SIZE.labels(stream).observe(rows)
+    FLUSH_SECONDS.labels(stream).observe(seconds)
+    ROWS_INSERTED.labels(stream).inc(rows if inserted is None else inserted)
+
+
+# Minimal HTTP endpoint for processes without a web framework (TCP server)
+# `routes` adds control paths: async handler(query) -> (status, content type, body)
+async def serve_metrics(host: str = "0.0.0.0", port: int = 9101, registry: MetricsRegistry = REGISTRY,
+                        routes: dict[str, Callable[[dict], Awaitable[tuple[str, str, bytes]]]] | None = None):
+
+    routes = routes or {}
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+
+            # Drain headers
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+
+            parts = request.decode("latin-1").split()
+            method, target = (parts[0], parts[1]) if len(parts) >= 2 else ("", "")
+            path, _, query = target.partition("?")
+
+            if method == "GET" and path == "/metrics":
+                status, content_type, body = "200 OK", CONTENT_TYPE, registry.render().encode()
+            elif method in ("GET", "POST") and path in routes:
+                # A bad query (e.g. ?limit=abc) gets an answer -- Only socket errors are swallowed below
+                try:
+                    status, content_type, body = await routes[path](parse_qs(query))
+                except Exception as e:
+                    loggers.log_system_logger(f"Admin route {path} failed: {e}", True)
+                    status, content_type, body = "400 Bad Request", "text/plain", f"{e}\n".encode()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", b"not found\n"
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+
+        except Exception:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host=host, port=port)
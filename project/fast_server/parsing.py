@@ -1,5 +1,11 @@
 from typing import Any
 
+# Best-effort device label from a topic such as 'imu/<device_ID>' -- Used when a payload fails to parse
+def device_from_topic(topic) -> str | None:
+
+    parts = topic.split("/") if isinstance(topic, str) else []
+    return parts[1] if len(parts) == 2 else None
+
 # Helper method to parse CAMERA messages
 def parse_camera_message(topic, payload) -> dict[str, Any]:
 
@@ -0,0 +1,337 @@
+import asyncio, cProfile, io, marshal, os, pstats, signal, sys, threading, time, tracemalloc
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+from fast_server.responses import dumps
+
+# Longest profile a caller may ask for -- A forgotten cProfile slows the loop for good
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 300))
+
+# How often the sampler reads the loop thread's stack
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))
+
+# Frames kept per tracemalloc allocation
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", 10))
+
+# Where signal-triggered profiles / snapshots are written
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "/fast_server/logs/profiles"))
+
+MODES = ("cprofile", "sample")
+FORMATS = {
+    "pstats": "application/octet-stream",
+    "text": "text/plain; charset=utf-8",
+    "collapsed": "text/plain; charset=utf-8",
+}
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+# Collapsed-stack frame name, the format flamegraph.pl / speedscope read
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+# One time-boxed profile of the event loop thread at a time
+class LoopProfiler:
+
+    def __init__(self):
+        self.mode = None
+        self.running = False
+        self.started_at = None
+        self.stopped_at = None
+        self.seconds = None
+        self.on_finish: list[Callable[["LoopProfiler"], None]] = []
+
+        self._profile = None
+        self._stacks = Counter()
+        self._samples = 0
+        self._halt = threading.Event()
+        self._sampler = None
+        self._timer = None
+
+    def status(self) -> dict:
+
+        return {
+            "mode": self.mode,
+            "running": self.running,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "seconds": self.seconds,
+            "samples": self._samples if self.mode == "sample" else None,
+            "formats": self.formats(),
+        }
+
+    # Formats the last finished profile can be downloaded in
+    def formats(self) -> list[str]:
+
+        if self.running or self.mode is None:
+            return []
+
+        return ["pstats", "text"] if self.mode == "cprofile" else ["collapsed"]
+
+    # Must be called from the loop thread -- That is the thread being profiled
+    def start(self, mode: str = "cprofile", seconds: float = 30.0, interval: float = SAMPLE_INTERVAL) -> dict:
+
+        if self.running:
+            raise ProfilerBusy(f"A {self.mode} profile is already running")
+
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode {mode!r} (use one of {', '.join(MODES)})")
+
+        if seconds <= 0 or interval <= 0:
+            raise ValueError("seconds and interval must be positive")
+
+        loop = asyncio.get_running_loop()
+
+        self.mode = mode
+        self.seconds = min(seconds, PROFILE_MAX_SECONDS)
+        self.started_at = time.time()
+        self.stopped_at = None
+        self._profile = None
+        self._stacks = Counter()
+        self._samples = 0
+
+        if mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._halt.clear()
+            self._sampler = threading.Thread(
+                target=self._sample_loop,
+                args=(threading.get_ident(), interval),
+                name="loop-sampler",
+                daemon=True,
+            )
+            self._sampler.start()
+
+        self.running = True
+        self._timer = loop.call_later(self.seconds, self.stop)
+
+        return self.status()
+
+    def stop(self) -> dict:
+
+        if not self.running:
+            return self.status()
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._profile is not None:
+            self._profile.disable()
+
+        if self._sampler is not None:
+            self._halt.set()
+            self._sampler.join()
+            self._sampler = None
+
+        self.running = False
+        self.stopped_at = time.time()
+
+        for callback in self.on_finish:
+            callback(self)
+
+        return self.status()
+
+    # Runs in its own thread and walks the loop thread's current frame
+    def _sample_loop(self, thread_id: int, interval: float) -> None:
+
+        while not self._halt.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+
+            if stack:
+                self._stacks[";".join(reversed(stack))] += 1
+                self._samples += 1
+
+    # Returns the last finished profile -- pstats is the binary format pstats.Stats / snakeviz load
+    def export(self, fmt: str) -> bytes:
+
+        if fmt not in self.formats():
+            raise LookupError(f"No finished profile available as {fmt!r}")
+
+        if fmt == "pstats":
+            self._profile.create_stats()
+            return marshal.dumps(self._profile.stats)
+
+        if fmt == "text":
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(60)
+            return out.getvalue().encode()
+
+        lines = (f"{stack} {count}" for stack, count in self._stacks.most_common())
+        return ("\n".join(lines) + "\n").encode()
+
+
+# tracemalloc snapshots, diffed against the previous one, plus sizes of known long-lived containers
+class MemoryProbe:
+
+    def __init__(self):
+        self.sizes: dict[str, Callable[[], int]] = {}
+        self._last = None
+        self._since = None
+
+    # Registers a container whose length is reported with every snapshot
+    def track(self, name: str, size: Callable[[], int]) -> None:
+        self.sizes[name] = size
+
+    def container_sizes(self) -> dict[str, int | None]:
+
+        out = {}
+        for name, size in self.sizes.items():
+            try:
+                out[name] = int(size())
+            except Exception:
+                out[name] = None
+
+        return out
+
+    # First call starts tracing, so its allocations are only those made since then
+    def snapshot(self, limit: int = 25) -> dict:
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._last = None
+            self._since = time.time()
+
+        snap = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+        if self._last is not None:
+            stats = snap.compare_to(self._last, "lineno")
+        else:
+            stats = snap.statistics("lineno")
+
+        top = []
+        for stat in stats[:limit]:
+            top.append({
+                "where": str(stat.traceback[0]),
+                "size_kb": round(stat.size / 1024, 1),
+                "size_diff_kb": round(getattr(stat, "size_diff", stat.size) / 1024, 1),
+                "count": stat.count,
+                "count_diff": getattr(stat, "count_diff", stat.count),
+            })
+
+        current, peak = tracemalloc.get_traced_memory()
+        compared = self._last is not None
+        self._last = snap
+
+        return {
+            "tracing_since": self._since,
+            "compared_to_previous": compared,
+            "traced_mb": round(current / 2**20, 2),
+            "peak_mb": round(peak / 2**20, 2),
+            "top": top,
+            "containers": self.container_sizes(),
+        }
+
+    def stop(self) -> None:
+
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+        self._last = None
+        self._since = None
+
+
+profiler = LoopProfiler()
+memory_probe = MemoryProbe()
+
+
+# Control routes for processes without a web framework -- Served by metrics.serve_metrics
+def admin_routes(prof: LoopProfiler = profiler, probe: MemoryProbe = memory_probe) -> dict:
+
+    def arg(query: dict, name: str, default):
+        return type(default)(query.get(name, [default])[0])
+
+    def reply(payload: dict, status: str = "200 OK"):
+        return status, "application/json", dumps(payload)
+
+    async def start(query):
+        try:
+            return reply({"data": prof.start(arg(query, "mode", "cprofile"), arg(query, "seconds", 30.0),
+                                             arg(query, "interval", SAMPLE_INTERVAL)), "success": True})
+        except ProfilerBusy as e:
+            return reply({"error": str(e), "success": False}, "409 Conflict")
+        except ValueError as e:
+            return reply({"error": str(e), "success": False}, "400 Bad Request")
+
+    async def stop(query):
+        return reply({"data": prof.stop(), "success": True})
+
+    async def status(query):
+        return reply({"data": prof.status(), "success": True})
+
+    async def download(query):
+        fmt = arg(query, "format", "pstats")
+        try:
+            return "200 OK", FORMATS[fmt], prof.export(fmt)
+        except (LookupError, KeyError) as e:
+            return reply({"error": str(e), "success": False}, "404 Not Found")
+
+    async def snapshot(query):
+        return reply({"data": probe.snapshot(arg(query, "limit", 25)), "success": True})
+
+    async def memory_stop(query):
+        probe.stop()
+        return reply({"success": True})
+
+    return {
+        "/admin/profile/start": start,
+        "/admin/profile/stop": stop,
+        "/admin/profile": status,
+        "/admin/profile/download": download,
+        "/admin/memory/snapshot": snapshot,
+        "/admin/memory/stop": memory_stop,
+    }
+
+
+# Writes a finished signal-triggered profile next to the logs
+def _write_profile(prof: LoopProfiler, log: Callable[[str], None]) -> None:
+
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    try:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+
+        for fmt in prof.formats():
+            path = PROFILE_DIR / f"{prof.mode}_{stamp}.{fmt}"
+            path.write_bytes(prof.export(fmt))
+            log(f"Profile written to {path}")
+    except OSError as e:
+        log(f"Could not write profile: {e}")
+
+
+# SIGUSR1 toggles a profile, SIGUSR2 writes a tracemalloc snapshot -- For `docker kill -s USR1 <container>`
+def install_signal_handlers(log: Callable[[str], None], mode: str = "sample", seconds: float = 60.0,
+                            prof: LoopProfiler = profiler, probe: MemoryProbe = memory_probe) -> None:
+
+    loop = asyncio.get_running_loop()
+    prof.on_finish.append(lambda p: _write_profile(p, log))
+
+    def toggle_profile():
+        if prof.running:
+            prof.stop()
+        else:
+            prof.start(mode, seconds)
+            log(f"Started {mode} profile for up to {seconds:.0f}s")
+
+    def write_snapshot():
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILE_DIR / f"memory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        path.write_bytes(dumps(probe.snapshot()))
+        log(f"Memory snapshot written to {path}")
+
+    loop.add_signal_handler(signal.SIGUSR1, toggle_profile)
+    loop.add_signal_handler(signal.SIGUSR2, write_snapshot)
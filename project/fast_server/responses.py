@@ -0,0 +1,66 @@
+import numpy as np
+import orjson
+from decimal import Decimal
+from typing import Any
+from starlette.responses import Response
+
+# orjson encodes numpy arrays straight from their buffers -- No per-element Python floats
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+# Fallback for types orjson doesn't know natively
+def _default(obj):
+
+    if isinstance(obj, Decimal):
+        return float(obj)
+
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+
+    # asyncpg Records (and other mappings)
+    if hasattr(obj, "keys"):
+        return dict(obj)
+
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+# Serializes a payload to JSON bytes
+def dumps(payload: Any) -> bytes:
+    return orjson.dumps(payload, default=_default, option=JSON_OPTIONS)
+
+
+# Serializes a payload to a JSON string (websockets send text frames)
+def dumps_text(payload: Any) -> str:
+    return dumps(payload).decode()
+
+
+# Response class that skips FastAPI's jsonable_encoder and serializes with orjson
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# Converts rows (dicts or asyncpg Records) into a column layout -- Numeric columns become float64 arrays
+def records_to_columns(rows) -> dict[str, Any]:
+
+    if not rows:
+        return {}
+
+    count = len(rows)
+    columns = {}
+
+    first = rows[0]
+
+    for key in first.keys():
+        values = [r[key] for r in rows]
+        sample = first[key]
+
+        # DB columns have one type, so the first row decides -- NULLs become NaN, which orjson writes as null
+        if isinstance(sample, (int, float)) and not isinstance(sample, bool):
+            columns[key] = np.fromiter(values, dtype=np.float64, count=count)
+        else:
+            columns[key] = values
+
+    return columns
@@ -0,0 +1,144 @@
+import asyncio, os, time
+from collections import Counter
+from typing import Awaitable, Callable
+
+# Seconds between summary frames -- Use .env
+TELEMETRY_INTERVAL = float(os.getenv("TELEMETRY_INTERVAL", 1.0))
+
+# Distinct error messages kept per tick -- The rest are only counted
+MAX_ERROR_LINES = 5
+
+
+# Counters for one stream, reset every tick
+class StreamTelemetry:
+
+    def __init__(self, stream: str):
+        self.stream = stream
+        self.queue: asyncio.Queue | None = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.rows = 0
+        self.flushes = 0
+        self.flush_seconds = 0.0
+        self.flush_max = 0.0
+        self.device_rows = Counter()
+        self.error_types = Counter()
+        self.error_devices = Counter()
+        self.error_messages = Counter()
+
+    @property
+    def active(self) -> bool:
+        return self.rows > 0 or bool(self.error_types)
+
+
+# Aggregates ingest counters and emits one compact summary frame per stream per tick
+class TelemetryAggregator:
+
+    def __init__(self, emit: Callable[[str, dict], Awaitable[None]], interval: float = TELEMETRY_INTERVAL):
+        self.emit = emit
+        self.interval = interval
+        self.streams: dict[str, StreamTelemetry] = {}
+        self._last_tick = time.monotonic()
+
+    def _stream(self, stream: str) -> StreamTelemetry:
+
+        st = self.streams.get(stream)
+        if st is None:
+            st = self.streams[stream] = StreamTelemetry(stream)
+
+        return st
+
+    # Queue depth is sampled at tick time, so the hot path pays nothing for it
+    def track_queue(self, stream: str, queue: asyncio.Queue) -> None:
+        self._stream(stream).queue = queue
+
+    # Called by workers after each successful batch insert
+    def record_flush(self, stream: str, batch: list[dict], seconds: float, device_key: str = "device_label") -> None:
+
+        st = self._stream(stream)
+        st.rows += len(batch)
+        st.flushes += 1
+        st.flush_seconds += seconds
+        st.flush_max = max(st.flush_max, seconds)
+        st.device_rows.update(d.get(device_key, "main") for d in batch)
+
+    # Called for parse and insert failures -- Identical messages are merged and counted
+    def record_error(self, stream: str, kind: str, error: Exception | str, device: str | None = None) -> None:
+
+        st = self._stream(stream)
+        error_type = f"{kind}:{type(error).__name__}" if isinstance(error, Exception) else kind
+
+        st.error_types[error_type] += 1
+        st.error_devices[device or "unknown"] += 1
+
+        text = f"{kind} error: {error}"
+        if text in st.error_messages or len(st.error_messages) < MAX_ERROR_LINES:
+            st.error_messages[text] += 1
+
+    # Builds the summary frames for every stream with activity and resets the counters
+    def snapshot(self) -> dict[str, dict]:
+
+        now = time.monotonic()
+        elapsed = max(now - self._last_tick, 1e-9)
+        self._last_tick = now
+
+        frames = {}
+
+        for stream, st in self.streams.items():
+
+            depth = st.queue.qsize() if st.queue is not None else None
+            if not st.active and not depth:
+                continue
+
+            rate = st.rows / elapsed
+            avg_ms = (st.flush_seconds / st.flushes * 1000) if st.flushes else 0.0
+            errors = sum(st.error_types.values())
+
+            text = f"{stream.upper()}: {rate:.0f} rows/s from {len(st.device_rows)} devices"
+            if st.flushes:
+                text += f" | flush avg {avg_ms:.1f} ms, max {st.flush_max * 1000:.1f} ms"
+            if depth is not None:
+                text += f" | queue {depth}/{st.queue.maxsize}"
+            if errors:
+                text += f" | {errors} errors"
+
+            # One line per distinct error with its count
+            for msg, count in st.error_messages.most_common():
+                text += f"\n  x{count} {msg}"
+
+            hidden = errors - sum(st.error_messages.values())
+            if hidden:
+                text += f"\n  +{hidden} more"
+
+            frames[stream] = {
+                "type": "error" if errors else "normal",
+                "text": text,
+                "stats": {
+                    "rows_per_s": round(rate, 1),
+                    "rows": st.rows,
+                    "flushes": st.flushes,
+                    "flush_avg_ms": round(avg_ms, 2),
+                    "flush_max_ms": round(st.flush_max * 1000, 2),
+                    "queue_depth": depth,
+                    "device_rows": dict(st.device_rows),
+                    "errors_by_type": dict(st.error_types),
+                    "errors_by_device": dict(st.error_devices),
+                },
+            }
+
+            st.reset()
+
+        return frames
+
+    # Emits one frame per active stream every interval
+    async def run(self) -> None:
+
+        while True:
+            await asyncio.sleep(self.interval)
+
+            for stream, frame in self.snapshot().items():
+                try:
+                    await self.emit(stream, frame)
+                except Exception as e:
+                    print(f"Telemetry emit failed for {stream}: {e}")
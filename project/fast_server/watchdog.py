@@ -0,0 +1,174 @@
+import asyncio, os, sys, threading, time, traceback
+from collections import deque
+from fast_server.metrics import LOOP_LAG, LOOP_LAG_HIST, REGISTRY
+from fast_server.responses import dumps
+
+# Heartbeat period of the loop side
+WATCHDOG_INTERVAL = float(os.getenv("WATCHDOG_INTERVAL", 0.05))
+
+# Lag beyond the heartbeat period that counts as a stall and gets its stack captured
+WATCHDOG_THRESHOLD = float(os.getenv("WATCHDOG_THRESHOLD", 0.1))
+
+# Stall events kept for /admin/watchdog
+WATCHDOG_EVENTS = int(os.getenv("WATCHDOG_EVENTS", 50))
+
+# Lag samples the percentiles are computed over (~8 min at the default interval)
+WATCHDOG_WINDOW = int(os.getenv("WATCHDOG_WINDOW", 10000))
+
+# Frames kept per captured stack
+STACK_LIMIT = 30
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+LOOP_STALLS = REGISTRY.counter("event_loop_stalls_total", "Times the event loop stopped running callbacks for longer than the watchdog threshold")
+
+
+# Measures loop scheduling lag from inside the loop, and catches stalls from a thread outside it
+# The loop side cannot see a stall until it is over -- The thread grabs the stack while it is happening
+class LoopWatchdog:
+
+    def __init__(self, interval: float = WATCHDOG_INTERVAL, threshold: float = WATCHDOG_THRESHOLD,
+                 max_events: int = WATCHDOG_EVENTS, window: int = WATCHDOG_WINDOW):
+
+        self.interval = interval
+        self.threshold = threshold
+        self.lags = deque(maxlen=window)
+        self.events = deque(maxlen=max_events)
+        self.stalls = 0
+
+        self._loop = None
+        self._loop_thread = None
+        self._beat_at = None
+        self._open = None
+        self._lock = threading.Lock()
+        self._halt = threading.Event()
+        self._thread = None
+        self._task = None
+
+    # Must be called from the loop that is being watched
+    def start(self) -> None:
+
+        if self._task is not None:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat_at = time.monotonic()
+        self._halt.clear()
+
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+
+        self._halt.set()
+
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # Loop side -- How late each sleep wakes up is time the loop spent on something else
+    async def _heartbeat(self) -> None:
+
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+
+            now = time.monotonic()
+            lag = max(now - expected, 0.0)
+            self._beat_at = now
+
+            self.lags.append(lag)
+            LOOP_LAG.set(lag)
+            LOOP_LAG_HIST.observe(lag)
+
+            # Close the stall the watcher thread opened -- Only now is its full length known
+            if self._open is not None:
+                with self._lock:
+                    event, self._open = self._open, None
+                event["blocked_for"] = round(lag, 4)
+
+    # Watcher thread -- Captures the loop thread's stack once per stall
+    def _watch(self) -> None:
+
+        while not self._halt.wait(self.interval / 2):
+
+            behind = time.monotonic() - self._beat_at - self.interval
+            if behind < self.threshold or self._open is not None:
+                continue
+
+            event = self._capture(behind)
+
+            with self._lock:
+                self._open = event
+                self.events.append(event)
+                self.stalls += 1
+
+            LOOP_STALLS.inc()
+
+    def _capture(self, behind: float) -> dict:
+
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = traceback.format_stack(frame, limit=STACK_LIMIT) if frame is not None else []
+
+        # Best effort -- Reads the loop's current-task table from another thread
+        task = None
+        try:
+            current = asyncio.current_task(self._loop)
+            if current is not None:
+                task = f"{current.get_name()} {current.get_coro()!r}"
+        except Exception:
+            pass
+
+        return {
+            "at": time.time(),
+            "detected_after": round(behind, 4),
+            "blocked_for": None,  # filled in when the loop runs again
+            "task": task,
+            "stack": [line.rstrip() for line in stack],
+        }
+
+    def percentiles(self) -> dict:
+
+        lags = sorted(self.lags)
+        if not lags:
+            return {"samples": 0}
+
+        out = {f"p{int(q * 100)}": round(lags[min(len(lags) - 1, int(q * len(lags)))], 5) for q in QUANTILES}
+        out["max"] = round(lags[-1], 5)
+        out["samples"] = len(lags)
+
+        return out
+
+    def summary(self, events: int = WATCHDOG_EVENTS) -> dict:
+
+        with self._lock:
+            recent = list(self.events)[-events:] if events > 0 else []
+
+        return {
+            "running": self._task is not None,
+            "interval": self.interval,
+            "threshold": self.threshold,
+            "lag": self.percentiles(),
+            "stalls": self.stalls,
+            "events": recent[::-1],
+        }
+
+
+watchdog = LoopWatchdog()
+
+
+# /admin/watchdog for processes served by metrics.serve_metrics
+def watchdog_routes(dog: LoopWatchdog = watchdog) -> dict:
+
+    async def summary(query):
+        events = int(query.get("events", [WATCHDOG_EVENTS])[0])
+        return "200 OK", "application/json", dumps({"data": dog.summary(events), "success": True})
+
+    return {"/admin/watchdog": summary}
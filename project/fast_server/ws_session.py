@@ -0,0 +1,78 @@
+import asyncio, json
+from fastapi import WebSocket, WebSocketDisconnect
+from fast_server import loggers
+from fast_server import connection_manager as cm
+from fast_server.live import LiveBus, subscribe_from_query
+
+PING = '{"type":"ping"}'
+PONG = '{"type":"pong"}'
+
+# Handles control messages sent by a client -- Anything unknown is ignored
+async def _handle_client_message(manager, websocket: WebSocket, text: str, bus: LiveBus | None) -> None:
+
+    try:
+        msg = json.loads(text)
+    except ValueError:
+        return
+
+    if not isinstance(msg, dict):
+        return
+
+    kind = msg.get("type")
+
+    if kind == "ping":
+        await manager.send_text(websocket, PONG)
+
+    # {"type": "subscribe", "rate": 10, "devices": ["imu1"]}
+    elif kind == "subscribe" and bus is not None:
+        try:
+            bus.subscribe(websocket, float(msg.get("rate", 1)), msg.get("devices"))
+        except (TypeError, ValueError):
+            pass
+
+    elif kind == "unsubscribe" and bus is not None:
+        bus.unsubscribe(websocket)
+
+
+# Shared websocket session -- Receive loop, heartbeats and idle timeout so dead clients are removed immediately
+async def serve_websocket(manager, websocket: WebSocket, name: str, bus: LiveBus | None = None) -> None:
+
+    await manager.connect(websocket)
+
+    # Optional live samples, e.g. /ws/imu?rate=10&devices=a,b
+    if bus is not None:
+        subscribe_from_query(bus, websocket)
+
+    try:
+        while manager.is_connected(websocket):
+
+            try:
+                message = await asyncio.wait_for(websocket.receive(), timeout=cm.WS_HEARTBEAT_INTERVAL)
+
+            # Quiet period -- Drop the client if it stopped answering, otherwise ping it
+            except asyncio.TimeoutError:
+
+                if cm.WS_IDLE_TIMEOUT > 0 and manager.idle_for(websocket) >= cm.WS_IDLE_TIMEOUT:
+                    manager.idle_disconnects += 1
+                    await manager.close_socket(websocket, 1001, "Idle timeout")
+                    break
+
+                await manager.send_text(websocket, PING)
+                continue
+
+            if message["type"] == "websocket.disconnect":
+                break
+
+            manager.touch(websocket)
+
+            if message.get("text"):
+                await _handle_client_message(manager, websocket, message["text"], bus)
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        loggers.log_system_logger(f"{name} WB Error: {e}", True)
+    finally:
+        if bus is not None:
+            bus.unsubscribe(websocket)
+        manager.disconnect(websocket)
@@ -1,9 +1,11 @@
 import os, asyncio, aiohttp, time
 from typing import Optional, Tuple
-from datetime import datetime
 from fast_server import loggers
-from db.database import DatabaseSingleton
-from zoneinfo import ZoneInfo
+from fast_server.telemetry import TelemetryAggregator
+from fast_server import latency, metrics
+from fast_server.profiling import admin_routes, install_signal_handlers, memory_probe
+from fast_server.watchdog import watchdog, watchdog_routes
+from db.database import DatabaseSingleton, DatabaseSwapped
 
 # Batched info for ROBOT
 queue_size = float(os.getenv("QUEUE_SIZE", 5000))
@@ -31,6 +33,90 @@ async def send_to_fastapi(msg: str, msg_type: str = "normal"):
         print(f"Could not reach FastAPI API: {e}")
 
 
+# Posts a telemetry summary frame to the FastAPI robot channel
+async def emit_telemetry(stream: str, frame: dict):
+    host = os.getenv("FASTAPI_HOST", os.getenv("HOST_IP", "localhost"))
+    port = os.getenv("FASTAPI_PORT", "8000")
+
+    url = f"http://{host}:{port}/send/{stream}"
+
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json=frame) as resp:
+            if resp.status != 200:
+                text = await resp.text()
+                print(f"FastAPI telemetry failed ({resp.status}): {text}")
+
+# Robot ingest counters, sent once per second instead of per flush / per error
+telemetry = TelemetryAggregator(emit_telemetry)
+telemetry.track_queue("robot", robot_queue)
+metrics.track_queue("robot", robot_queue)
+
+ROBOT_QUEUE_FULL = metrics.QUEUE_FULL.labels("robot")
+ROBOT_PARSE_FAILURES = metrics.PARSE_FAILURES.labels("robot")
+
+# Long-lived containers reported with every tracemalloc snapshot
+memory_probe.track("db.history", lambda: len(DatabaseSingleton._instance.history))
+memory_probe.track("db.devices", lambda: len(DatabaseSingleton._instance.devices))
+memory_probe.track("queue.robot", robot_queue.qsize)
+
+
+# Live sample forwarding state -- Skip posting while FastAPI reports no live subscribers
+LIVE_PROBE_INTERVAL = float(os.getenv("LIVE_PROBE_INTERVAL", 5.0))
+live_state = {"subscribers": 0, "checked": 0.0}
+
+# Helper to forward flushed robot samples to the FastAPI live bus
+async def send_live_to_fastapi(samples: list[dict]):
+
+    now = time.monotonic()
+    if live_state["subscribers"] == 0 and (now - live_state["checked"]) < LIVE_PROBE_INTERVAL:
+        return
+
+    host = os.getenv("FASTAPI_HOST", os.getenv("HOST_IP", "localhost"))
+    port = os.getenv("FASTAPI_PORT", "8000")
+
+    url = f"http://{host}:{port}/live/robot"
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json={"samples": samples}) as resp:
+                if resp.status == 200:
+                    live_state["subscribers"] = (await resp.json()).get("subscribers", 0)
+                else:
+                    live_state["subscribers"] = 0
+    except Exception as e:
+        live_state["subscribers"] = 0
+        print(f"Could not reach FastAPI live API: {e}")
+    finally:
+        live_state["checked"] = now
+
+
+# Parses one robot CSV line -- Order must match the robot's send order and insert_robot_batch
+def parse_robot_message(text: str, recorded_at: float) -> dict:
+
+    parts = [p.strip() for p in text.split(",")]
+
+    return {
+        "frame_id": int(parts[0]), # count
+        "ts_epoch": float(parts[1]),
+        "ts_string": parts[2],
+
+        "joint1": float(parts[3]),
+        "joint2": float(parts[4]),
+        "joint3": float(parts[5]),
+        "joint4": float(parts[6]),
+        "joint5": float(parts[7]),
+        "joint6": float(parts[8]),
+
+        "x": float(parts[9]),
+        "y": float(parts[10]),
+        "z": float(parts[11]),
+        "w": float(parts[12]),
+        "p": float(parts[13]),
+        "r": float(parts[14]),
+        "recorded_at": recorded_at,
+    }
+
+
 # Continuously comsumes the queue and performs batched DB insertions
 async def robot_worker(batch_size=50, flush_interval=2.0):
     db = await DatabaseSingleton.get_instance()
@@ -47,14 +133,25 @@ async def robot_worker(batch_size=50, flush_interval=2.0):
         now = time.monotonic()
         if (len(batch) >= batch_size) or (batch and (now - last_flush) >= flush_interval):
             try:
-                await db.insert_robot_batch(batch)
+                started = time.perf_counter()
+                flush_started = time.time()
+                inserted = await db.insert_robot_batch(batch)
+                latency.record_batch("robot", batch, flush_started, time.time(), capture_key="ts_epoch")
+
+                elapsed = time.perf_counter() - started
+                telemetry.record_flush("robot", batch, elapsed)
+                metrics.record_flush("robot", len(batch), elapsed, inserted)
                 loggers.cur_robot_logger.info(f"Inserted {len(batch)} robot rows.")
-                await send_to_fastapi(f"Inserted {len(batch)} robot rows.")
+                await send_live_to_fastapi(batch)
                 batch.clear()
                 last_flush = now
+            except DatabaseSwapped as e:
+                # Restored from the FastAPI process -- Cached ids are already cleared, the batch is retried with fresh ones
+                loggers.cur_robot_logger.info(e.message)
             except Exception as e:
                 loggers.cur_robot_logger.error(f"DB batch insert failed: {e}")
-                await send_to_fastapi(f"Failed to store message: {e}", "error")
+                telemetry.record_error("robot", "Robot batch insert", e)
+                metrics.INSERT_FAILURES.labels("robot").inc()
                 await asyncio.sleep(1)
 
         await asyncio.sleep(0)
@@ -78,47 +175,24 @@ async def handle_robot(reader: asyncio.StreamReader, writer: asyncio.StreamWrite
                 if not text:
                     continue
 
+                arrived_at = time.time()
+
                 try:
-                    parts = [p.strip() for p in text.split(",")]
-
-                    ts_str = parts[0]
-
-                    try:
-                        dt = datetime.strptime(ts_str, "%m/%d/%Y %H:%M")
-                        local_dt = dt.replace(tzinfo=ZoneInfo("US/Eastern"))
-                        utc_dt = local_dt.astimezone(ZoneInfo("UTC"))
-                        ts_epoch = int(utc_dt.timestamp())
-
-                    except Exception as e:
-                        ts_epoch = int(-1)
-
-
-                    data = {
-                        "frame_id": int(parts[0]), # count
-                        "ts_epoch": float(parts[1]),
-                        "ts_string": parts[2],
-
-                        "joint1": float(parts[3]),
-                        "joint2": float(parts[4]),
-                        "joint3": float(parts[5]),
-                        "joint4": float(parts[6]),
-                        "joint5": float(parts[7]),
-                        "joint6": float(parts[8]),
-                        
-                        "x": float(parts[9]),
-                        "y": float(parts[10]),
-                        "z": float(parts[11]),
-                        "w": float(parts[12]),
-                        "p": float(parts[13]),
-                        "r": float(parts[14]),
-                        "recorded_at": db.get_time(),
-                    }
+                    data = parse_robot_message(text, db.get_time())
+                    data["arrived_at"] = arrived_at
+
+                    # Producer is about to block -- The queue is saturated
+                    if robot_queue.full():
+                        ROBOT_QUEUE_FULL.inc()
 
+                    latency.stamp_enqueue(data)
                     await robot_queue.put(data)
                     loggers.cur_robot_logger.info(f"Queued message: {text}")
                 except Exception as e:
                     print(f"ROBOT PARSE ERROR: {e} line={text!r}")  # 👈 new
                     loggers.cur_robot_logger.error(f"Parse error: {e}")
+                    telemetry.record_error("robot", "Robot parse", e, "main")
+                    ROBOT_PARSE_FAILURES.inc()
 
     except asyncio.CancelledError:
         loggers.cur_robot_logger.info("Robot handler cancelled")
@@ -139,6 +213,16 @@ async def start_tcp_server(host: Optional[str] = None, port: int = 5001):
     loggers.cur_robot_logger.info(f"[TCP] Listening on {sockets}")
 
     asyncio.create_task(robot_worker(batch_size=batch_size, flush_interval=batch_timeout))
+    asyncio.create_task(telemetry.run())
+    watchdog.start()
+
+    # Prometheus scrape endpoint for this process, plus the /admin profiling and watchdog routes
+    metrics_port = int(os.getenv("METRICS_PORT", 9101))
+    await metrics.serve_metrics(host, metrics_port, routes={**admin_routes(), **watchdog_routes()})
+    loggers.cur_robot_logger.info(f"[TCP] Metrics on {host}:{metrics_port}/metrics")
+
+    # SIGUSR1 toggles a profile, SIGUSR2 writes a memory snapshot (files under PROFILE_DIR)
+    install_signal_handlers(loggers.cur_robot_logger.info)
 
     async with server:
         await server.serve_forever()
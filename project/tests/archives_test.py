@@ -0,0 +1,186 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from project.db import archives
+
+SESSION = {"id": 7, "label": "run-7", "started_at": 100.0, "ended_at": 200.0}
+DEVICES = [{"id": 3, "label": "imu-a", "category": "imu", "ip_address": "10.0.0.3", "registered_at": 1.0}]
+COLUMNS = {
+    "imu_measurement": ["id", "frame_id", "capture_time", "device_id", "session_id", "accel_x"],
+    "robot": ["id", "frame_id", "ts_epoch", "device_id", "session_id"],
+}
+ROWS = {
+    "imu_measurement": b"0,100.5,3,7,0.25\n1,100.6,3,7,0.5\n",
+    "robot": b"",
+}
+
+
+class ExportConn:
+
+    def __init__(self):
+        self.queries = []
+
+    @asynccontextmanager
+    async def transaction(self, **kwargs):
+        yield
+
+    async def fetchrow(self, query, *args):
+        return dict(SESSION) if args[0] == SESSION["label"] else None
+
+    async def fetchval(self, query, *args):
+        return 5
+
+    async def fetch(self, query, *args):
+
+        if "information_schema" in query:
+            return [{"column_name": c} for c in COLUMNS.get(args[0], [])]
+
+        return [dict(d) for d in DEVICES]
+
+    async def copy_from_query(self, query, *args, output, format):
+        self.queries.append((query, args))
+        table = query.split(" FROM ")[1].split()[0]
+
+        # Delivered in pieces, like the server does
+        data = ROWS[table]
+        for i in range(0, len(data), 7):
+            await output(data[i:i + 7])
+
+        return f"COPY {len(data.splitlines())}"
+
+
+class RestoreConn:
+
+    def __init__(self, existing=None, columns=COLUMNS):
+        self.existing = existing
+        self.columns = columns
+        self.copied = {}
+        self.inserts = []
+        self.executed = []
+
+    @asynccontextmanager
+    async def transaction(self, **kwargs):
+        yield
+
+    async def fetchval(self, query, *args):
+
+        if query.startswith("SELECT id FROM session"):
+            return self.existing
+        if "INSERT INTO session" in query:
+            return 42
+        return 11  # device upsert
+
+    async def fetch(self, query, *args):
+        return [{"column_name": c} for c in self.columns.get(args[0], [])]
+
+    async def execute(self, query, *args):
+
+        if "INSERT INTO" in query and "SELECT" in query:
+            table = query.split()[2]
+            self.inserts.append((table, args))
+            return f"INSERT 0 {len(self.copied['restore_' + table].splitlines())}"
+
+        self.executed.append((query, args))
+        return "OK"
+
+    async def copy_to_table(self, table, source, columns, format):
+        self.copied[table] = b"".join([chunk async for chunk in source])
+
+
+class ArchiveTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out = Path(self.tmp.name) / "run-7.archive"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def export(self):
+        conn = ExportConn()
+        manifest = asyncio.run(archives.export_session(conn, "run-7", out=self.out))
+        return conn, manifest
+
+    def test_export_writes_manifest_and_compressed_tables(self):
+        conn, manifest = self.export()
+
+        written = json.loads((self.out / archives.MANIFEST).read_text())
+        self.assertEqual(written["session"]["label"], "run-7")
+        self.assertEqual(written["tables"]["imu_measurement"]["rows"], 2)
+        self.assertEqual(written["tables"]["imu_measurement"]["columns"], COLUMNS["imu_measurement"][1:])
+        self.assertEqual(set(written["tables"]), set(COLUMNS))  # Tables missing from the schema are skipped
+        self.assertEqual(manifest["rows"], 2)
+
+        # Only the session's rows are selected
+        self.assertTrue(all("t.session_id = $1" in q and args[0] == 7 for q, args in conn.queries))
+        self.assertEqual(asyncio.run(archives.verify_archive(self.out)), [])
+
+    def test_unknown_session(self):
+        with self.assertRaises(archives.BackupFailed):
+            asyncio.run(archives.export_session(ExportConn(), "nope", out=self.out))
+
+        self.assertFalse(self.out.exists())
+
+    def test_restore_appends_with_new_ids(self):
+        self.export()
+        conn = RestoreConn()
+
+        result = asyncio.run(archives.restore_session(conn, self.out))
+
+        self.assertEqual(result, {"session_id": 42, "label": "run-7", "rows": {"imu_measurement": 2, "robot": 0}})
+        self.assertEqual(conn.copied["restore_imu_measurement"], ROWS["imu_measurement"])
+
+        # New session id, archived device 3 -> live device 11
+        table, args = conn.inserts[0]
+        self.assertEqual((table, args), ("imu_measurement", (42, [3], [11])))
+
+        self.assertFalse(any(q.lstrip().startswith(("DROP", "TRUNCATE", "DELETE")) for q, _ in conn.executed))
+
+    def test_restore_stages_only_archived_columns(self):
+        self.export()
+        conn = RestoreConn()
+
+        asyncio.run(archives.restore_session(conn, self.out))
+        staging = [" ".join(q.split()) for q, _ in conn.executed if "CREATE TEMP TABLE" in q]
+
+        # The archive holds no ids -- A staging table built LIKE the target would keep id NOT NULL and reject every row
+        self.assertEqual(staging, [
+            "CREATE TEMP TABLE restore_imu_measurement ON COMMIT DROP AS "
+            "SELECT frame_id, capture_time, device_id, session_id, accel_x FROM imu_measurement WITH NO DATA",
+            "CREATE TEMP TABLE restore_robot ON COMMIT DROP AS "
+            "SELECT frame_id, ts_epoch, device_id, session_id FROM robot WITH NO DATA",
+        ])
+
+    def test_restore_refuses_taken_label(self):
+        self.export()
+
+        with self.assertRaises(archives.BackupFailed):
+            asyncio.run(archives.restore_session(RestoreConn(existing=7), self.out))
+
+        result = asyncio.run(archives.restore_session(RestoreConn(existing=None), self.out, label="run-7b"))
+        self.assertEqual(result["label"], "run-7b")
+
+    def test_restore_rejects_corrupt_archive(self):
+        self.export()
+        with open(self.out / "imu_measurement.csv.gz", "ab") as f:
+            f.write(b"x")
+
+        with self.assertRaises(archives.BackupFailed) as e:
+            asyncio.run(archives.restore_session(RestoreConn(), self.out))
+
+        self.assertEqual(e.exception.data, ["imu_measurement.csv.gz"])
+
+    def test_restore_needs_migrated_schema(self):
+        self.export()
+        older = {**COLUMNS, "imu_measurement": ["id", "device_id", "session_id", "accel_x"]}
+
+        with self.assertRaises(archives.BackupFailed):
+            asyncio.run(archives.restore_session(RestoreConn(columns=older), self.out))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -14,60 +14,39 @@ class BackupIntegrationTests(unittest.TestCase):
 
     def test_backup_success(self):
         fake_db = MagicMock()
-        fake_db.create_backup.return_value = "/db_backups/test.sql"
+        fake_db.create_backup = AsyncMock(return_value="/db_backups/test.dir")
         app.state.db = fake_db
 
         with patch(
             "project.fast_server.main.broadcast_message",
             new_callable=AsyncMock,
         ) as mock_broadcast, patch(
-            "project.fast_server.main.log_system_logger"
+            "project.fast_server.main.loggers.log_system_logger"
         ) as mock_log:
 
             resp = self.client.get("/backup")
 
         self.assertEqual(resp.status_code, 200)
-        self.assertEqual(
-            resp.json(),
-            {"success": True, "path": "/db_backups/test.sql"},
-        )
+        body = resp.json()
+        self.assertTrue(body["success"])
+        self.assertIn("job", body)
 
         mock_log.assert_not_called()
 
         messages = [call.args[1] for call in mock_broadcast.call_args_list]
         self.assertIn("DB Backup Started", messages)
-        self.assertIn("DB Backup Completed", messages)
-
-    def test_backup_failure(self):
-        fake_db = MagicMock()
-
-        def boom():
-            raise Exception("boom")
 
-        fake_db.create_backup.side_effect = boom
-        app.state.db = fake_db
-
-        with patch(
-            "project.fast_server.main.broadcast_message",
-            new_callable=AsyncMock,
-        ) as mock_broadcast, patch(
-            "project.fast_server.main.log_system_logger"
-        ) as mock_log:
-            resp = self.client.get("/backup")
+    def test_backup_job_lookup(self):
+        resp = self.client.get("/backup/jobs/missing")
+        self.assertEqual(resp.status_code, 404)
 
+        resp = self.client.get("/backup/jobs")
         self.assertEqual(resp.status_code, 200)
-        body = resp.json()
-        self.assertFalse(body["success"])
-        self.assertIn("boom", body["error"])
-
-        mock_log.assert_called()
-
-        error_texts = [call.args[1] for call in mock_broadcast.call_args_list]
-        self.assertTrue(any("Failed to backup DB" in msg for msg in error_texts))
+        self.assertTrue(resp.json()["success"])
 
     def test_restore_backup_success(self):
         fake_db = MagicMock()
-        fake_db.restore_backup = AsyncMock()
+        fake_db.restore_backup = AsyncMock(return_value={"paused_s": 0.2, "retired": "db_pre_restore"})
         app.state.db = fake_db
 
         filename = "test.sql"
@@ -76,14 +55,16 @@ class BackupIntegrationTests(unittest.TestCase):
             "project.fast_server.main.broadcast_message",
             new_callable=AsyncMock,
         ) as mock_broadcast, patch(
-            "project.fast_server.main.log_system_logger"
+            "project.fast_server.main.loggers.log_system_logger"
         ) as mock_log:
             resp = self.client.post(f"/backup/restore/{filename}")
+            job = self.client.get(f"/backup/jobs/{resp.json()['job']}").json()["data"]
 
         self.assertEqual(resp.status_code, 200)
-        self.assertEqual(resp.json(), {"success": True})
+        self.assertTrue(resp.json()["success"])
+        self.assertEqual((job["kind"], job["state"]), ("restore", "succeeded"))
 
-        fake_db.restore_backup.assert_awaited_once_with("/db_backups/test.sql")
+        fake_db.restore_backup.assert_awaited_once_with("/db_backups/test.sql", unittest.mock.ANY)
 
         messages = [call.args[1] for call in mock_broadcast.call_args_list]
         self.assertIn("DB Restore Completed", messages)
@@ -93,7 +74,7 @@ class BackupIntegrationTests(unittest.TestCase):
     def test_restore_backup_failure(self):
         fake_db = MagicMock()
 
-        async def boom(path: str):
+        async def boom(path: str, progress=None):
             raise Exception("boom")
 
         fake_db.restore_backup = AsyncMock(side_effect=boom)
@@ -105,14 +86,14 @@ class BackupIntegrationTests(unittest.TestCase):
             "project.fast_server.main.broadcast_message",
             new_callable=AsyncMock,
         ) as mock_broadcast, patch(
-            "project.fast_server.main.log_system_logger"
+            "project.fast_server.main.loggers.log_system_logger"
         ) as mock_log:
             resp = self.client.post(f"/backup/restore/{filename}")
+            job = self.client.get(f"/backup/jobs/{resp.json()['job']}").json()["data"]
 
         self.assertEqual(resp.status_code, 200)
-        body = resp.json()
-        self.assertFalse(body["success"])
-        self.assertIn("boom", body["error"])
+        self.assertEqual(job["state"], "failed")
+        self.assertIn("boom", job["error"])
 
         mock_log.assert_called()
 
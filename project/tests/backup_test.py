@@ -1,16 +1,18 @@
 ## These tests were created with ChatGPT and edited by Michael ##
 
+import asyncio
 import unittest
 from unittest.mock import AsyncMock, MagicMock, patch
 
-from project.fast_server.main import try_backup, app, restore_backup
+from project.db.backups import PROGRESS_STEP, DumpProgress
+from project.fast_server.main import try_backup, app, jobs, restore_backup
 
 
 class BackupTests(unittest.IsolatedAsyncioTestCase):
 
     async def test_restore_backup_success(self):
         fake_db = MagicMock()
-        fake_db.restore_backup = AsyncMock()
+        fake_db.restore_backup = AsyncMock(return_value={"paused_s": 0.2, "retired": "db_pre_restore"})
         app.state.db = fake_db
 
         filename = "test.sql"
@@ -21,9 +23,15 @@ class BackupTests(unittest.IsolatedAsyncioTestCase):
         ) as mock_broadcast:
             result = await restore_backup(filename)
 
-        self.assertEqual(result, {"success": True})
+            # Returns before pg_restore finishes
+            self.assertTrue(result["success"])
+            job = jobs.get(result["job"])
+            await job.task
 
-        fake_db.restore_backup.assert_awaited_once_with("/db_backups/test.sql")
+        self.assertEqual(job.state, "succeeded")
+        self.assertEqual(job.result, {"paused_s": 0.2, "retired": "db_pre_restore"})
+
+        fake_db.restore_backup.assert_awaited_once_with("/db_backups/test.sql", unittest.mock.ANY)
 
         mock_broadcast.assert_any_call(
             unittest.mock.ANY,
@@ -33,7 +41,7 @@ class BackupTests(unittest.IsolatedAsyncioTestCase):
     async def test_restore_backup_failure(self):
         fake_db = MagicMock()
 
-        async def boom(path: str):
+        async def boom(path: str, progress=None):
             raise Exception("boom")
 
         fake_db.restore_backup = AsyncMock(side_effect=boom)
@@ -45,12 +53,14 @@ class BackupTests(unittest.IsolatedAsyncioTestCase):
             "project.fast_server.main.broadcast_message",
             new_callable=AsyncMock,
         ) as mock_broadcast, patch(
-            "project.fast_server.main.log_system_logger"
+            "project.fast_server.main.loggers.log_system_logger"
         ) as mock_log:
             result = await restore_backup(filename)
+            job = jobs.get(result["job"])
+            await job.task
 
-        self.assertFalse(result["success"])
-        self.assertIn("boom", result["error"])
+        self.assertEqual(job.state, "failed")
+        self.assertIn("boom", job.error)
 
         error_calls = [
             call for call in mock_broadcast.call_args_list
@@ -60,19 +70,45 @@ class BackupTests(unittest.IsolatedAsyncioTestCase):
 
         mock_log.assert_called()
 
+    async def test_restore_and_backup_exclude_each_other(self):
+
+        release = asyncio.Event()
+
+        async def slow(path, progress=None):
+            await release.wait()
+            return {"paused_s": 0.1, "retired": "db_pre_restore"}
+
+        fake_db = MagicMock()
+        fake_db.restore_backup = AsyncMock(side_effect=slow)
+        app.state.db = fake_db
+
+        with patch("project.fast_server.main.broadcast_message", new_callable=AsyncMock), \
+                patch("project.fast_server.main.loggers.log_system_logger"):
+            restoring = await restore_backup("test.sql")
+            backing_up = await try_backup()
+
+            release.set()
+            await jobs.get(restoring["job"]).task
+
+        self.assertFalse(backing_up["success"])
+        self.assertIn("restore is running", backing_up["error"])
+
     async def test_try_backup_success(self):
 
         fake_db = MagicMock()
-        fake_db.create_backup.return_value = "/db_backups/test.sql"
+        fake_db.create_backup = AsyncMock(return_value="/db_backups/test.dir")
         app.state.db = fake_db
 
         with patch("project.fast_server.main.broadcast_message", new_callable=AsyncMock) as mock_broadcast:
             result = await try_backup()
 
-        self.assertEqual(result, {
-            "success": True,
-            "path": "/db_backups/test.sql",
-        })
+            # Returns before the dump finishes
+            self.assertEqual(result["success"], True)
+            job = jobs.get(result["job"])
+            await job.task
+
+        self.assertEqual(job.state, "succeeded")
+        self.assertEqual(job.result, {"path": "/db_backups/test.dir"})
 
         mock_broadcast.assert_any_call(
             unittest.mock.ANY,
@@ -87,20 +123,117 @@ class BackupTests(unittest.IsolatedAsyncioTestCase):
 
         fake_db = MagicMock()
 
-        def boom():
+        async def boom(progress=None):
             raise Exception("boom")
 
-        fake_db.create_backup.side_effect = boom
+        fake_db.create_backup = AsyncMock(side_effect=boom)
         app.state.db = fake_db
 
-        with patch("project.fast_server.main.broadcast_message", new_callable=AsyncMock) as mock_broadcast:
+        with patch("project.fast_server.main.broadcast_message", new_callable=AsyncMock) as mock_broadcast, \
+                patch("project.fast_server.main.loggers.log_system_logger") as mock_log:
             result = await try_backup()
+            job = jobs.get(result["job"])
+            await job.task
 
-        self.assertEqual(result["success"], False)
-        self.assertIn("boom", result["error"])
+        self.assertEqual(job.state, "failed")
+        self.assertIn("boom", job.error)
+        mock_log.assert_called()
 
         error_calls = [
             call for call in mock_broadcast.call_args_list
             if "Failed to backup DB" in call.args[1]
         ]
         self.assertTrue(error_calls)
+
+    async def test_try_backup_reuses_running_job(self):
+
+        release = asyncio.Event()
+
+        async def slow(progress=None):
+            await progress({"percent": 50.0, "tables_done": 1, "tables": 2, "bytes_done": 1, "bytes": 2})
+            await release.wait()
+            return "/db_backups/test.dir"
+
+        fake_db = MagicMock()
+        fake_db.create_backup = AsyncMock(side_effect=slow)
+        app.state.db = fake_db
+
+        with patch("project.fast_server.main.broadcast_message", new_callable=AsyncMock) as mock_broadcast:
+            first = await try_backup()
+            await asyncio.sleep(0)
+            second = await try_backup()
+
+            self.assertEqual(first["job"], second["job"])
+            self.assertEqual(jobs.get(first["job"]).progress["percent"], 50.0)
+
+            release.set()
+            await jobs.get(first["job"]).task
+
+        fake_db.create_backup.assert_awaited_once()
+        messages = [call.args[1] for call in mock_broadcast.call_args_list]
+        self.assertEqual(messages.count("DB Backup Started"), 1)
+        self.assertIn("DB Backup 50% (1/2 tables)", messages)
+
+
+    async def test_session_stop_during_full_backup_still_exports_the_session(self):
+
+        release = asyncio.Event()
+
+        async def slow(progress=None):
+            await release.wait()
+            return "/db_backups/test.dir"
+
+        fake_db = MagicMock()
+        fake_db.create_backup = AsyncMock(side_effect=slow)
+        fake_db.export_session = AsyncMock(return_value={"path": "/db_backups/s.session", "rows": {}, "bytes": 1, "duration_s": 0.1})
+        app.state.db = fake_db
+
+        with patch("project.fast_server.main.broadcast_message", new_callable=AsyncMock):
+            full = await try_backup()
+            await asyncio.sleep(0)
+            session = await try_backup("run-1")
+
+            self.assertNotEqual(full["job"], session["job"])
+            await jobs.get(session["job"]).task
+
+            # Another session is not the same request either
+            other = await try_backup("run-2")
+            self.assertNotIn(other["job"], (full["job"], session["job"]))
+            await jobs.get(other["job"]).task
+
+            release.set()
+            await jobs.get(full["job"]).task
+
+        self.assertEqual(jobs.get(session["job"]).kind, "session:run-1")
+        self.assertEqual([c.args[0] for c in fake_db.export_session.await_args_list], ["run-1", "run-2"])
+
+
+class DumpProgressTests(unittest.TestCase):
+
+    def test_progress_is_weighted_by_table_size(self):
+        tracker = DumpProgress({"imu_measurement": 900, "session": 100})
+
+        self.assertTrue(tracker.feed('pg_dump: dumping contents of table "public.session"'))
+        self.assertEqual(tracker.percent, 10.0)
+
+        self.assertTrue(tracker.feed("pg_dump: finished item 3412 TABLE DATA imu_measurement"))
+        self.assertEqual(tracker.percent, 100.0)
+
+    def test_ignores_other_lines_and_repeats(self):
+        tracker = DumpProgress({"session": 100})
+
+        self.assertFalse(tracker.feed("pg_dump: reading extensions"))
+        self.assertTrue(tracker.feed("pg_dump: finished item 1 TABLE DATA public session"))
+        self.assertFalse(tracker.feed('pg_dump: dumping contents of table "public.session"'))
+        self.assertEqual(tracker.snapshot()["tables_done"], 1)
+
+    def test_reports_in_steps(self):
+        sizes = {f"t{i}": 1 for i in range(100)}
+        tracker = DumpProgress(sizes)
+
+        reports = 0
+        for name in sizes:
+            tracker.feed(f'pg_dump: dumping contents of table "public.{name}"')
+            reports += tracker.due()
+
+        self.assertEqual(reports, 100 // int(PROGRESS_STEP))
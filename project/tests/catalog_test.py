@@ -0,0 +1,110 @@
+import asyncio
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from project.db import catalog as catalog_module
+from project.db.catalog import BackupCatalog
+
+
+class CatalogTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.folder = Path(self.tmp.name)
+        self.log = patch.object(catalog_module.loggers, "log_system_logger").start()
+
+    def tearDown(self):
+        patch.stopall()
+        self.tmp.cleanup()
+
+    def make_dump_dir(self, name="db_20260101.dir"):
+        path = self.folder / name
+        path.mkdir()
+        (path / "toc.dat").write_bytes(b"toc")
+        (path / "3001.dat").write_bytes(b"rows" * 100)
+        return path
+
+    def test_record_and_list_from_cache(self):
+        cat = BackupCatalog(self.folder)
+        dump = self.make_dump_dir()
+        (self.folder / "old.dump").write_bytes(b"custom")
+
+        asyncio.run(cat.record(dump, sessions=["run1", "run2"], duration_s=1.23456, created_at=1.0))
+        asyncio.run(cat.record(self.folder / "old.dump", created_at=2.0))
+
+        # A fresh instance reads the index file, not the folder
+        entries = asyncio.run(BackupCatalog(self.folder).listing())
+
+        self.assertEqual([e["name"] for e in entries], ["old.dump", "db_20260101.dir"])
+        self.assertEqual(entries[1]["format"], "directory")
+        self.assertEqual(entries[1]["sessions"], ["run1", "run2"])
+        self.assertEqual(entries[1]["duration_s"], 1.235)
+        self.assertEqual(entries[1]["bytes"], 3 + 400)
+        self.assertEqual(set(entries[1]["files"]), {"toc.dat", "3001.dat"})
+        self.assertEqual(entries[0]["format"], "custom")
+
+    def test_verify_finds_corrupt_and_missing(self):
+        cat = BackupCatalog(self.folder)
+        dump = self.make_dump_dir()
+        asyncio.run(cat.record(dump))
+
+        self.assertEqual(asyncio.run(cat.verify(dump.name))["status"], "ok")
+
+        (dump / "3001.dat").write_bytes(b"flipped")
+        entry = asyncio.run(cat.verify(dump.name))
+        self.assertEqual((entry["status"], entry["problems"]), ("corrupt", ["3001.dat"]))
+        self.log.assert_called()
+
+        for f in dump.iterdir():
+            f.unlink()
+        dump.rmdir()
+        self.assertEqual(asyncio.run(cat.verify(dump.name))["status"], "missing")
+
+        saved = json.loads((self.folder / catalog_module.CATALOG_NAME).read_text())
+        self.assertEqual(saved["backups"][0]["status"], "missing")
+
+    def test_reconcile_adds_unknown_backups_only(self):
+        cat = BackupCatalog(self.folder)
+        self.make_dump_dir()
+        (self.folder / "partial.dir").mkdir()  # pg_dump still writing -- No toc.dat yet
+        (self.folder / "notes.txt").write_text("not a backup")
+
+        added = asyncio.run(cat.reconcile())
+
+        self.assertEqual(added, ["db_20260101.dir"])
+        self.assertEqual(asyncio.run(cat.reconcile()), [])
+
+    def test_stale_oldest_first(self):
+        cat = BackupCatalog(self.folder)
+        cat.entries = {
+            "a": {"name": "a", "verified_at": 100.0},
+            "b": {"name": "b", "verified_at": 50.0},
+            "c": {"name": "c", "verified_at": time.time()},
+        }
+
+        self.assertEqual(cat.stale(), ["b", "a"])
+
+    def test_formats(self):
+        self.make_dump_dir()
+        (self.folder / "old.dump").write_bytes(b"custom")
+        (self.folder / "db_20260102.chunked.json").write_text("{}")
+        (self.folder / "chunks").mkdir()
+
+        formats = {p.name: catalog_module.backup_format(p) for p in self.folder.iterdir()}
+
+        self.assertEqual(formats, {
+            "db_20260101.dir": "directory", "old.dump": "custom", "db_20260102.chunked.json": "chunked", "chunks": None,
+        })
+
+    def test_unreadable_index_starts_empty(self):
+        (self.folder / catalog_module.CATALOG_NAME).write_text("{not json")
+
+        self.assertEqual(asyncio.run(BackupCatalog(self.folder).listing()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import asyncio
+import io
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+from project.db import chunkstore
+
+# Small chunks so a few hundred KB exercise every rule -- Average 1 KiB
+SMALL = {"bits": 10, "min_size": 256, "max_size": 4096}
+
+
+def random_bytes(n, seed=1):
+    return random.Random(seed).randbytes(n)
+
+
+def split(data, **kwargs):
+    return list(chunkstore.split(io.BytesIO(data), **{**SMALL, **kwargs}))
+
+
+class SplitTests(unittest.TestCase):
+
+    def test_chunks_rebuild_the_stream_within_limits(self):
+        data = random_bytes(300_000)
+        chunks = split(data)
+
+        self.assertEqual(b"".join(chunks), data)
+        self.assertTrue(all(256 <= len(c) <= 4096 for c in chunks[:-1]))
+        self.assertGreater(len(chunks), 300_000 // 4096)
+
+    def test_boundaries_do_not_depend_on_read_size(self):
+        data = random_bytes(100_000)
+
+        self.assertEqual(split(data, block=777), split(data, block=1 << 20))
+
+    def test_insert_only_moves_nearby_boundaries(self):
+        data = random_bytes(300_000)
+        before = set(split(data))
+        after = split(random_bytes(100, seed=2) + data)
+
+        shared = sum(len(c) for c in after if c in before)
+        self.assertGreater(shared / len(data), 0.95)
+
+    def test_runs_without_cut_points_are_capped(self):
+        chunks = split(b"\0" * 20_000)
+
+        self.assertEqual(b"".join(chunks), b"\0" * 20_000)
+        self.assertTrue(all(len(c) <= 4096 for c in chunks))
+
+
+class StoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.store, self.dump, self.out = root / "chunks", root / "dump", root / "backups"
+        self.dump.mkdir()
+        (self.dump / "toc.dat").write_bytes(b"toc" * 100)
+        (self.dump / "3001.dat").write_bytes(random_bytes(2_000_000))
+        (self.dump / "3002.dat").write_bytes(random_bytes(500_000, seed=3))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def backup(self, name):
+        manifest = self.out / f"{name}{chunkstore.MANIFEST_SUFFIX}"
+        return manifest, asyncio.run(chunkstore.store_dump(self.dump, manifest, store=self.store, jobs=2))
+
+    def test_second_backup_stores_only_new_chunks(self):
+        _, first = self.backup("night1")
+        _, second = self.backup("night2")
+
+        self.assertGreater(first["new_bytes"], 0)
+        self.assertEqual(second["new_bytes"], 0)
+
+        # One table gains rows -- Only its tail is new
+        with open(self.dump / "3001.dat", "ab") as f:
+            f.write(random_bytes(50_000, seed=4))
+        _, third = self.backup("night3")
+
+        self.assertLess(third["new_chunks"], 5)
+        self.assertEqual(third["bytes"], first["bytes"] + 50_000)
+
+    def test_materialized_rebuilds_every_file(self):
+        manifest, _ = self.backup("night1")
+
+        async def rebuild():
+            async with chunkstore.materialized(manifest, store=self.store, jobs=2) as scratch:
+                files = {p.name: p.read_bytes() for p in scratch.iterdir()}
+            return files, scratch.exists()
+
+        files, left_behind = asyncio.run(rebuild())
+
+        self.assertEqual(files, {p.name: p.read_bytes() for p in self.dump.iterdir()})
+        self.assertFalse(left_behind)
+
+    def test_other_backups_pass_through(self):
+
+        async def passthrough():
+            async with chunkstore.materialized(self.dump) as source:
+                return source
+
+        self.assertEqual(asyncio.run(passthrough()), self.dump)
+
+    def test_corrupt_chunk_is_found_and_fails_restore(self):
+        manifest, _ = self.backup("night1")
+        victim = next(self.store.glob("*/*.zst"))
+        victim.write_bytes(b"garbage")
+
+        self.assertEqual(chunkstore.verify_manifest(manifest, store=self.store), [victim.name[:-4]])
+
+        async def rebuild():
+            async with chunkstore.materialized(manifest, store=self.store):
+                pass
+
+        with self.assertRaises(chunkstore.BackupFailed):
+            asyncio.run(rebuild())
+
+    def test_gc_keeps_referenced_chunks(self):
+        manifest, first = self.backup("night1")
+        (self.dump / "3002.dat").unlink()
+        second_manifest, _ = self.backup("night2")
+
+        self.assertEqual(chunkstore.gc(self.out, self.store)["removed"], 0)
+
+        manifest.unlink()
+        result = chunkstore.gc(self.out, self.store)
+
+        self.assertGreater(result["removed"], 0)
+        self.assertEqual(chunkstore.verify_manifest(second_manifest, store=self.store), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import re
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from project.fast_server import connection_manager as cm
+
+
+class FakeWebSocket:
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.sent = []
+        self.closed = False
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, msg):
+        await self.gate.wait()
+        await asyncio.sleep(self.delay)
+        self.sent.append(json.loads(msg))
+
+    async def close(self, code=1000, reason=""):
+        self.closed = True
+
+
+class ConnectionManagerTests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.manager = cm.ConnectionManager()
+
+    async def test_broadcast_reaches_all_clients(self):
+        a, b = FakeWebSocket(), FakeWebSocket()
+        await self.manager.connect(a)
+        await self.manager.connect(b)
+
+        await self.manager.broadcast_json({"type": "normal", "text": "hello"})
+        await asyncio.sleep(0.05)
+
+        self.assertEqual([m["text"] for m in a.sent], ["hello"])
+        self.assertEqual([m["text"] for m in b.sent], ["hello"])
+        self.assertIn("timestamp", a.sent[0])
+
+    async def test_slow_client_does_not_block_broadcast(self):
+        slow, fast = FakeWebSocket(), FakeWebSocket()
+        slow.gate.clear()
+
+        await self.manager.connect(slow)
+        await self.manager.connect(fast)
+
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        for i in range(10):
+            await self.manager.broadcast_json({"type": "normal", "text": str(i)})
+        self.assertLess(loop.time() - t0, 0.05)
+
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(fast.sent), 10)
+        self.assertEqual(slow.sent, [])
+
+    async def test_drop_oldest_and_disconnect_slow_client(self):
+        with patch.object(cm, "WS_SLOW_DROP_LIMIT", 5):
+            slow = FakeWebSocket()
+            slow.gate.clear()
+            await self.manager.connect(slow)
+
+            client = self.manager.clients[slow]
+            client.queue = cm.deque(maxlen=3)
+
+            for i in range(3):
+                await self.manager.send_text(slow, str(i))
+            self.assertEqual(list(client.queue), ["0", "1", "2"])
+
+            await self.manager.send_text(slow, "3")
+            self.assertEqual(list(client.queue), ["1", "2", "3"])
+
+            for i in range(4, 10):
+                await self.manager.send_text(slow, str(i))
+
+            await asyncio.sleep(0)
+
+        self.assertFalse(self.manager.is_connected(slow))
+        self.assertEqual(self.manager.slow_disconnects, 1)
+        self.assertTrue(slow.closed)
+
+    async def test_history_since(self):
+        with patch.object(cm, "WS_HISTORY_SIZE", 3):
+            manager = cm.ConnectionManager()
+
+        for i in range(5):
+            await manager.broadcast_json({"type": "normal", "text": str(i)})
+
+        self.assertEqual([json.loads(m)["text"] for m in manager.history_since(0)], ["2", "3", "4"])
+        self.assertEqual([json.loads(m)["text"] for m in manager.history_since(4)], ["4"])
+        self.assertEqual(manager.history_since(5), [])
+
+
+class LatestEndpointTests(unittest.TestCase):
+
+    def setUp(self):
+        from fastapi.testclient import TestClient
+        from project.fast_server.main import app, MANAGERS
+
+        self.manager = cm.ConnectionManager()
+        MANAGERS["test"] = self.manager
+        self.client = TestClient(app)
+
+    def test_latest_backfill(self):
+        for i in range(3):
+            asyncio.run(self.manager.broadcast_json({"type": "info", "text": f"msg {i}"}))
+
+        body = self.client.get("/ws/test/latest").json()
+
+        self.assertTrue(body["success"])
+        self.assertEqual(body["last"], 3)
+        self.assertEqual([m["text"] for m in body["data"]], ["msg 0", "msg 1", "msg 2"])
+
+        body = self.client.get("/ws/test/latest?since=2").json()
+        self.assertEqual([m["text"] for m in body["data"]], ["msg 2"])
+
+    def test_latest_unknown_channel(self):
+        self.assertEqual(self.client.get("/ws/nope/latest").status_code, 404)
+
+    def test_session_named_latest_reaches_its_label_route(self):
+        from starlette.routing import Match
+        from project.fast_server.main import app
+
+        for path in ("/imu/latest", "/latency/latest", "/gaps/latest"):
+            scope = {"type": "http", "method": "GET", "path": path}
+            route = next(r for r in app.routes if r.matches(scope)[0] == Match.FULL)
+            self.assertNotEqual(route.name, "latest_messages")
+
+    def test_dashboard_backfill_url_reaches_the_backfill_route(self):
+        source = Path(__file__).parents[1] / "web" / "src" / "components" / "MessageWB.jsx"
+        url = re.search(r"fetch\(`http://[^/]+(/[^?`]*)\?since=", source.read_text()).group(1)
+
+        for channel in ("camera", "imu", "robot", "misc"):
+            body = self.client.get(url.replace("${type}", channel) + "?since=0").json()
+
+            self.assertTrue(body["success"])
+            self.assertIsInstance(body["last"], int)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+data_generators.py
+Synthetic device rows shared by the broker test clients and the ingest benchmarks.
+Each generator returns list[str] CSV rows (no header, no newline).
+"""
+
+import time
+import numpy as np
+import pandas as pd
+
+
+def create_imu_csv(num_records: int = 1) -> list[str]:
+    """
+    Generates mock IMU CSV rows.
+    Returns list[str] instead of one giant CSV string for speed.
+    """
+    now = pd.Timestamp.now()
+    times_ms = np.arange(num_records) * 10 + int(now.timestamp() * 1000)
+
+    df = pd.DataFrame({
+        "time_ms": times_ms,
+        "ax": np.random.uniform(-2, 2, num_records),
+        "ay": np.random.uniform(-2, 2, num_records),
+        "az": np.random.uniform(-2, 2, num_records),
+        "gx": np.random.uniform(-180, 180, num_records),
+        "gy": np.random.uniform(-180, 180, num_records),
+        "gz": np.random.uniform(-180, 180, num_records),
+        "mx": np.random.uniform(-50, 50, num_records),
+        "my": np.random.uniform(-50, 50, num_records),
+        "mz": np.random.uniform(-50, 50, num_records),
+        "yaw": np.random.uniform(-180, 180, num_records),
+        "pitch": np.random.uniform(-90, 90, num_records),
+        "roll": np.random.uniform(-180, 180, num_records)
+    })
+
+    return df.to_csv(index=False, header=False).strip().splitlines()
+
+
+def create_camera_csv(num_records: int = 1) -> list[str]:
+    """
+    Generates mock Camera CSV rows.
+    Returns list[str].
+    """
+    now = pd.Timestamp.now()
+    recorded_at = np.arange(num_records) * 33 + int(now.timestamp() * 1000)
+
+    df = pd.DataFrame({
+        "recorded_at": recorded_at,
+        "frame_idx": np.arange(num_records),
+        "capture_time": recorded_at,
+        "marker_idx": np.random.randint(0, 10, num_records),
+        "rvecx": np.random.uniform(-3.14, 3.14, num_records),
+        "rvecy": np.random.uniform(-3.14, 3.14, num_records),
+        "rvecz": np.random.uniform(-3.14, 3.14, num_records),
+        "tvecx": np.random.uniform(-100, 100, num_records),
+        "tvecy": np.random.uniform(-100, 100, num_records),
+        "tvecz": np.random.uniform(0, 500, num_records)
+    })
+    return df.to_csv(index=False, header=False).strip().splitlines()
+
+
+def create_robot_data(num_records: int = 10) -> list[str]:
+    """
+    Robot telemetry rows (CSV strings) in the exact order expected by the current robot parser:
+
+    frame_id, ts, ts_string, joint1, joint2, joint3, joint4, joint5, joint6, x, y, z, w, p, r
+    """
+    ts_base = float(time.time())  # UNIX seconds as float
+
+    df = pd.DataFrame({
+        "frame_id": np.arange(1, num_records + 1, dtype=np.int64),
+        "ts_epoch": (ts_base + np.arange(num_records, dtype=np.float64)),
+        "ts_string": [str(ts_base + i) for i in range(num_records)],
+
+        "joint1": np.random.uniform(-180, 180, num_records),
+        "joint2": np.random.uniform(-180, 180, num_records),
+        "joint3": np.random.uniform(-180, 180, num_records),
+        "joint4": np.random.uniform(-180, 180, num_records),
+        "joint5": np.random.uniform(-180, 180, num_records),
+        "joint6": np.random.uniform(-180, 180, num_records),
+
+        "x": np.random.uniform(-1000, 1000, num_records),
+        "y": np.random.uniform(-1000, 1000, num_records),
+        "z": np.random.uniform(-1000, 1000, num_records),
+        "w": np.random.uniform(-180, 180, num_records),
+        "p": np.random.uniform(-180, 180, num_records),
+        "r": np.random.uniform(-180, 180, num_records),
+    })
+
+    cols = [
+        "frame_id", "ts_epoch", "ts_string",
+        "joint1", "joint2", "joint3", "joint4", "joint5", "joint6",
+        "x", "y", "z", "w", "p", "r"
+    ]
+
+    return df[cols].to_csv(index=False, header=False).strip().splitlines()
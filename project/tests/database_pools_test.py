@@ -0,0 +1,242 @@
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+
+from project.db import database
+from project.db.database import DatabaseSingleton
+
+
+class FakeConn:
+
+    def __init__(self, pool, gate=None):
+        self.pool = pool
+        self.gate = gate
+
+    async def fetch(self, query, *args):
+        self.pool.queries.append(query)
+        if self.gate is not None:
+            await self.gate.wait()
+        return [{"label": "run1"}]
+
+    async def fetchval(self, query, *args):
+        self.pool.queries.append(query)
+        return self.pool.oid if "pg_database" in query else 1
+
+
+class FakePool:
+
+    def __init__(self, name, gate=None):
+        self.name = name
+        self.gate = gate
+        self.queries = []
+        self.in_use = 0
+        self.oid = 100
+        self.on_connect = None
+
+    @asynccontextmanager
+    async def acquire(self):
+        self.in_use += 1
+        try:
+            conn = FakeConn(self, self.gate)
+            if self.on_connect is not None:
+                await self.on_connect(conn)
+            yield conn
+        finally:
+            self.in_use -= 1
+
+    def get_size(self):
+        return self.in_use
+
+    def get_idle_size(self):
+        return 0
+
+    def get_max_size(self):
+        return 10
+
+
+class PoolRoutingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.ingest, self.read, self.admin = FakePool("ingest"), FakePool("read"), FakePool("admin")
+        self.db = DatabaseSingleton(self.ingest, self.read, self.admin)
+
+    def test_reads_use_read_pool(self):
+        data = asyncio.run(self.db.retrieve_sessions())
+
+        self.assertEqual(data, [{"label": "run1"}])
+        self.assertEqual(len(self.read.queries), 1)
+        self.assertEqual(self.ingest.queries, [])
+
+    def test_session_lookups_use_admin_pool(self):
+        self.assertTrue(asyncio.run(self.db.existing_session("run1")))
+
+        self.assertEqual(len(self.admin.queries), 1)
+        self.assertEqual(self.read.queries, [])
+
+    def test_single_pool_fallback(self):
+        db = DatabaseSingleton(self.ingest)
+
+        asyncio.run(db.retrieve_sessions())
+        self.assertEqual(len(self.ingest.queries), 1)
+
+
+class ReadAdmissionTests(unittest.TestCase):
+
+    def test_reads_beyond_concurrency_wait(self):
+
+        async def run():
+            gate = asyncio.Event()
+            read = FakePool("read", gate)
+            db = DatabaseSingleton(FakePool("ingest"), read, FakePool("admin"), read_concurrency=2)
+
+            tasks = [asyncio.create_task(db.retrieve_sessions()) for _ in range(5)]
+            await asyncio.sleep(0.01)
+
+            # Only the admitted queries hold read connections
+            held = read.in_use
+            waiting = db._reads_waiting.value
+
+            gate.set()
+            await asyncio.gather(*tasks)
+            return held, waiting, read.in_use, db._reads_running.value
+
+        held, waiting, after, running = asyncio.run(run())
+
+        self.assertEqual(held, 2)
+        self.assertEqual(waiting, 3)
+        self.assertEqual(after, 0)
+        self.assertEqual(running, 0)
+
+
+class IngestGateTests(unittest.TestCase):
+
+    def test_pause_drains_then_holds_new_calls(self):
+
+        async def run():
+            gate = asyncio.Event()
+            read = FakePool("read", gate)
+            db = DatabaseSingleton(FakePool("ingest"), read, FakePool("admin"))
+            order = []
+
+            running = asyncio.create_task(db.retrieve_sessions())
+            await asyncio.sleep(0.01)
+
+            async def swap():
+                async with db.paused(timeout=1):
+                    order.append("swap")
+                    await asyncio.sleep(0.01)
+
+            swapping = asyncio.create_task(swap())
+            await asyncio.sleep(0.01)
+
+            # Arrives while the swap waits -- Must not run until the gate reopens
+            async def late():
+                await db.existing_session("run1")
+                order.append("late")
+
+            late_task = asyncio.create_task(late())
+            await asyncio.sleep(0.01)
+            order.append("released")
+            gate.set()
+
+            await asyncio.gather(running, swapping, late_task)
+            return order
+
+        self.assertEqual(asyncio.run(run()), ["released", "swap", "late"])
+
+    def test_nested_acquire_inside_gate_does_not_wait(self):
+
+        async def run():
+            db = DatabaseSingleton(FakePool("ingest"), FakePool("read"), FakePool("admin"))
+            entered = asyncio.Event()
+            proceed = asyncio.Event()
+
+            async def batch():
+                async with db.gate():
+                    entered.set()
+                    await proceed.wait()
+                    async with db.acquire() as conn:
+                        return await conn.fetchval("SELECT 1")
+
+            task = asyncio.create_task(batch())
+            await entered.wait()
+
+            async def swap():
+                async with db.paused(timeout=1):
+                    return task.done()
+
+            swapping = asyncio.create_task(swap())
+            await asyncio.sleep(0.01)
+            proceed.set()
+
+            return await task, await swapping
+
+        self.assertEqual(asyncio.run(run()), (1, True))
+
+    def test_drain_timeout_reopens_gate(self):
+
+        async def run():
+            gate = asyncio.Event()
+            db = DatabaseSingleton(FakePool("ingest"), FakePool("read", gate), FakePool("admin"))
+            stuck = asyncio.create_task(db.retrieve_sessions())
+            await asyncio.sleep(0.01)
+
+            try:
+                async with db.paused(timeout=0.01):
+                    pass
+            except Exception as e:
+                error = e
+
+            # Other pools keep working once the swap gives up
+            found = await db.existing_session("run1")
+            gate.set()
+            await stuck
+            return error, found
+
+        error, found = asyncio.run(run())
+
+        self.assertIn("still running", str(error))
+        self.assertTrue(found)
+
+
+
+class SwapDetectionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.ingest = FakePool("ingest")
+        self.db = DatabaseSingleton(self.ingest)
+        self.db.devices["main"] = 3
+        self.db.current_session_id = 7
+        asyncio.run(self.db.check_database(FakeConn(self.ingest)))
+
+    def test_same_database_keeps_cached_ids(self):
+        self.assertFalse(asyncio.run(self.db.check_database(FakeConn(self.ingest))))
+        self.assertEqual(self.db.devices, {"main": 3})
+
+    def test_restored_database_clears_cached_ids(self):
+        self.ingest.oid = 200
+
+        self.assertTrue(asyncio.run(self.db.check_database(FakeConn(self.ingest))))
+        self.assertEqual((self.db.devices, self.db.current_session_id, self.db.generation), ({}, None, 1))
+
+    def test_gated_call_fails_when_the_swap_is_found_under_it(self):
+
+        async def run():
+            async with self.db.gate():
+                # e.g. device id resolved, then the reconnect lands on the restored database
+                self.ingest.oid = 200
+                self.ingest.on_connect = self.db.check_database
+
+                async with self.db.acquire() as conn:
+                    return await conn.fetchval("SELECT 1")
+
+        with self.assertRaises(database.DatabaseSwapped):
+            asyncio.run(run())
+
+        # Its retry runs against the new database
+        self.ingest.on_connect = None
+        self.assertTrue(asyncio.run(self.db.existing_session("run1")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+
+from project.db import dedup
+from project.db.database import DatabaseSingleton
+
+COLUMNS = ("frame_id", "ts_epoch", "recorded_at", "ingested_at", "device_id", "session_id")
+
+
+def record(frame, device=1, session=7):
+    return (frame, 10.0, 10.0, 11.0, device, session)
+
+
+def robot(frame):
+    return {
+        "frame_id": frame, "ts_epoch": 10.0 + frame, "recorded_at": 10.0,
+        **{k: 0.0 for k in ("joint1", "joint2", "joint3", "joint4", "joint5", "joint6", "x", "y", "z", "w", "p", "r")},
+    }
+
+
+class MergeConn:
+
+    # `stored` holds keys already in the table -- The merge returns only the staged rows it did not find there
+    def __init__(self, stored=()):
+        self.stored = set(stored)
+        self.staged = []
+        self.executed = []
+
+    async def execute(self, query, *args):
+        self.executed.append(" ".join(query.split()))
+        return "OK"
+
+    async def executemany(self, query, records):
+        self.executed.append(query.split()[2])
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.table = table
+        self.staged = list(records)
+
+    async def fetch(self, query, *args):
+        self.executed.append(" ".join(query.split()))
+
+        inserted = []
+        for r in self.staged:
+            key = (r[-2], r[-1], r[0], r[1])
+            if key not in self.stored:
+                self.stored.add(key)
+                inserted.append(key)
+
+        return inserted
+
+    async def fetchrow(self, query, *args):
+        return {"id": 7, "ended_at": None}
+
+    async def fetchval(self, query, *args):
+        return 1
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+class Pool:
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+class FrameWindowTests(unittest.TestCase):
+
+    def test_oldest_frames_are_forgotten(self):
+        window = dedup.FrameWindow(size=3)
+        for frame in (1, 2, 3, 3, 4):
+            window.add(frame)
+
+        self.assertEqual([f in window for f in (1, 2, 3, 4)], [False, True, True, True])
+        self.assertEqual(len(window.seen), 3)
+
+
+class DeduplicatorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dedup = dedup.Deduplicator("test", "robot", COLUMNS, size=100)
+        self.drops = dedup.ROWS_DROPPED.labels("test", "duplicate")
+        self.before = self.drops.value
+
+    def test_window_drops_recent_and_repeated_frames(self):
+        self.dedup.commit([record(1), record(2)])
+
+        fresh = self.dedup.filter([record(2), record(3), record(3), record(2, device=2)])
+
+        self.assertEqual(fresh, [record(3), record(2, device=2)])
+        self.assertEqual(self.drops.value - self.before, 2)
+
+    def test_failed_batch_is_not_filtered_from_its_retry(self):
+        batch = [record(1), record(2)]
+
+        self.assertEqual(self.dedup.filter(batch), batch)
+        self.assertEqual(self.dedup.filter(batch), batch)  # never committed
+
+    def test_new_session_starts_a_new_window(self):
+        self.dedup.commit([record(1)])
+        self.dedup.filter([record(1)])
+
+        self.assertEqual(self.dedup.filter([record(1, session=8)]), [record(1, session=8)])
+
+    def test_missing_frame_ids_pass(self):
+        self.dedup.commit([record(None)])
+
+        self.assertEqual(self.dedup.filter([record(None), record(None)]), [record(None), record(None)])
+
+    def test_merge_returns_only_inserted_rows(self):
+        conn = MergeConn(stored={(1, 7, 2, 10.0)})
+
+        kept = asyncio.run(self.dedup.insert(conn, [record(1), record(2), record(3)]))
+
+        self.assertEqual(kept, [record(1), record(3)])
+        self.assertEqual(conn.table, "stage_robot")
+        self.assertIn("ON CONFLICT DO NOTHING RETURNING device_id, session_id, frame_id, ts_epoch", conn.executed[-1])
+
+    def test_camera_frames_are_keyed_with_the_marker(self):
+        columns = ("frame_idx", "capture_time", "marker_idx", "device_id", "session_id")
+        camera = dedup.Deduplicator("test", "image_detection", columns)
+
+        camera.commit([(5, 1.5, 0, 1, 7)])
+
+        self.assertEqual(camera.filter([(5, 1.5, 0, 1, 7), (5, 1.5, 1, 1, 7)]), [(5, 1.5, 1, 1, 7)])
+
+    def test_restarted_counter_is_not_a_replay(self):
+        self.dedup.commit([record(1)])
+
+        rebooted = (1, 99.0, 10.0, 11.0, 1, 7)
+        self.assertEqual(self.dedup.filter([rebooted]), [rebooted])
+
+
+class BatchTests(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = MergeConn()
+        self.db = DatabaseSingleton(Pool(self.conn))
+        self.db.devices["main"] = 1
+
+    def test_replayed_batch_never_reaches_the_database(self):
+        first = asyncio.run(self.db.insert_robot_batch([robot(i) for i in range(5)]))
+        self.conn.executed.clear()
+
+        replay = asyncio.run(self.db.insert_robot_batch([robot(i) for i in range(5)]))
+
+        self.assertEqual((first, replay), (5, 0))
+        self.assertEqual(self.conn.executed, [])
+
+    def test_duplicates_past_the_window_are_merged_away(self):
+        asyncio.run(self.db.insert_robot_batch([robot(i) for i in range(3)]))
+        self.db.dedup["robot"].clear()  # e.g. a restart -- Only the unique index remembers
+
+        inserted = asyncio.run(self.db.insert_robot_batch([robot(i) for i in range(2, 6)]))
+
+        self.assertEqual(inserted, 3)
+        self.assertEqual(self.conn.staged[0][0], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
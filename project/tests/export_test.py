@@ -0,0 +1,56 @@
+import gzip
+import unittest
+from unittest.mock import MagicMock, AsyncMock
+
+from fastapi.testclient import TestClient
+from project.fast_server.main import app
+
+
+class ExportTests(unittest.TestCase):
+
+    def setUp(self):
+        app.router.on_startup.clear()
+        app.router.on_shutdown.clear()
+
+        self.client = TestClient(app)
+
+        async def fake_export(stream, label):
+            yield b"id,frame_id\n"
+            yield b"1,10\n"
+            yield b"2,11\n"
+
+        fake_db = MagicMock()
+        fake_db.existing_session = AsyncMock(return_value=True)
+        fake_db.export_csv = fake_export
+        app.state.db = fake_db
+
+    def test_export_csv(self):
+        resp = self.client.get("/export/imu/run1.csv")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.headers["content-type"].startswith("text/csv"))
+        self.assertIn("imu_run1.csv", resp.headers["content-disposition"])
+        self.assertEqual(resp.content, b"id,frame_id\n1,10\n2,11\n")
+
+    def test_export_csv_gzip(self):
+        resp = self.client.get("/export/imu/run1.csv?gzip=true")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers["content-type"], "application/gzip")
+        self.assertEqual(gzip.decompress(resp.content), b"id,frame_id\n1,10\n2,11\n")
+
+    def test_export_unknown_stream(self):
+        resp = self.client.get("/export/nope/run1.csv")
+
+        self.assertEqual(resp.status_code, 404)
+
+    def test_export_unknown_session(self):
+        app.state.db.existing_session = AsyncMock(return_value=False)
+
+        resp = self.client.get("/export/imu/missing.csv")
+
+        self.assertEqual(resp.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from unittest.mock import MagicMock, AsyncMock
+
+from fastapi.testclient import TestClient
+
+from project.fast_server import latency
+from project.fast_server.main import app
+
+
+class LatencyTests(unittest.TestCase):
+
+    def test_to_seconds(self):
+        self.assertEqual(latency.to_seconds(1700000000.5), 1700000000.5)
+        self.assertEqual(latency.to_seconds(1700000000500), 1700000000.5)
+
+    def test_record_batch(self):
+        batch = [
+            {"device_label": "lat-a", "capture_time": 100.0, "arrived_at": 100.01, "enqueued_at": 100.02},
+            {"device_label": "lat-a", "capture_time": 100000, "arrived_at": 100.05, "enqueued_at": 100.06},
+            {"device_label": "lat-b", "capture_time": 100.0, "arrived_at": 100.2, "enqueued_at": 100.2},
+        ]
+
+        latency.record_batch("test", batch, flush_started=100.5, committed=100.6)
+
+        summary = latency.latency_summary()["test"]
+
+        self.assertEqual(summary["lat-a"]["capture_to_arrival"]["count"], 2)
+        self.assertEqual(summary["lat-a"]["enqueue_to_flush"]["count"], 2)
+        self.assertEqual(summary["lat-a"]["flush_to_commit"]["count"], 1)
+        self.assertAlmostEqual(summary["lat-b"]["capture_to_arrival"]["mean"], 0.2)
+        self.assertAlmostEqual(summary["lat-b"]["flush_to_commit"]["mean"], 0.1)
+
+
+class LatencyEndpointTests(unittest.TestCase):
+
+    def setUp(self):
+        app.router.on_startup.clear()
+        self.client = TestClient(app)
+
+    def test_latency_endpoint(self):
+        body = self.client.get("/latency").json()
+
+        self.assertTrue(body["success"])
+        self.assertEqual(body["stages"], list(latency.STAGES))
+
+    def test_session_report(self):
+        fake_db = MagicMock()
+        fake_db.retrieve_latency_report = AsyncMock(return_value={"imu": {}})
+        app.state.db = fake_db
+
+        body = self.client.get("/latency/run1").json()
+
+        self.assertEqual(body, {"data": {"imu": {}}, "success": True})
+        fake_db.retrieve_latency_report.assert_awaited_once_with("run1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from project.fast_server.live import LiveBus, snap_rate
+
+
+class FakeWebSocket:
+    pass
+
+
+class FakeManager:
+
+    def __init__(self):
+        self.active = []
+        self.sent = []
+
+    def is_connected(self, ws):
+        return ws in self.active
+
+    async def send_text(self, ws, msg):
+        self.sent.append((ws, msg))
+
+
+class LiveBusTests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.manager = FakeManager()
+        self.bus = LiveBus("imu", self.manager)
+
+    def add_client(self, rate, devices=None):
+        ws = FakeWebSocket()
+        self.manager.active.append(ws)
+        self.bus.subscribe(ws, rate, devices)
+        return ws
+
+    def test_snap_rate(self):
+        self.assertEqual(snap_rate(0.1), 1)
+        self.assertEqual(snap_rate(12), 10)
+        self.assertEqual(snap_rate(1000), 100)
+
+    async def test_no_subscribers_sends_nothing(self):
+        await self.bus.publish({"device_label": "a", "accel_x": 1.0}, ts=0.0)
+
+        self.assertEqual(self.manager.sent, [])
+
+    async def test_decimates_per_tier(self):
+        ws = self.add_client(10)
+
+        # 100 Hz for one second -> 10 Hz out
+        for i in range(100):
+            await self.bus.publish({"device_label": "a", "frame_id": i}, ts=i * 0.01)
+
+        self.assertEqual(len(self.manager.sent), 10)
+        self.assertTrue(all(sent_ws is ws for sent_ws, _ in self.manager.sent))
+
+    async def test_device_filter(self):
+        ws_a = self.add_client(10, ["a"])
+        ws_all = self.add_client(10)
+
+        await self.bus.publish({"device_label": "a"}, ts=0.0)
+        await self.bus.publish({"device_label": "b"}, ts=0.0)
+
+        targets = [ws for ws, _ in self.manager.sent]
+        self.assertEqual(targets.count(ws_a), 1)
+        self.assertEqual(targets.count(ws_all), 2)
+
+    async def test_encoded_once_for_all_clients(self):
+        for _ in range(20):
+            self.add_client(5)
+
+        await self.bus.publish({"device_label": "a", "accel_x": 0.5}, ts=0.0)
+
+        messages = [msg for _, msg in self.manager.sent]
+        self.assertEqual(len(messages), 20)
+        self.assertTrue(all(msg is messages[0] for msg in messages))
+
+    async def test_dead_socket_unsubscribed(self):
+        ws = self.add_client(10)
+        self.manager.active.remove(ws)
+
+        await self.bus.publish({"device_label": "a"}, ts=0.0)
+
+        self.assertEqual(self.bus.subscriber_count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
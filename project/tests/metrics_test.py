@@ -0,0 +1,121 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from project.fast_server.metrics import MetricsRegistry, serve_metrics
+
+
+class MetricsRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_and_gauge(self):
+        rows = self.registry.counter("rows_total", "Rows", ["stream"])
+        depth = self.registry.gauge("depth", "Depth", ["stream"])
+
+        rows.labels("imu").inc(5)
+        rows.labels("imu").inc()
+        depth.labels("imu").set_function(lambda: 7)
+
+        text = self.registry.render()
+
+        self.assertIn("# TYPE rows_total counter", text)
+        self.assertIn('rows_total{stream="imu"} 6', text)
+        self.assertIn('depth{stream="imu"} 7', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        hist = self.registry.histogram("flush_seconds", "Flush", buckets=(0.1, 1.0))
+
+        for v in (0.05, 0.1, 0.5, 3.0):
+            hist.observe(v)
+
+        text = self.registry.render()
+
+        self.assertIn('flush_seconds_bucket{le="0.1"} 2', text)
+        self.assertIn('flush_seconds_bucket{le="1"} 3', text)
+        self.assertIn('flush_seconds_bucket{le="+Inf"} 4', text)
+        self.assertIn("flush_seconds_count 4", text)
+
+    def test_quantile_estimate(self):
+        hist = self.registry.histogram("lat", "Latency", buckets=(1, 2, 3, 4))
+        child = hist.labels()
+
+        for v in (0.5, 1.5, 2.5, 3.5):
+            child.observe(v)
+
+        self.assertAlmostEqual(child.quantile(0.5), 2.0)
+
+    def test_wrong_label_count(self):
+        rows = self.registry.counter("c", "C", ["a", "b"])
+
+        with self.assertRaises(ValueError):
+            rows.labels("only-one")
+
+
+class MetricsEndpointTests(unittest.TestCase):
+
+    def test_fastapi_metrics(self):
+        from project.fast_server.main import app
+
+        app.router.on_startup.clear()
+        resp = TestClient(app).get("/metrics")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.headers["content-type"].startswith("text/plain"))
+        self.assertIn('ingest_queue_capacity{stream="imu"}', resp.text)
+        self.assertIn("event_loop_lag_seconds", resp.text)
+
+    def test_standalone_server(self):
+
+        async def scrape():
+            registry = MetricsRegistry()
+            registry.counter("hits_total", "Hits").inc(2)
+
+            server = await serve_metrics("127.0.0.1", 0, registry)
+            port = server.sockets[0].getsockname()[1]
+
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /metrics HTTP/1.1\r\nHost: x\r\n\r\n")
+            await writer.drain()
+            data = await reader.read()
+
+            server.close()
+            await server.wait_closed()
+            return data.decode()
+
+        response = asyncio.run(scrape())
+
+        self.assertTrue(response.startswith("HTTP/1.1 200 OK"))
+        self.assertIn("hits_total 2", response)
+
+    def test_failing_route_answers_bad_request(self):
+
+        async def broken(query):
+            return "200 OK", "text/plain", str(int(query["limit"][0])).encode()
+
+        async def request():
+            server = await serve_metrics("127.0.0.1", 0, MetricsRegistry(), routes={"/admin/broken": broken})
+            port = server.sockets[0].getsockname()[1]
+
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /admin/broken?limit=abc HTTP/1.1\r\nHost: x\r\n\r\n")
+            await writer.drain()
+            data = await reader.read()
+
+            server.close()
+            await server.wait_closed()
+            return data.decode()
+
+        with patch("project.fast_server.metrics.loggers.log_system_logger") as mock_log:
+            response = asyncio.run(request())
+
+        self.assertTrue(response.startswith("HTTP/1.1 400 Bad Request"))
+        self.assertIn("invalid literal for int()", response)
+        mock_log.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
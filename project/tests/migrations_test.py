@@ -0,0 +1,274 @@
+import asyncio
+import re
+import unittest
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+
+from project.db import migrations
+
+
+class SchemaConn:
+
+    # indexes: table -> [{"name", "valid", "columns"}], populated / partitioned: sets of tables
+    def __init__(self, indexes=None, populated=(), partitioned=None, applied=(), missing=(), partition_key="session_id"):
+        self.indexes = indexes or {}
+        self.partition_key = partition_key
+        self.populated = set(populated)
+        self.partitioned = partitioned or {}
+        self.applied = list(applied)
+        self.missing = set(missing)
+        self.executed = []
+        self.in_transaction = []
+
+    async def execute(self, query, *args):
+        sql = " ".join(query.split())
+        self.executed.append(sql)
+
+        m = re.match(r"CREATE (UNIQUE )?INDEX (?:CONCURRENTLY )?IF NOT EXISTS (\w+) ON (\w+) \((.*)\)", sql)
+        if m:
+            unique, name, table, cols = m.groups()
+            self.indexes.setdefault(table, []).append(
+                {"name": name, "valid": True, "unique": bool(unique), "columns": [c.strip() for c in cols.split(",")]}
+            )
+
+        m = re.match(r"DROP INDEX CONCURRENTLY IF EXISTS (\w+)", sql)
+        if m:
+            for table, found in self.indexes.items():
+                self.indexes[table] = [i for i in found if i["name"] != m.group(1)]
+
+        if sql.startswith("INSERT INTO schema_migrations"):
+            self.applied.append(args[0])
+
+    async def fetch(self, query, *args):
+        if "FROM pg_index" in query:
+            return self.indexes.get(args[0], [])
+        if "pg_inherits" in query:
+            return [{"relname": p} for p in self.partitioned.get(args[0], [])]
+        if "FROM schema_migrations" in query:
+            return [{"version": v, "name": "", "applied_at": 0.0} for v in self.applied]
+        return []
+
+    async def fetchval(self, query, *args):
+        if "to_regclass($1) IS NOT NULL" in query:
+            return args[0] not in self.missing
+        if "pg_partitioned_table" in query:
+            return args[0] in self.partitioned
+        if "pg_get_partkeydef" in query:
+            return f"RANGE ({self.partition_key})" if args[0] in self.partitioned else None
+        if "SELECT EXISTS (SELECT 1 FROM" in query:
+            return query.split("FROM ")[1].split(")")[0] in self.populated
+        return None
+
+    @asynccontextmanager
+    async def transaction(self):
+        self.in_transaction.append(True)
+        try:
+            yield
+        finally:
+            self.in_transaction.pop()
+
+
+class EnsureIndexTests(unittest.TestCase):
+
+    def test_equivalent_index_is_kept(self):
+        conn = SchemaConn(indexes={"session": [{"name": "session_label_key", "valid": True, "columns": ["label"]}]})
+
+        self.assertIsNone(asyncio.run(migrations.ensure_index(conn, "session", "session_label_idx", ("label",))))
+        self.assertFalse(any(sql.startswith("CREATE") for sql in conn.executed))
+
+    def test_missing_table_is_left_for_later(self):
+        conn = SchemaConn(missing={"imu_packed"})
+
+        self.assertIsNone(asyncio.run(migrations.ensure_index(conn, "imu_packed", "x_idx", ("session_id",))))
+        self.assertEqual(conn.executed, [])
+
+    def test_populated_table_builds_concurrently(self):
+        conn = SchemaConn(populated={"robot"})
+
+        asyncio.run(migrations.ensure_index(conn, "robot", "robot_session_ts_idx", ("session_id", "ts_epoch")))
+
+        self.assertIn("CREATE INDEX CONCURRENTLY IF NOT EXISTS robot_session_ts_idx ON robot (session_id, ts_epoch)",
+                      conn.executed)
+
+    def test_invalid_index_is_rebuilt(self):
+        conn = SchemaConn(indexes={"robot": [{"name": "old_idx", "valid": False, "columns": ["session_id", "ts_epoch"]}]})
+
+        created = asyncio.run(migrations.ensure_index(conn, "robot", "robot_session_ts_idx", ("session_id", "ts_epoch")))
+
+        self.assertEqual(created, "robot_session_ts_idx")
+        self.assertIn("DROP INDEX CONCURRENTLY IF EXISTS old_idx", conn.executed)
+
+    def test_partitioned_parent_indexes_each_partition_first(self):
+        conn = SchemaConn(partitioned={"robot": ["robot_legacy", "robot_s4"]}, populated={"robot_legacy"})
+
+        asyncio.run(migrations.ensure_index(conn, "robot", "robot_session_ts_idx", ("session_id", "ts_epoch")))
+        creates = [sql for sql in conn.executed if sql.startswith("CREATE INDEX")]
+
+        self.assertEqual(creates, [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS robot_legacy_session_id_ts_epoch_idx ON robot_legacy (session_id, ts_epoch)",
+            "CREATE INDEX IF NOT EXISTS robot_s4_session_id_ts_epoch_idx ON robot_s4 (session_id, ts_epoch)",
+            "CREATE INDEX IF NOT EXISTS robot_session_ts_idx ON robot (session_id, ts_epoch)",
+        ])
+
+
+    def test_unique_index_needs_an_exact_unique_match(self):
+        conn = SchemaConn(indexes={"robot": [
+            {"name": "wide_idx", "valid": True, "unique": True, "columns": ["device_id", "session_id", "frame_id", "ts_epoch", "x"]},
+            {"name": "plain_idx", "valid": True, "unique": False, "columns": ["device_id", "session_id", "frame_id", "ts_epoch"]},
+        ]})
+
+        created = asyncio.run(migrations.ensure_index(conn, "robot", "robot_dedup_idx", ("device_id", "session_id", "frame_id", "ts_epoch"), unique=True))
+
+        self.assertEqual(created, "robot_dedup_idx")
+        self.assertIn("CREATE UNIQUE INDEX IF NOT EXISTS robot_dedup_idx ON robot (device_id, session_id, frame_id, ts_epoch)", conn.executed)
+
+    def test_day_partitions_hold_the_unique_index_themselves(self):
+        conn = SchemaConn(partitioned={"robot": ["robot_d20260101"]}, partition_key="ingested_at")
+
+        asyncio.run(migrations.ensure_index(conn, "robot", "robot_dedup_idx", ("device_id", "session_id", "frame_id", "ts_epoch"), unique=True))
+        creates = [sql for sql in conn.executed if sql.startswith("CREATE")]
+
+        self.assertEqual(creates, [
+            "CREATE UNIQUE INDEX IF NOT EXISTS robot_d20260101_device_id_session_id_frame_id_ts_epoch_idx "
+            "ON robot_d20260101 (device_id, session_id, frame_id, ts_epoch)",
+        ])
+
+
+class DuplicateViolation(Exception):
+    sqlstate = "23505"
+
+
+class DedupConn(SchemaConn):
+
+    # `stored` -- Rows each DELETE / UPDATE statement reports, by table, in statement order
+    def __init__(self, sessions=(), stored=None, **kwargs):
+        super().__init__(**kwargs)
+        self.sessions = list(sessions)
+        self.stored = {table: list(counts) for table, counts in (stored or {}).items()}
+
+    async def execute(self, query, *args):
+        sql = " ".join(query.split())
+
+        if sql.startswith("CREATE UNIQUE INDEX") and sql.split(" ON ")[1].split()[0] in self.populated:
+            self.executed.append(sql)
+            raise DuplicateViolation("could not create unique index")
+
+        await super().execute(query, *args)
+
+        for verb in ("DELETE FROM ", "UPDATE "):
+            if sql.startswith(verb):
+                counts = self.stored.get(sql[len(verb):].split()[0], [])
+                return f"{verb.split()[0]} {counts.pop(0) if counts else 0}"
+
+        return "OK"
+
+    async def fetch(self, query, *args):
+        if "FROM session" in query:
+            return [{"id": s} for s in self.sessions]
+        return await super().fetch(query, *args)
+
+
+class DeduplicateTests(unittest.TestCase):
+
+    def test_tables_with_duplicates_are_skipped_not_rewritten(self):
+        conn = DedupConn(populated={"robot"})
+
+        with patch("project.db.migrations.loggers.log_system_logger") as mock_log:
+            created = asyncio.run(migrations.ensure_unique_indexes(conn))
+
+        self.assertEqual(created, ["imu_measurement_dedup_idx", "image_detection_dedup_idx"])
+        self.assertIn("DROP INDEX CONCURRENTLY IF EXISTS robot_dedup_idx", conn.executed)
+        self.assertFalse(any(sql.startswith(("DELETE", "UPDATE")) for sql in conn.executed))
+        self.assertIn("--deduplicate", mock_log.call_args.args[0])
+
+    def test_rewrite_runs_per_session_and_reports_counts(self):
+        conn = DedupConn(sessions=[1, 2], stored={"imu_measurement": [5, 0, 3, 1], "robot": [0, 2]})
+
+        with patch("project.db.migrations.loggers.log_system_logger") as mock_log:
+            result = asyncio.run(migrations.deduplicate(conn))
+
+        self.assertEqual(result["frame_ids_cleared"], 5)
+        self.assertEqual(result["deleted"], {"imu_measurement": 4, "image_detection": 0, "robot": 2})
+
+        deletes = [sql for sql in conn.executed if sql.startswith("DELETE FROM robot")]
+        self.assertEqual(len(deletes), 2)
+        self.assertIn("WHERE a.session_id = $1 AND b.session_id = $1 AND a.device_id = b.device_id", deletes[0])
+
+        logged = " ".join(call.args[0] for call in mock_log.call_args_list)
+        self.assertIn("robot duplicate rows deleted: 2", logged)
+
+    def test_startup_migration_only_builds_indexes(self):
+        migration = next(m for m in migrations.MIGRATIONS if m.version == 6)
+
+        self.assertIs(migration.apply, migrations.ensure_unique_indexes)
+
+
+class MigrateTests(unittest.TestCase):
+
+    def test_applies_pending_in_order_once(self):
+        ran = []
+
+        async def step(conn):
+            ran.append(("callable", bool(conn.in_transaction)))
+
+        steps = [
+            migrations.Migration(1, "one", "SELECT 1"),
+            migrations.Migration(2, "two", step, transactional=False),
+            migrations.Migration(3, "three", "SELECT 3"),
+        ]
+        conn = SchemaConn(applied=[1])
+
+        self.assertEqual(asyncio.run(migrations.migrate(conn, steps)), [2, 3])
+        self.assertEqual(ran, [("callable", False)])
+        self.assertEqual(conn.applied, [1, 2, 3])
+        self.assertEqual(asyncio.run(migrations.migrate(conn, steps)), [])
+
+        # The advisory lock is released even when nothing ran
+        self.assertTrue(conn.executed[-1].startswith("SELECT pg_advisory_unlock"))
+
+    def test_failure_names_the_migration(self):
+
+        async def broken(conn):
+            raise RuntimeError("boom")
+
+        conn = SchemaConn()
+        with self.assertRaises(migrations.MigrationError) as ctx:
+            asyncio.run(migrations.migrate(conn, [migrations.Migration(1, "broken", broken)]))
+
+        self.assertIn("Migration 1 (broken) failed: boom", ctx.exception.message)
+        self.assertEqual(conn.applied, [])
+        self.assertTrue(conn.executed[-1].startswith("SELECT pg_advisory_unlock"))
+
+    def test_versions_must_ascend(self):
+        steps = [migrations.Migration(2, "b", "SELECT 1"), migrations.Migration(1, "a", "SELECT 1")]
+
+        with self.assertRaises(migrations.MigrationError):
+            asyncio.run(migrations.migrate(SchemaConn(), steps))
+
+
+class PlanCheckTests(unittest.TestCase):
+
+    def plan(self, *scans):
+        return {"Node Type": "Append", "Plans": [{"Node Type": n, "Relation Name": r} for n, r in scans]}
+
+    def test_seq_scans_are_reported(self):
+        plan = self.plan(("Index Scan", "robot_legacy"), ("Seq Scan", "robot"))
+
+        self.assertEqual(migrations.bad_scans(plan), ["robot"])
+
+    def test_single_session_partitions_may_be_read_whole(self):
+        plan = self.plan(("Seq Scan", "robot_s12"), ("Bitmap Heap Scan", "robot_legacy"))
+
+        self.assertEqual(migrations.bad_scans(plan), [])
+
+    def test_assert_plans(self):
+        migrations.assert_plans({"retrieve_imu": [], "retrieve_robot": []})
+
+        with self.assertRaises(migrations.MigrationError) as ctx:
+            migrations.assert_plans({"retrieve_imu": ["imu_measurement"], "retrieve_robot": []})
+
+        self.assertEqual(ctx.exception.data, {"retrieve_imu": ["imu_measurement"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
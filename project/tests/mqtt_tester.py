@@ -6,10 +6,9 @@ IMPROVED: Standardized return values and better error tracking
 """
 
 import time
-import numpy as np
-import pandas as pd
 from package.client import Client
 from logging_config import logger, colorize
+from data_generators import create_imu_csv, create_camera_csv
 
 
 # -----------------------------
@@ -19,59 +18,6 @@ BROKER_IP = "192.168.1.76"
 BROKER_PORT = 1883
 
 
-# -----------------------------
-# DATA GENERATION HELPERS
-# -----------------------------
-def create_imu_csv(num_records: int = 1) -> list[str]:
-    """
-    Generates mock IMU CSV rows.
-    Returns list[str] instead of one giant CSV string for speed.
-    """
-    now = pd.Timestamp.now()
-    times_ms = np.arange(num_records) * 10 + int(now.timestamp() * 1000)
-
-    df = pd.DataFrame({
-        "time_ms": times_ms,
-        "ax": np.random.uniform(-2, 2, num_records),
-        "ay": np.random.uniform(-2, 2, num_records),
-        "az": np.random.uniform(-2, 2, num_records),
-        "gx": np.random.uniform(-180, 180, num_records),
-        "gy": np.random.uniform(-180, 180, num_records),
-        "gz": np.random.uniform(-180, 180, num_records),
-        "mx": np.random.uniform(-50, 50, num_records),
-        "my": np.random.uniform(-50, 50, num_records),
-        "mz": np.random.uniform(-50, 50, num_records),
-        "yaw": np.random.uniform(-180, 180, num_records),
-        "pitch": np.random.uniform(-90, 90, num_records),
-        "roll": np.random.uniform(-180, 180, num_records)
-    })
-
-    return df.to_csv(index=False, header=False).strip().splitlines()
-
-
-def create_camera_csv(num_records: int = 1) -> list[str]:
-    """
-    Generates mock Camera CSV rows.
-    Returns list[str].
-    """
-    now = pd.Timestamp.now()
-    recorded_at = np.arange(num_records) * 33 + int(now.timestamp() * 1000)
-
-    df = pd.DataFrame({
-        "recorded_at": recorded_at,
-        "frame_idx": np.arange(num_records),
-        "capture_time": recorded_at,
-        "marker_idx": np.random.randint(0, 10, num_records),
-        "rvecx": np.random.uniform(-3.14, 3.14, num_records),
-        "rvecy": np.random.uniform(-3.14, 3.14, num_records),
-        "rvecz": np.random.uniform(-3.14, 3.14, num_records),
-        "tvecx": np.random.uniform(-100, 100, num_records),
-        "tvecy": np.random.uniform(-100, 100, num_records),
-        "tvecz": np.random.uniform(0, 500, num_records)
-    })
-    return df.to_csv(index=False, header=False).strip().splitlines()
-
-
 # -----------------------------
 # FIXED-SCHEDULE SENDER
 # -----------------------------
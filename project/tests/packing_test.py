@@ -0,0 +1,112 @@
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+
+from project.db import packing
+from project.db.database import DatabaseSingleton, session_queries
+
+
+def record(frame, capture, device=1, session=7, value=0.5):
+    return (frame, capture, capture + 0.002, 100.0, device, session, *([value] * len(packing.IMU_CHANNELS)))
+
+
+class PackTests(unittest.TestCase):
+
+    def test_groups_by_device_and_chunk(self):
+        records = [record(0, 10.98), record(0, 10.98, device=2), record(1, 10.99), record(2, 11.00)]
+
+        packed = packing.pack_imu(records, chunk_seconds=1.0)
+
+        self.assertEqual([(p[0], p[2], p[3]) for p in packed], [(1, 10.0, 2), (2, 10.0, 1), (1, 11.0, 1)])
+        self.assertEqual(packed[0][5], [0, 1])  # frame_id, in arrival order
+        self.assertEqual(packed[0][6], [10.98, 10.99])  # capture_time
+        self.assertEqual(len(packed[0]), 5 + len(packing.PACKED_ARRAYS))
+
+    def test_millisecond_clocks_chunk_in_seconds(self):
+        packed = packing.pack_imu([record(0, 1_700_000_000_500.0), record(1, 1_700_000_000_900.0)])
+
+        self.assertEqual(len(packed), 1)
+        self.assertEqual(packed[0][2], 1_700_000_000.0)
+
+    def test_insert_matches_packed_tuple(self):
+        placeholders = packing.IMU_PACKED_INSERT.count("$")
+
+        self.assertEqual(placeholders, 5 + len(packing.PACKED_ARRAYS))
+
+
+class StorageModeTests(unittest.TestCase):
+
+    class Conn:
+        def __init__(self):
+            self.calls = []
+            self.staged = []
+
+        async def executemany(self, query, records):
+            self.calls.append((query.split()[2], len(records)))
+
+        async def execute(self, query, *args):
+            return "OK"
+
+        async def copy_records_to_table(self, table, records, columns):
+            self.staged = records
+
+        # Staged merge -- Every row is new
+        async def fetch(self, query, *args):
+            self.calls.append((query.split()[2], len(self.staged)))
+            return [(r[4], r[5], r[0], r[1]) for r in self.staged]
+
+        async def fetchrow(self, query, *args):
+            return {"id": 7, "ended_at": None}
+
+        async def fetchval(self, query, *args):
+            return 1  # device already linked to the session
+
+        @asynccontextmanager
+        async def transaction(self):
+            yield
+
+    class Pool:
+        def __init__(self, conn):
+            self.conn = conn
+
+        @asynccontextmanager
+        async def acquire(self):
+            yield self.conn
+
+    def insert(self, mode):
+        conn = self.Conn()
+        db = DatabaseSingleton(self.Pool(conn), imu_storage=mode)
+        db.devices["imu-a"] = 1
+
+        batch = [{
+            "device_label": "imu-a", "frame_id": i, "capture_time": 10 + i * 0.01, "recorded_at": 10.0,
+            **{c: 0.1 for c in packing.IMU_CHANNELS},
+        } for i in range(5)]
+
+        asyncio.run(db.insert_imu_batch(batch))
+        return [call for call in conn.calls if call[0].startswith("imu_")]
+
+    def test_packed_writes_one_row_per_chunk(self):
+        self.assertEqual(self.insert("packed"), [("imu_packed", 1)])
+
+    def test_both_writes_both_layouts(self):
+        self.assertEqual(dict(self.insert("both")), {"imu_measurement": 5, "imu_packed": 1})
+
+    def test_rows_is_unchanged(self):
+        self.assertEqual(self.insert("rows"), [("imu_measurement", 5)])
+
+    def test_packed_reads_go_through_the_view(self):
+        _, query = session_queries("packed")["retrieve_imu"]
+
+        self.assertIn("imu_packed_samples", query)
+        self.assertIn("FROM imu_measurement", query)
+        self.assertIn("{where}", query)
+        self.assertNotIn("imu_packed_samples", session_queries("rows")["retrieve_imu"][1])
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            DatabaseSingleton(self.Pool(self.Conn()), imu_storage="columnar")
+
+
+if __name__ == "__main__":
+    unittest.main()
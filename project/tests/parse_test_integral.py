@@ -55,8 +55,9 @@ class ParserIntegralTests(unittest.IsolatedAsyncioTestCase):
 
         mock_logger.error.assert_called()
 
-        error_texts = [call.args[1] for call in mock_broadcast.call_args_list]
-        self.assertTrue(any("IMU parse error" in msg for msg in error_texts))
+        # Parse errors are aggregated into the telemetry frame instead of broadcast one by one
+        mock_broadcast.assert_not_called()
+        self.assertTrue(m.telemetry.streams["imu"].error_types)
 
     async def test_camera_success(self):
         topic = "camera/device123"
@@ -94,8 +95,9 @@ class ParserIntegralTests(unittest.IsolatedAsyncioTestCase):
 
         mock_logger.error.assert_called()
 
-        error_texts = [call.args[1] for call in mock_broadcast.call_args_list]
-        self.assertTrue(any("Camera parse error" in msg for msg in error_texts))
+        # Parse errors are aggregated into the telemetry frame instead of broadcast one by one
+        mock_broadcast.assert_not_called()
+        self.assertTrue(m.telemetry.streams["camera"].error_types)
 
 
 if __name__ == "__main__":
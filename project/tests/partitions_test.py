@@ -0,0 +1,206 @@
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+from project.db import partitions
+from project.db.database import DatabaseSingleton
+
+
+class RecordingConn:
+
+    def __init__(self, values=None, rows=None):
+        self.values = values or {}
+        self.rows = rows or {}
+        self.executed = []
+        self.fetched = []
+
+    def _lookup(self, table, query, default):
+        for fragment, value in table.items():
+            if fragment in query:
+                return value
+        return default
+
+    async def execute(self, query, *args):
+        self.executed.append(" ".join(query.split()))
+
+    async def fetchval(self, query, *args):
+        return self._lookup(self.values, query, None)
+
+    async def fetchrow(self, query, *args):
+        self.fetched.append((" ".join(query.split()), args))
+        return self._lookup(self.rows, query, None)
+
+    async def fetch(self, query, *args):
+        self.fetched.append((" ".join(query.split()), args))
+        return self._lookup(self.rows, query, [])
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+class NamingTests(unittest.TestCase):
+
+    def test_session_names_round_trip(self):
+        name = partitions.partition_name("robot", "session", 42)
+
+        self.assertEqual(name, "robot_s42")
+        self.assertEqual(partitions.partition_bounds("session", 42), (42, 43))
+        self.assertEqual(partitions.partition_key("robot", "session", name), 42)
+        self.assertIsNone(partitions.partition_key("robot", "session", "robot_legacy"))
+
+    def test_day_names_round_trip(self):
+        noon = datetime(2026, 3, 9, 12, tzinfo=timezone.utc).timestamp()
+        midnight = datetime(2026, 3, 9, tzinfo=timezone.utc).timestamp()
+        name = partitions.partition_name("imu_measurement", "day", noon)
+
+        self.assertEqual(name, "imu_measurement_d20260309")
+        self.assertEqual(partitions.partition_bounds("day", noon), (midnight, midnight + partitions.DAY))
+        self.assertEqual(partitions.partition_key("imu_measurement", "day", name), midnight)
+
+    def test_expired_days_keep_current_and_special_partitions(self):
+        names = ["robot_d20260301", "robot_d20260302", "robot_default", "robot_legacy"]
+        cutoff = datetime(2026, 3, 2, 6, tzinfo=timezone.utc).timestamp()
+
+        self.assertEqual(partitions.expired_days("robot", names, cutoff), ["robot_d20260301"])
+
+
+class PredicateTests(unittest.TestCase):
+
+    scope = {"id": 7, "started_at": 1000.0, "ended_at": 2000.0}
+
+    def test_session_strategy_filters_on_key(self):
+        sql, args = partitions.session_predicate("t", self.scope, strategy="session")
+
+        self.assertEqual(sql, "t.session_id = $1")
+        self.assertEqual(args, [7])
+
+    def test_day_strategy_adds_ingest_window(self):
+        sql, args = partitions.session_predicate("t", {**self.scope, "ended_at": None}, strategy="day")
+
+        self.assertIn("t.ingested_at >= $2 AND t.ingested_at < $3", sql)
+        self.assertEqual(args, [7, 1000.0 - partitions.SESSION_SLACK_SECONDS, float("inf")])
+
+
+class DDLTests(unittest.TestCase):
+
+    def test_convert_attaches_existing_rows_as_legacy_partition(self):
+        conn = RecordingConn(values={
+            "pg_partitioned_table": False,
+            "IS NULL": 0,
+            "max(id)": 5,
+            "pg_get_serial_sequence": "public.robot_id_seq",
+        })
+
+        self.assertTrue(asyncio.run(partitions.convert_table(conn, "robot", "session")))
+        self.assertEqual(conn.executed, [
+            "ALTER TABLE robot RENAME TO robot_legacy",
+            "CREATE TABLE robot (LIKE robot_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (session_id)",
+            "ALTER SEQUENCE public.robot_id_seq OWNED BY robot.id",
+            "ALTER TABLE robot ATTACH PARTITION robot_legacy FOR VALUES FROM (MINVALUE) TO (5)",
+            "CREATE TABLE IF NOT EXISTS robot_default PARTITION OF robot DEFAULT",
+        ])
+
+    def test_convert_keeps_primary_and_foreign_keys_on_the_parent(self):
+        conn = RecordingConn(
+            values={"pg_partitioned_table": False, "IS NULL": 0, "max(id)": 5},
+            rows={"pg_constraint": [
+                ("robot_pkey", "p", "PRIMARY KEY (id)"),
+                ("robot_device_id_fkey", "f", "FOREIGN KEY (device_id) REFERENCES device(id)"),
+                ("robot_session_id_fkey", "f", "FOREIGN KEY (session_id) REFERENCES session(id)"),
+            ]},
+        )
+
+        asyncio.run(partitions.convert_table(conn, "robot", "session"))
+
+        self.assertEqual(conn.executed[2:7], [
+            "ALTER TABLE robot_legacy RENAME CONSTRAINT robot_pkey TO robot_legacy_pkey",
+            "ALTER TABLE robot_legacy ALTER COLUMN session_id SET NOT NULL",
+            "ALTER TABLE robot ADD CONSTRAINT robot_pkey PRIMARY KEY (id, session_id)",
+            "ALTER TABLE robot ADD CONSTRAINT robot_device_id_fkey FOREIGN KEY (device_id) REFERENCES device(id)",
+            "ALTER TABLE robot ADD CONSTRAINT robot_session_id_fkey FOREIGN KEY (session_id) REFERENCES session(id)",
+        ])
+        self.assertTrue(conn.executed[-2].startswith("ALTER TABLE robot ATTACH PARTITION robot_legacy"))
+
+    def test_convert_skips_partitioned_and_refuses_null_keys(self):
+        done = RecordingConn(values={"pg_partitioned_table": True})
+        self.assertFalse(asyncio.run(partitions.convert_table(done, "robot", "session")))
+        self.assertEqual(done.executed, [])
+
+        nulls = RecordingConn(values={"pg_partitioned_table": False, "IS NULL": 3})
+        with self.assertRaises(partitions.PartitioningError):
+            asyncio.run(partitions.convert_table(nulls, "robot", "session"))
+        self.assertEqual(nulls.executed, [])
+
+    def test_create_ahead_skips_existing(self):
+        conn = RecordingConn(
+            values={"pg_get_serial_sequence": "public.session_id_seq"},
+            rows={"last_value": (4, True), "pg_inherits": [{"relname": "robot_s5"}]},
+        )
+
+        created = asyncio.run(partitions.create_ahead(conn, "session", ahead=2))
+
+        self.assertIn("robot_s6", created)
+        self.assertNotIn("robot_s5", created)
+        self.assertEqual(len(created), 5)
+
+    def test_create_ahead_starts_after_legacy_range(self):
+        # Legacy range reaching 2100 covers today -- One reaching 1970 covers nothing
+        future = RecordingConn(values={"relpartbound": "FOR VALUES FROM (MINVALUE) TO ('4102444800')"})
+        past = RecordingConn(values={"relpartbound": "FOR VALUES FROM (MINVALUE) TO ('86400')"})
+
+        self.assertEqual(asyncio.run(partitions.create_ahead(future, "day", ahead=0)), [])
+        self.assertEqual(len(asyncio.run(partitions.create_ahead(past, "day", ahead=0))), 3)
+
+    def test_archive_moves_ended_sessions(self):
+        conn = RecordingConn(rows={
+            "FROM session": [{"id": 3}],
+            "pg_inherits": [{"relname": "robot_s3"}, {"relname": "robot_s4"}],
+        })
+
+        archived = asyncio.run(partitions.archive_expired(conn, "session", retention_days=30, schema="archive"))
+
+        self.assertIn("archive.robot_s3", archived)
+        self.assertNotIn("archive.robot_s4", archived)
+        self.assertIn("ALTER TABLE robot DETACH PARTITION robot_s3", conn.executed)
+        self.assertIn("ALTER TABLE robot_s3 SET SCHEMA archive", conn.executed)
+
+    def test_retention_zero_archives_nothing(self):
+        conn = RecordingConn()
+
+        self.assertEqual(asyncio.run(partitions.archive_expired(conn, "session", retention_days=0)), [])
+        self.assertEqual(conn.executed, [])
+
+
+class RetrievalTests(unittest.TestCase):
+
+    class Pool:
+        def __init__(self, conn):
+            self.conn = conn
+
+        @asynccontextmanager
+        async def acquire(self):
+            yield self.conn
+
+    def test_retrieval_filters_on_partition_key(self):
+        conn = RecordingConn(rows={"FROM session": {"id": 9, "started_at": 1.0, "ended_at": None}})
+        db = DatabaseSingleton(self.Pool(conn))
+
+        self.assertEqual(asyncio.run(db.retrieve_imu("run1")), [])
+
+        query, args = conn.fetched[-1]
+        self.assertIn("WHERE imu.session_id = $1", query)
+        self.assertNotIn("JOIN session", query)
+        self.assertEqual(args[0], 9)
+
+    def test_unknown_session_skips_measurement_query(self):
+        conn = RecordingConn()
+        db = DatabaseSingleton(self.Pool(conn))
+
+        self.assertEqual(asyncio.run(db.retrieve_robot("missing")), [])
+        self.assertEqual(len(conn.fetched), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
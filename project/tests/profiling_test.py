@@ -0,0 +1,148 @@
+import asyncio
+import marshal
+import time
+import unittest
+
+from fastapi.testclient import TestClient
+
+from project.fast_server.metrics import MetricsRegistry, serve_metrics
+from project.fast_server.profiling import LoopProfiler, MemoryProbe, ProfilerBusy, admin_routes
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+class LoopProfilerTests(unittest.TestCase):
+
+    def test_cprofile_exports_pstats(self):
+        prof = LoopProfiler()
+
+        async def run():
+            prof.start("cprofile", seconds=10)
+            busy(0.05)
+            return prof.stop()
+
+        status = asyncio.run(run())
+
+        self.assertFalse(status["running"])
+        self.assertEqual(status["formats"], ["pstats", "text"])
+
+        stats = marshal.loads(prof.export("pstats"))
+        self.assertTrue(any(func[2] == "busy" for func in stats))
+        self.assertIn(b"busy", prof.export("text"))
+
+    def test_sample_collects_collapsed_stacks(self):
+        prof = LoopProfiler()
+
+        async def run():
+            prof.start("sample", seconds=10, interval=0.001)
+            busy(0.1)
+            return prof.stop()
+
+        status = asyncio.run(run())
+
+        self.assertGreater(status["samples"], 0)
+        collapsed = prof.export("collapsed").decode()
+        self.assertIn("busy (profiling_test.py:", collapsed)
+
+        with self.assertRaises(LookupError):
+            prof.export("pstats")
+
+    def test_time_box_and_busy(self):
+        prof = LoopProfiler()
+
+        async def run():
+            prof.start("sample", seconds=0.05)
+
+            with self.assertRaises(ProfilerBusy):
+                prof.start("cprofile")
+
+            await asyncio.sleep(0.2)
+            return prof.status()
+
+        self.assertFalse(asyncio.run(run())["running"])
+
+    def test_unknown_mode(self):
+        async def run():
+            LoopProfiler().start("perf")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(run())
+
+
+class MemoryProbeTests(unittest.TestCase):
+
+    def test_snapshot_diff_and_containers(self):
+        probe = MemoryProbe()
+        history = set()
+        probe.track("db.history", lambda: len(history))
+        probe.track("broken", lambda: 1 / 0)
+
+        try:
+            first = probe.snapshot()
+            history.update((i, 1) for i in range(5000))
+            second = probe.snapshot()
+        finally:
+            probe.stop()
+
+        self.assertFalse(first["compared_to_previous"])
+        self.assertTrue(second["compared_to_previous"])
+        self.assertEqual(second["containers"], {"db.history": 5000, "broken": None})
+        self.assertTrue(any("profiling_test.py" in s["where"] and s["size_diff_kb"] > 0 for s in second["top"]))
+
+
+class AdminRouteTests(unittest.TestCase):
+
+    def test_fastapi_profile_round_trip(self):
+        from project.fast_server.main import app
+
+        app.router.on_startup.clear()
+        client = TestClient(app)
+
+        self.assertEqual(client.post("/admin/profile/start?mode=nope").status_code, 400)
+
+        body = client.post("/admin/profile/start?mode=cprofile&seconds=30").json()
+        self.assertTrue(body["data"]["running"])
+        self.assertEqual(client.post("/admin/profile/start").status_code, 409)
+
+        client.post("/admin/profile/stop")
+        resp = client.get("/admin/profile/download?format=pstats")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIsInstance(marshal.loads(resp.content), dict)
+        self.assertEqual(client.get("/admin/profile/download?format=collapsed").status_code, 404)
+
+    def test_standalone_server_routes(self):
+
+        async def request(port, line):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(line + b"\r\nHost: x\r\n\r\n")
+            await writer.drain()
+            return (await reader.read()).decode()
+
+        async def run():
+            prof = LoopProfiler()
+            server = await serve_metrics("127.0.0.1", 0, MetricsRegistry(), routes=admin_routes(prof, MemoryProbe()))
+            port = server.sockets[0].getsockname()[1]
+
+            started = await request(port, b"POST /admin/profile/start?mode=sample&seconds=5 HTTP/1.1")
+            stopped = await request(port, b"POST /admin/profile/stop HTTP/1.1")
+            collapsed = await request(port, b"GET /admin/profile/download?format=collapsed HTTP/1.1")
+
+            server.close()
+            await server.wait_closed()
+            return started, stopped, collapsed
+
+        started, stopped, collapsed = asyncio.run(run())
+
+        self.assertTrue(started.startswith("HTTP/1.1 200 OK"))
+        self.assertIn('"running":true', started)
+        self.assertIn('"running":false', stopped)
+        self.assertTrue(collapsed.startswith("HTTP/1.1 200 OK"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import MagicMock, AsyncMock
+
+import numpy as np
+import orjson
+from fastapi.testclient import TestClient
+
+from project.fast_server.compression import negotiate_encoding
+from project.fast_server.main import app
+from project.fast_server.responses import dumps, records_to_columns
+
+
+class EncodingTests(unittest.TestCase):
+
+    def test_negotiate_prefers_zstd(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate, br, zstd"), "zstd")
+
+    def test_negotiate_gzip(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate"), "gzip")
+
+    def test_negotiate_refused(self):
+        self.assertIsNone(negotiate_encoding("gzip;q=0, identity"))
+        self.assertIsNone(negotiate_encoding(""))
+
+    def test_columns_are_numpy(self):
+        rows = [
+            {"frame_id": 1, "accel_x": 0.5, "image_path": ""},
+            {"frame_id": 2, "accel_x": None, "image_path": "a"},
+        ]
+
+        columns = records_to_columns(rows)
+
+        self.assertIsInstance(columns["frame_id"], np.ndarray)
+        self.assertEqual(columns["image_path"], ["", "a"])
+        self.assertEqual(orjson.loads(dumps(columns))["accel_x"], [0.5, None])
+
+
+class CompressedResponseTests(unittest.TestCase):
+
+    def setUp(self):
+        app.router.on_startup.clear()
+        app.router.on_shutdown.clear()
+
+        self.client = TestClient(app)
+        self.rows = [{"frame_id": i, "accel_x": i * 0.5} for i in range(500)]
+
+        fake_db = MagicMock()
+        fake_db.retrieve_imu = AsyncMock(return_value=self.rows)
+        app.state.db = fake_db
+
+    def test_zstd_response(self):
+        resp = self.client.get("/imu/run1", headers={"Accept-Encoding": "zstd"})
+
+        # httpx decodes zstd transparently
+        self.assertEqual(resp.headers["content-encoding"], "zstd")
+        self.assertEqual(resp.json(), {"data": self.rows, "success": True})
+
+    def test_gzip_response(self):
+        resp = self.client.get("/imu/run1", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(resp.headers["content-encoding"], "gzip")
+        self.assertEqual(resp.json()["data"], self.rows)
+
+    def test_uncompressed_response(self):
+        resp = self.client.get("/imu/run1", headers={"Accept-Encoding": "identity"})
+
+        self.assertNotIn("content-encoding", resp.headers)
+        self.assertEqual(resp.json()["data"], self.rows)
+
+    def test_columns_layout(self):
+        resp = self.client.get("/imu/run1?layout=columns", headers={"Accept-Encoding": "identity"})
+
+        data = resp.json()["data"]
+        self.assertEqual(data["frame_id"][:3], [0.0, 1.0, 2.0])
+        self.assertEqual(len(data["accel_x"]), 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import asyncio
+import statistics
+import unittest
+from contextlib import asynccontextmanager
+
+from project.db import rollups
+from project.db.database import DatabaseSingleton
+
+
+def imu_record(capture, accel_x, device=1, session=7):
+    channels = [accel_x] + [0.0] * 11
+    return (0, capture, capture, 100.0, device, session, *channels)
+
+
+# The ON CONFLICT update in rollups.upsert_sql, written out in Python
+def merge(old, new):
+    count_o, min_o, max_o, mean_o, m2_o = old
+    count_n, min_n, max_n, mean_n, m2_n = new
+    n = count_n / (count_o + count_n)
+
+    return (
+        count_o + count_n,
+        min(min_o, min_n),
+        max(max_o, max_n),
+        mean_o + (mean_n - mean_o) * n,
+        m2_o + m2_n + (mean_n - mean_o) ** 2 * count_o * n,
+    )
+
+
+def stats(row):
+    return row[5:10]  # count, min, max, mean, m2
+
+
+class SummarizeTests(unittest.TestCase):
+
+    values = [0.5, 1.5, -2.0, 4.25, 3.0, 0.0, 7.5]
+
+    def accel_rows(self, out, table):
+        return [r for r in out[table] if r[3] == "accel_x"]
+
+    def test_single_batch_matches_statistics(self):
+        records = [imu_record(100.0 + i * 0.01, v) for i, v in enumerate(self.values)]
+
+        (row,) = self.accel_rows(rollups.summarize("imu", records), "rollup_1s")
+        count, low, high, mean, m2 = stats(row)
+
+        self.assertEqual((count, low, high), (7, -2.0, 7.5))
+        self.assertAlmostEqual(mean, statistics.fmean(self.values))
+        self.assertAlmostEqual(m2 / (count - 1), statistics.variance(self.values))
+
+    def test_batches_merge_like_one(self):
+        records = [imu_record(100.0 + i * 0.01, v) for i, v in enumerate(self.values)]
+
+        first = stats(self.accel_rows(rollups.summarize("imu", records[:3]), "rollup_1s")[0])
+        second = stats(self.accel_rows(rollups.summarize("imu", records[3:]), "rollup_1s")[0])
+        whole = stats(self.accel_rows(rollups.summarize("imu", records), "rollup_1s")[0])
+
+        for merged, expected in zip(merge(first, second), whole):
+            self.assertAlmostEqual(merged, expected)
+
+    def test_buckets_split_by_resolution_and_clock_units(self):
+        records = [imu_record(59_999.0, 1.0), imu_record(60_000.5, 2.0), imu_record(60_001.0, 3.0)]
+
+        per_second = self.accel_rows(rollups.summarize("imu", records), "rollup_1s")
+        per_minute = self.accel_rows(rollups.summarize("imu", records), "rollup_1m")
+
+        # Values above 1e11 are epoch milliseconds
+        self.assertEqual(self.accel_rows(rollups.summarize("imu", [imu_record(1e12 + 500, 1.0)]), "rollup_1s")[0][4], 1e9)
+        self.assertEqual([(r[4], r[5]) for r in per_second], [(59_999, 1), (60_000, 1), (60_001, 1)])
+        self.assertEqual([(r[4], r[5]) for r in per_minute], [(59_940, 1), (60_000, 2)])
+
+    def test_missing_values_are_skipped(self):
+        records = [imu_record(1.0, None), imu_record(1.1, float("nan")), imu_record(1.2, 2.0)]
+
+        (row,) = self.accel_rows(rollups.summarize("imu", records), "rollup_1s")
+        self.assertEqual(row[5], 1)
+
+    def test_robot_channels(self):
+        record = (1, 50.0, *range(12), 50.0, 51.0, 3, 7)
+        out = rollups.summarize("robot", [record])
+
+        self.assertEqual([r[3] for r in out["rollup_1s"]], sorted(rollups.CHANNELS["robot"]))
+
+
+class RetrieveRollupTests(unittest.TestCase):
+
+    class Conn:
+        def __init__(self):
+            self.fetched = []
+
+        async def fetchrow(self, query, *args):
+            return {"id": 7, "started_at": 0.0, "ended_at": None}
+
+        async def fetch(self, query, *args):
+            self.fetched.append((" ".join(query.split()), args))
+            return [{"device": "imu-a", "stream": "imu", "channel": "accel_x", "bucket": 10.0,
+                     "count": 4, "min": 0.0, "max": 3.0, "mean": 1.5, "m2": 5.0}]
+
+    class Pool:
+        def __init__(self, conn):
+            self.conn = conn
+
+        @asynccontextmanager
+        async def acquire(self):
+            yield self.conn
+
+    def test_filters_and_variance(self):
+        conn = self.Conn()
+        db = DatabaseSingleton(self.Pool(conn))
+
+        data = asyncio.run(db.retrieve_rollup("run1", "1m", device="imu-a", start=5.0))
+        query, args = conn.fetched[0]
+
+        self.assertIn("FROM rollup_1m AS r", query)
+        self.assertIn("WHERE r.session_id = $1 AND d.label = $2 AND r.bucket >= $3", query)
+        self.assertEqual(args, (7, "imu-a", 5.0))
+        self.assertAlmostEqual(data[0]["variance"], 5.0 / 3)
+
+    def test_unknown_resolution(self):
+        db = DatabaseSingleton(self.Pool(self.Conn()))
+
+        with self.assertRaises(ValueError):
+            asyncio.run(db.retrieve_rollup("run1", "5s"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+
+from project.db import sequence
+from project.db.database import DatabaseSingleton
+
+COLUMNS = ("frame_id", "capture_time", "device_id", "session_id")
+
+
+def sample(frame, capture=None, device=1, session=7):
+    return (frame, 100.0 + frame * 0.01 if capture is None else capture, device, session)
+
+
+class GapConn:
+
+    def __init__(self):
+        self.many = []
+        self.staged = []
+
+    async def execute(self, query, *args):
+        return "OK"
+
+    async def executemany(self, query, rows):
+        self.many.append((query.split()[0], query.split()[2], list(rows)))
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.staged = list(records)
+
+    async def fetch(self, query, *args):
+        return [(r[4], r[5], r[0], r[1]) for r in self.staged]
+
+    async def fetchrow(self, query, *args):
+        return {"id": 7, "ended_at": None}
+
+    async def fetchval(self, query, *args):
+        return 1
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+class Pool:
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+class TrackerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tracker = sequence.SequenceTracker("imu", COLUMNS, str, reorder_window=100)
+
+    def run_batch(self, records):
+        scan = self.tracker.scan(records, now=5.0)
+        self.tracker.commit(scan)
+        return scan
+
+    def test_in_order_stream_has_no_events(self):
+        scan = self.run_batch([sample(i) for i in range(10)])
+
+        self.assertEqual(scan.events, [])
+        self.assertEqual(self.tracker.devices[1].to_dict()["received"], 10)
+
+    def test_gap_is_recorded_with_its_interval(self):
+        scan = self.run_batch([sample(0), sample(1), sample(5), sample(6)])
+
+        self.assertEqual(scan.events, [(7, 1, "imu", "gap", 1, 5, 3, 100.01, 100.05, 5.0)])
+        self.assertEqual(self.tracker.devices[1].missing, 3)
+
+    def test_gap_across_batches(self):
+        self.run_batch([sample(0), sample(1)])
+        scan = self.run_batch([sample(4)])
+
+        self.assertEqual([e[4:7] for e in scan.events], [(1, 4, 2)])
+
+    def test_late_sample_is_credited_to_its_gap(self):
+        self.run_batch([sample(0), sample(3)])
+        scan = self.run_batch([sample(1), sample(4)])
+
+        state = self.tracker.devices[1]
+        self.assertEqual((state.late, state.to_dict()["lost"]), (1, 1))
+        self.assertEqual(list(scan.recovered.values()), [(7, 1, "imu", 0, 3, 1)])
+
+    def test_restarted_counter_is_a_reset(self):
+        self.run_batch([sample(50), sample(51)])
+
+        # Lower frame, newer device timestamp
+        scan = self.run_batch([sample(0, capture=200.0), sample(1, capture=200.01)])
+
+        self.assertEqual([e[3:7] for e in scan.events], [("reset", 51, 0, 0)])
+        self.assertEqual((self.tracker.devices[1].resets, self.tracker.devices[1].last), (1, 1))
+
+    def test_far_behind_is_a_reset_without_timestamps(self):
+        self.run_batch([sample(500, capture=None), sample(501)])
+        scan = self.run_batch([(3, None, 1, 7)])
+
+        self.assertEqual(scan.events[0][3], "reset")
+
+    def test_devices_are_independent(self):
+        scan = self.run_batch([sample(0), sample(0, device=2), sample(1), sample(2, device=2)])
+
+        self.assertEqual([(e[1], e[6]) for e in scan.events], [(2, 1)])
+
+    def test_uncommitted_scan_leaves_the_tracker_alone(self):
+        self.run_batch([sample(0)])
+        self.tracker.scan([sample(5)])
+
+        # Retried after a failed insert -- Same gap again, found once
+        scan = self.run_batch([sample(5)])
+
+        self.assertEqual(len(scan.events), 1)
+        self.assertEqual(self.tracker.devices[1].missing, 4)
+
+    def test_new_session_starts_over(self):
+        self.run_batch([sample(10)])
+        scan = self.run_batch([sample(0, session=8)])
+
+        self.assertEqual(scan.events, [])
+
+    def test_camera_markers_share_a_frame(self):
+        camera = sequence.SequenceTracker("camera", ("frame_idx", "capture_time", "marker_idx", "device_id", "session_id"), str)
+        scan = camera.scan([(4, 1.0, 0, 1, 7), (4, 1.0, 1, 1, 7), (5, 1.1, 0, 1, 7)])
+
+        self.assertEqual(scan.events, [])
+        self.assertEqual(scan.devices[1].late, 0)
+
+
+class BatchTests(unittest.TestCase):
+
+    def test_gaps_are_written_with_the_batch(self):
+        conn = GapConn()
+        db = DatabaseSingleton(Pool(conn))
+        db.devices["imu-a"] = 1
+
+        batch = [{
+            "device_label": "imu-a", "frame_id": f, "capture_time": 10 + f * 0.01, "recorded_at": 10.0,
+            **{c: 0.1 for c in ("accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z",
+                                "mag_x", "mag_y", "mag_z", "yaw", "pitch", "roll")},
+        } for f in (0, 1, 4)]
+
+        asyncio.run(db.insert_imu_batch(batch))
+
+        gap_writes = [rows for verb, table, rows in conn.many if table == "ingest_gap"]
+        self.assertEqual([r[3:7] for r in gap_writes[0]], [("gap", 1, 4, 2)])
+        self.assertEqual(db.sequences["imu"].summary()["imu-a"]["lost"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,11 +3,10 @@ Robot TCP Data Flow Test Script — Full Logging + Return Stats Version
 """
 
 import socket
-import pandas as pd
-import numpy as np
 from datetime import datetime
 import time
 from logging_config import logger, colorize
+from data_generators import create_robot_data
 
 # --------------------------------------------------------------
 # CONFIG
@@ -19,69 +18,6 @@ BROKER_PORT = 5001
 SEND_INTERVAL = 0.01
 NUM_SAMPLES = 10
 
-# --------------------------------------------------------------
-# DATA CREATION
-# --------------------------------------------------------------
-
-# def create_robot_data(num_records: int = 10) -> list[str]:
-#     """
-#     Create robot telemetry rows (CSV strings).
-#     First value sent from actual robot is a string, second is an int, rest of the values are floats
-#     """
-#     timestamp_str = datetime.now().strftime("%m/%d/%Y %H:%M")
-
-#     timestamp_col = [timestamp_str] * num_records
-#     int_col = np.arange(1, num_records + 1, dtype=int)
-
-#     float_cols = {
-#         f"col_{i}": np.random.uniform(-100, 100, num_records)
-#         for i in range(2, 14)
-#     }
-
-#     df = pd.DataFrame({
-#         "col_0": timestamp_col, 
-#         "col_1": int_col,
-#         **float_cols
-#     })
-
-#     return df.to_csv(index=False, header=False).strip().splitlines()
-
-def create_robot_data(num_records: int = 10) -> list[str]:
-    """
-    Robot telemetry rows (CSV strings) in the exact order expected by the current robot parser:
-
-    frame_id, ts, ts_string, joint1, joint2, joint3, joint4, joint5, joint6, x, y, z, w, p, r
-    """
-    ts_base = float(time.time())  # UNIX seconds as float
-
-    df = pd.DataFrame({
-        "frame_id": np.arange(1, num_records + 1, dtype=np.int64),
-        "ts_epoch": (ts_base + np.arange(num_records, dtype=np.float64)),
-        "ts_string": [str(ts_base + i) for i in range(num_records)],
-
-        "joint1": np.random.uniform(-180, 180, num_records),
-        "joint2": np.random.uniform(-180, 180, num_records),
-        "joint3": np.random.uniform(-180, 180, num_records),
-        "joint4": np.random.uniform(-180, 180, num_records),
-        "joint5": np.random.uniform(-180, 180, num_records),
-        "joint6": np.random.uniform(-180, 180, num_records),
-
-        "x": np.random.uniform(-1000, 1000, num_records),
-        "y": np.random.uniform(-1000, 1000, num_records),
-        "z": np.random.uniform(-1000, 1000, num_records),
-        "w": np.random.uniform(-180, 180, num_records),
-        "p": np.random.uniform(-180, 180, num_records),
-        "r": np.random.uniform(-180, 180, num_records),
-    })
-
-    cols = [
-        "frame_id", "ts_epoch", "ts_string",
-        "joint1", "joint2", "joint3", "joint4", "joint5", "joint6",
-        "x", "y", "z", "w", "p", "r"
-    ]
-
-    return df[cols].to_csv(index=False, header=False).strip().splitlines()
-
 # --------------------------------------------------------------
 # TCP SEND TEST
 # --------------------------------------------------------------
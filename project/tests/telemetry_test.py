@@ -0,0 +1,66 @@
+import asyncio
+import unittest
+
+from project.fast_server.telemetry import TelemetryAggregator
+
+
+class TelemetryTests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.frames = []
+
+        async def emit(stream, frame):
+            self.frames.append((stream, frame))
+
+        self.telemetry = TelemetryAggregator(emit, interval=0.01)
+
+    async def test_idle_streams_emit_nothing(self):
+        self.telemetry.track_queue("imu", asyncio.Queue(maxsize=10))
+
+        self.assertEqual(self.telemetry.snapshot(), {})
+
+    async def test_flush_summary(self):
+        queue = asyncio.Queue(maxsize=10)
+        queue.put_nowait(1)
+        self.telemetry.track_queue("imu", queue)
+
+        self.telemetry.record_flush("imu", [{"device_label": "a"}] * 3 + [{"device_label": "b"}], 0.01)
+        self.telemetry.record_flush("imu", [{"device_label": "a"}], 0.03)
+
+        frame = self.telemetry.snapshot()["imu"]
+
+        self.assertEqual(frame["type"], "normal")
+        self.assertEqual(frame["stats"]["rows"], 5)
+        self.assertEqual(frame["stats"]["device_rows"], {"a": 4, "b": 1})
+        self.assertEqual(frame["stats"]["flush_max_ms"], 30.0)
+        self.assertEqual(frame["stats"]["queue_depth"], 1)
+        self.assertIn("queue 1/10", frame["text"])
+
+        # Counters reset after each tick
+        self.assertEqual(self.telemetry.snapshot()["imu"]["stats"]["rows"], 0)
+
+    async def test_errors_deduplicated(self):
+        for _ in range(1000):
+            self.telemetry.record_error("imu", "IMU parse", ValueError("Expected at least 15 fields, got 4"), "dev1")
+        self.telemetry.record_error("imu", "IMU parse", ValueError("could not convert"), "dev2")
+
+        frame = self.telemetry.snapshot()["imu"]
+
+        self.assertEqual(frame["type"], "error")
+        self.assertEqual(frame["stats"]["errors_by_type"], {"IMU parse:ValueError": 1001})
+        self.assertEqual(frame["stats"]["errors_by_device"], {"dev1": 1000, "dev2": 1})
+        self.assertIn("x1000 IMU parse error: Expected at least 15 fields, got 4", frame["text"])
+        self.assertEqual(frame["text"].count("\n"), 2)
+
+    async def test_run_emits_one_frame_per_tick(self):
+        self.telemetry.record_flush("camera", [{"device_label": "c"}], 0.001)
+
+        task = asyncio.create_task(self.telemetry.run())
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+        self.assertEqual([stream for stream, _ in self.frames], ["camera"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import asyncio
+import time
+import unittest
+
+from project.fast_server.watchdog import LoopWatchdog, watchdog_routes
+
+
+def blocking_call(seconds):
+    time.sleep(seconds)
+
+
+class LoopWatchdogTests(unittest.TestCase):
+
+    def test_stall_captures_stack_and_duration(self):
+        dog = LoopWatchdog(interval=0.01, threshold=0.05)
+
+        async def run():
+            dog.start()
+            await asyncio.sleep(0.05)
+            blocking_call(0.3)
+            await asyncio.sleep(0.05)
+            await dog.stop()
+
+        asyncio.run(run())
+        summary = dog.summary()
+
+        self.assertEqual(summary["stalls"], 1)
+        event = summary["events"][0]
+
+        self.assertGreaterEqual(event["blocked_for"], 0.25)
+        self.assertTrue(any("blocking_call" in line for line in event["stack"]))
+        self.assertIn("run", event["task"])
+        self.assertGreaterEqual(summary["lag"]["max"], 0.25)
+
+    def test_percentiles_without_stalls(self):
+        dog = LoopWatchdog(interval=0.005, threshold=0.5)
+
+        async def run():
+            dog.start()
+            await asyncio.sleep(0.1)
+            await dog.stop()
+
+        asyncio.run(run())
+        summary = dog.summary()
+
+        self.assertEqual(summary["stalls"], 0)
+        self.assertGreater(summary["lag"]["samples"], 5)
+        self.assertLess(summary["lag"]["p50"], 0.5)
+        self.assertFalse(summary["running"])
+
+    def test_route(self):
+        dog = LoopWatchdog()
+        status, content_type, body = asyncio.run(watchdog_routes(dog)["/admin/watchdog"]({"events": ["5"]}))
+
+        self.assertEqual(status, "200 OK")
+        self.assertEqual(content_type, "application/json")
+        self.assertIn(b'"stalls":0', body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from project.fast_server import main as m
+
+# main imports its helpers as top-level fast_server.* modules
+ws_session = sys.modules[m.serve_websocket.__module__]
+
+
+class WebSocketSessionTests(unittest.TestCase):
+
+    def setUp(self):
+        app = m.app
+        app.router.on_startup.clear()
+        app.router.on_shutdown.clear()
+
+        self.client = TestClient(app)
+
+        # Other tests register fake channels
+        m.MANAGERS.pop("test", None)
+
+    def wait_for_clients(self, manager, count, timeout=1.0):
+        deadline = time.monotonic() + timeout
+        while len(manager.clients) != count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        return len(manager.clients)
+
+    def test_ping_pong(self):
+        with self.client.websocket_connect("/ws/misc") as ws:
+            ws.send_text('{"type": "ping"}')
+            self.assertEqual(ws.receive_json(), {"type": "pong"})
+
+    def test_disconnect_removes_client(self):
+        with self.client.websocket_connect("/ws/misc"):
+            self.assertEqual(self.wait_for_clients(m.misc_manager, 1), 1)
+
+        self.assertEqual(self.wait_for_clients(m.misc_manager, 0), 0)
+
+    def test_heartbeat_then_idle_timeout(self):
+        with patch.object(ws_session.cm, "WS_HEARTBEAT_INTERVAL", 0.05), \
+             patch.object(ws_session.cm, "WS_IDLE_TIMEOUT", 0.2):
+
+            with self.client.websocket_connect("/ws/misc") as ws:
+                self.assertEqual(ws.receive_json(), {"type": "ping"})
+
+                # Stay silent until the server gives up on us
+                while True:
+                    msg = ws.receive()
+                    if msg["type"] == "websocket.close":
+                        break
+
+                self.assertEqual(msg["code"], 1001)
+
+        self.assertEqual(self.wait_for_clients(m.misc_manager, 0), 0)
+        self.assertGreaterEqual(m.misc_manager.idle_disconnects, 1)
+
+    def test_subscribe_message(self):
+        with self.client.websocket_connect("/ws/imu") as ws:
+            ws.send_text('{"type": "subscribe", "rate": 10, "devices": ["a"]}')
+            ws.send_text('{"type": "ping"}')
+            ws.receive_json()
+
+            self.assertEqual(m.imu_bus.subscriber_count, 1)
+
+        deadline = time.monotonic() + 1
+        while m.imu_bus.subscriber_count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(m.imu_bus.subscriber_count, 0)
+
+    def test_stats(self):
+        body = self.client.get("/ws/stats").json()
+
+        self.assertEqual(set(body["misc"]), {"active", "zombie", "queued", "slow_disconnects", "idle_disconnects"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -46,6 +46,20 @@ export default function BackupCard({sendMessage}) {
         }
     };
 
+    // Polls a backup / restore job until it is done -- The request itself only starts it
+    const waitForJob = async (jobId) => {
+        while (true) {
+            const res = await fetch("http://192.168.1.76:8000/backup/jobs/" + jobId);
+            const job = (await res.json()).data;
+
+            if (["succeeded", "failed", "cancelled"].includes(job.state)) {
+                return job;
+            }
+
+            await new Promise((resolve) => setTimeout(resolve, 1000));
+        }
+    };
+
     const restoreBackup = async (filepath) => {
 
         setIsRecovering(true);
@@ -74,10 +88,17 @@ export default function BackupCard({sendMessage}) {
 
             const data = await res.json();
 
-            if (data.success) {
+            if (!data.success) {
+                sendMessage("misc", "error", "Failed to load backup: " + data.error);
+                return;
+            }
+
+            const job = await waitForJob(data.job);
+
+            if (job.state === "succeeded") {
                 sendMessage("misc", "info", "Loaded Backup Sucessfully");
             } else {
-                sendMessage("misc", "error", "Failed to load backup: " + data.error);
+                sendMessage("misc", "error", "Failed to load backup: " + job.error);
             }
         }
 
@@ -7,6 +7,7 @@
         const [refreshTemp, setRefreshTemp] = useState(false)
 
         const boxRef = useRef(null);
+        const lastSeq = useRef(0);
 
         const capitalizeType = type.charAt(0).toUpperCase() + type.slice(1);
 
@@ -17,6 +18,12 @@
                 try {
                     const data = JSON.parse(event.data); 
 
+                    // Heartbeat -- Answer so the server knows we are still here
+                    if (data && data.type === "ping") {
+                        ws.send(JSON.stringify({ type: "pong" }));
+                        return;
+                    }
+
                     if (data && data.type && data.text) {
                         setLines((prev) => {
                             const next = [...prev, data];
@@ -41,6 +48,9 @@
 
             ws.onopen = () => {
                 setConnected(true);
+
+                // Backfill anything broadcast while we were away
+                getLatest();
             }
 
             ws.onclose = () => {
@@ -63,11 +73,13 @@
 
         async function getLatest() {
             try {
-                const res = await fetch("http://192.168.1.76:8000/" + type + "/latest");
+                const res = await fetch(`http://192.168.1.76:8000/ws/${type}/latest?since=${lastSeq.current}`);
                 const json = await res.json();
 
                 if (json.success) {
-                    
+
+                    lastSeq.current = json.last;
+
                     setLines((prev) => {
 
                     const normalized = json.data.map(item => ({